@@ -0,0 +1,330 @@
+"""Embedding module for semantic relevance scores of the project descriptions."""
+
+import numpy as np
+import pandas as pd
+import os
+import re
+import json
+import zlib
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+STOPWORDS = frozenset("""a an and are as at be been by can for from has have in into is it its of on or our that the their
+these this those to was were which will with within we they project projects aim aims objective objectives also new""".split())
+
+
+class HashingEmbedder():
+    """CPU-only text embedder based on feature hashing.
+
+    Words and word pairs of a text are hashed into ``dim`` signed buckets; the bucket
+    counts are damped logarithmically and the vector is normalized to unit length, so
+    that the dot product of two vectors is their cosine similarity. No model has to be
+    trained or downloaded and the vector of a text does not depend on the rest of the
+    corpus, which allows updating stored vectors incrementally.
+    """
+
+    def __init__(self, dim=512, word_pairs=True):
+        """Initialize with the number of dimensions and whether to use word pairs in addition to words."""
+        self.dim = dim
+        self.word_pairs = word_pairs
+        self._hashes = dict()
+
+    def get_config(self):
+        """Return the settings that determine the vectors (stored vectors are only valid for the same settings)."""
+        return {"embedder": type(self).__name__, "dim": self.dim, "word_pairs": self.word_pairs}
+
+    def _hash(self, feature):
+        """Return the (cached) stable hash of a feature."""
+        value = self._hashes.get(feature)
+        if value is None:
+            value = zlib.crc32(feature.encode())
+            self._hashes[feature] = value
+        return value
+
+    def embed_text(self, text):
+        """Return the unit-length vector of one text."""
+        words = [word for word in re.findall(r"\w+", str(text).lower()) if len(word) > 1 and word not in STOPWORDS and not word.isdigit()]
+        features = words + [f"{first} {second}" for first, second in zip(words, words[1:])] if self.word_pairs else words
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if not features:
+            return vector
+        hashes = np.fromiter((self._hash(feature) for feature in features), dtype=np.uint32, count=len(features))
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+        counts = np.bincount(hashes % self.dim, weights=signs, minlength=self.dim)
+        vector[:] = np.sign(counts) * np.log1p(np.abs(counts))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def embed(self, texts):
+        """Return the vectors of several texts as (number of texts, dim) matrix."""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            vectors[i] = self.embed_text(text)
+        return vectors
+
+
+class EmbeddingStore():
+    """Vectors of the project texts (title + objective), stored as memory-mapped matrix.
+
+    The matrix is kept in ``<directory>/<name>_vectors.f32`` (float32, one row per
+    project) and the row of each project id together with a fingerprint of its text in
+    ``<directory>/<name>_vectors.json``. Updates only embed new and edited projects.
+    """
+
+    def __init__(self, directory, embedder=None, name="ft"):
+        """Initialize with the storage directory and the embedder (default: ``HashingEmbedder()``)."""
+        self.directory = directory
+        self.embedder = embedder or HashingEmbedder()
+        self.vectors_filename = os.path.join(directory, f"{name}_vectors.f32")
+        self.meta_filename = os.path.join(directory, f"{name}_vectors.json")
+
+    def _load_meta(self):
+        """Return the stored row of each id and the fingerprints of the texts, or None if there are no valid vectors."""
+        try:
+            with open(self.meta_filename) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        if meta["config"] != self.embedder.get_config() or not os.path.exists(self.vectors_filename):
+            return None
+        return meta
+
+    def _save_meta(self, meta):
+        """Save the row assignment atomically."""
+        with open(f"{self.meta_filename}.tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(f"{self.meta_filename}.tmp", self.meta_filename)
+
+    def _open_vectors(self, rows, mode="r"):
+        """Memory-map the stored matrix."""
+        return np.memmap(self.vectors_filename, dtype=np.float32, mode=mode, shape=(rows, self.embedder.dim))
+
+    def update(self, project_df):
+        """Embed the new and edited projects of ``project_df`` (columns id, title and objective).
+
+        Rows of edited projects are overwritten in place, new projects are appended. Rows
+        of projects that are no longer in ``project_df`` are dropped from the assignment and
+        the matrix is compacted once they make up more than half of it.
+        """
+        project_df = project_df.drop_duplicates(subset="id")
+        ids = [str(project_id) for project_id in project_df["id"]]
+        texts = [str(title) + " " + str(objective) for title, objective in zip(project_df["title"], project_df["objective"])]
+        fingerprints = [hashlib.sha1(text.encode()).hexdigest() for text in texts]
+
+        meta = self._load_meta()
+        if meta is None:
+            logger.info(f"Embed all {len(ids)} projects")
+            os.makedirs(self.directory, exist_ok=True)
+            self.embedder.embed(texts).tofile(self.vectors_filename)
+            self._save_meta({"config": self.embedder.get_config(), "rows": len(ids),
+                             "ids": {project_id: [row, fingerprint] for row, (project_id, fingerprint) in enumerate(zip(ids, fingerprints))}})
+            return
+
+        stored = meta["ids"]
+        edited = [i for i, project_id in enumerate(ids) if project_id in stored and stored[project_id][1] != fingerprints[i]]
+        added = [i for i, project_id in enumerate(ids) if project_id not in stored]
+        current_ids = set(ids)
+        removed = [project_id for project_id in stored if project_id not in current_ids]
+        logger.info(f"Update embeddings: {len(added)} new, {len(edited)} edited and {len(removed)} removed projects")
+
+        if edited:
+            vectors = self._open_vectors(meta["rows"], mode="r+")
+            vectors[[stored[ids[i]][0] for i in edited]] = self.embedder.embed([texts[i] for i in edited])
+            vectors.flush()
+            del vectors
+        if added:
+            with open(self.vectors_filename, "ab") as f:
+                self.embedder.embed([texts[i] for i in added]).tofile(f)
+        for i in edited:
+            stored[ids[i]][1] = fingerprints[i]
+        for n, i in enumerate(added):
+            stored[ids[i]] = [meta["rows"] + n, fingerprints[i]]
+        meta["rows"] += len(added)
+        for project_id in removed:
+            del stored[project_id]
+
+        if len(stored) < meta["rows"] / 2:
+            logger.info(f"Compact embeddings ({len(stored)} of {meta['rows']} rows in use)")
+            vectors = np.array(self._open_vectors(meta["rows"])[[row for row, fingerprint in stored.values()]])
+            vectors.tofile(f"{self.vectors_filename}.tmp")
+            os.replace(f"{self.vectors_filename}.tmp", self.vectors_filename)
+            meta["ids"] = {project_id: [row, fingerprint] for row, (project_id, (old_row, fingerprint)) in enumerate(stored.items())}
+            meta["rows"] = len(stored)
+        self._save_meta(meta)
+
+    def get_vectors(self, project_ids):
+        """Return the vectors of the given projects (zero vectors for projects without stored vector)."""
+        meta = self._load_meta()
+        result = np.zeros((len(project_ids), self.embedder.dim), dtype=np.float32)
+        if meta is None:
+            return result
+        rows = np.array([meta["ids"].get(str(project_id), [-1])[0] for project_id in project_ids], dtype=np.int64)
+        vectors = self._open_vectors(meta["rows"])
+        result[rows >= 0] = vectors[rows[rows >= 0]]
+        return result
+
+    def similarity(self, project_ids, query_text):
+        """Return the cosine similarity of each project's text with ``query_text``."""
+        return self.get_vectors(project_ids) @ self.embedder.embed_text(query_text)
+
+    def exists(self):
+        """Return True if vectors have been stored with the settings of the embedder."""
+        return self._load_meta() is not None
+
+
+class IVFIndex():
+    """Approximate nearest-neighbour index (inverted file) over the vectors of an ``EmbeddingStore``.
+
+    The vectors are clustered with spherical k-means; each vector is assigned to the
+    list of its closest centroid. A query only compares the vectors in the lists of
+    the ``n_probe`` centroids closest to it, which takes milliseconds instead of a
+    scan of the whole matrix. The vectors themselves stay in the store's memory-mapped
+    matrix; the index only stores the centroids and the list of each row in
+    ``<directory>/<name>_ivf.npz``.
+    """
+
+    def __init__(self, store, n_probe=8, name="ft"):
+        """Initialize with the embedding store and the number of lists searched per query."""
+        self.store = store
+        self.n_probe = n_probe
+        self.filename = os.path.join(store.directory, f"{name}_ivf.npz")
+        self.centroids = None
+        self.assignments = None
+        self.indexed = None
+        self.trained_rows = 0
+        self._lists = None
+
+    def load(self):
+        """Load the saved index; returns False if there is none."""
+        try:
+            data = np.load(self.filename)
+        except FileNotFoundError:
+            return False
+        self.centroids = data["centroids"]
+        self.assignments = data["assignments"]
+        self.trained_rows = int(data["trained_rows"])
+        self.indexed = json.loads(str(data["indexed"]))
+        self._lists = None
+        return True
+
+    def save(self):
+        """Save the index atomically."""
+        with open(f"{self.filename}.tmp", "wb") as f:
+            np.savez(f, centroids=self.centroids, assignments=self.assignments, trained_rows=self.trained_rows,
+                     indexed=json.dumps(self.indexed))
+        os.replace(f"{self.filename}.tmp", self.filename)
+
+    def _assign(self, vectors):
+        """Return the closest centroid of each vector, in chunks to limit memory."""
+        assignments = np.zeros(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), 10000):
+            assignments[start:start+10000] = np.argmax(np.asarray(vectors[start:start+10000]) @ self.centroids.T, axis=1)
+        return assignments
+
+    def _train(self, vectors, n_lists, iterations=10, seed=0):
+        """Compute the centroids with spherical k-means on (a sample of) the vectors."""
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), min(len(vectors), 256 * n_lists), replace=False))])
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=n_lists) == 0
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.where(norms > 0, norms, 1)
+        return centroids.astype(np.float32)
+
+    def build(self):
+        """Cluster all stored vectors and assign them to their lists."""
+        meta = self.store._load_meta()
+        if meta is None or not meta["ids"]:
+            logger.info("No embeddings to index")
+            return
+        vectors = self.store._open_vectors(meta["rows"])
+        rows = np.array([row for row, fingerprint in meta["ids"].values()], dtype=np.int64)
+        n_lists = max(1, min(int(np.sqrt(len(rows))), len(rows)))
+        logger.info(f"Build IVF index of {len(rows)} vectors with {n_lists} lists")
+        self.centroids = self._train(vectors[np.sort(rows)], n_lists)
+        self.assignments = np.full(meta["rows"], -1, dtype=np.int32)
+        self.assignments[rows] = self._assign(vectors[rows])
+        self.indexed = meta["ids"]
+        self.trained_rows = len(rows)
+        self._lists = None
+        self.save()
+
+    def update(self):
+        """Insert the vectors added or edited since the last update and drop removed ones.
+
+        The index is rebuilt if there is none yet, if the store was compacted or if the
+        number of vectors has more than doubled since the centroids were computed.
+        """
+        meta = self.store._load_meta()
+        if meta is None:
+            return
+        if not self.load() or len(self.assignments) > meta["rows"] or len(meta["ids"]) > 2 * self.trained_rows or \
+                self.centroids.shape[1] != self.store.embedder.dim or \
+                any(project_id in self.indexed and self.indexed[project_id][0] != row for project_id, (row, fingerprint) in meta["ids"].items()):
+            self.build()
+            return
+        changed = [row for project_id, (row, fingerprint) in meta["ids"].items() if self.indexed.get(project_id) != [row, fingerprint]]
+        removed = [row for project_id, (row, fingerprint) in self.indexed.items() if project_id not in meta["ids"]]
+        assignments = np.full(meta["rows"], -1, dtype=np.int32)
+        assignments[:len(self.assignments)] = self.assignments
+        assignments[removed] = -1
+        if changed:
+            assignments[changed] = self._assign(self.store._open_vectors(meta["rows"])[changed])
+        logger.info(f"Update IVF index: {len(changed)} vectors inserted, {len(removed)} removed")
+        self.assignments = assignments
+        self.indexed = meta["ids"]
+        self._lists = None
+        self.save()
+
+    def _get_lists(self):
+        """Return the rows sorted by list, the start of each list in it and the project id of each row."""
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable")
+            order = order[self.assignments[order] >= 0]
+            starts = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+            ids_by_row = np.empty(len(self.assignments), dtype=object)
+            for project_id, (row, fingerprint) in self.indexed.items():
+                ids_by_row[row] = project_id
+            self._lists = (order, starts, ids_by_row)
+        return self._lists
+
+    def query(self, vector, k=10, exclude_ids=()):
+        """Return the (approximately) ``k`` most similar projects to ``vector``.
+
+        Returns:
+            list: (project id, cosine similarity) pairs, most similar first
+        """
+        if self.centroids is None and not self.load():
+            return []
+        order, starts, ids_by_row = self._get_lists()
+        probes = np.argsort(-(self.centroids @ vector))[:self.n_probe]
+        rows = np.sort(np.concatenate([order[starts[probe]:starts[probe+1]] for probe in probes]))
+        if len(rows) == 0:
+            return []
+        meta_rows = len(self.assignments)
+        scores = self.store._open_vectors(meta_rows)[rows] @ vector
+        ranking = np.argsort(-scores, kind="stable")
+        result = []
+        for i in ranking:
+            project_id = ids_by_row[rows[i]]
+            if project_id in exclude_ids:
+                continue
+            result.append((project_id, float(scores[i])))
+            if len(result) == k:
+                break
+        return result
+
+    def similar_projects(self, project_id, k=10):
+        """Return the ``k`` projects most similar to the project with the given id (without itself)."""
+        vector = self.store.get_vectors([project_id])[0]
+        if not vector.any():
+            return []
+        return self.query(vector, k=k, exclude_ids={str(project_id)})
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 import matplotlib as mpl
+mpl.use("Agg") #charts are only written to files, also from worker processes
 import matplotlib.pyplot as plt
 import datetime
 import os
@@ -14,13 +15,24 @@ import pickle
 import logging
 import matplotlib.ticker as ticker
 import textwrap
-plt.style.use('default')
-plt.rc('axes',edgecolor='#6d6d6d')
-mpl.rcParams['text.color'] = '#6d6d6d'
-mpl.rcParams['axes.labelcolor'] = '#6d6d6d'
+import multiprocessing
+import types
+from data_utils import fingerprint
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 logger = logging.getLogger(__name__)
 
 
+def set_chart_style():
+    """Set the matplotlib style of the evaluation charts."""
+    plt.style.use('default')
+    plt.rc('axes',edgecolor='#6d6d6d')
+    mpl.rcParams['text.color'] = '#6d6d6d'
+    mpl.rcParams['axes.labelcolor'] = '#6d6d6d'
+
+
+set_chart_style()
+
+
 
 def create_year_list(start_year, end_year): 
         years_int = np.arange(start_year, end_year +1)
@@ -31,13 +43,213 @@ def create_year_list(start_year, end_year):
         return years_str
 
 
-class Evaluation():
+def expand_years(orga_df, columns):
+    """Repeat each organization once for every year of its project (from startDate to endDate).
+
+    The year is stored as January 1st in column ecSignatureDate; apart from it only
+    ``columns`` are kept. Organizations without start or end date are left out.
+
+    Args:
+        orga_df: Organizations with startDate and endDate
+        columns: Columns to keep
+
+    Returns:
+        DataFrame: One row per organization and year
+    """
+    orga_df = orga_df[orga_df["startDate"].notna() & orga_df["endDate"].notna()]
+    start_years = orga_df["startDate"].dt.year.to_numpy(dtype=np.int64)
+    number_of_years = np.clip(orga_df["endDate"].dt.year.to_numpy(dtype=np.int64) - start_years + 1, 0, None)
+    rows = np.repeat(np.arange(len(orga_df)), number_of_years)
+    first_rows = np.repeat(np.cumsum(number_of_years) - number_of_years, number_of_years)
+    years = start_years[rows] + np.arange(len(rows)) - first_rows
+    expanded_df = orga_df[columns].iloc[rows].reset_index(drop=True)
+    expanded_df["ecSignatureDate"] = pd.to_datetime(pd.DataFrame({"year": years, "month": 1, "day": 1}))
+    return expanded_df
+
+
+def aggregate_over_time(df, dimension, value_column, date_column, agg="sum"):
+    """Aggregate a column for every combination of dimension value and year in one grouped aggregation.
+
+    Args:
+        df: Data to aggregate
+        dimension: Column name (or array aligned with ``df``) whose values are the first level of the result
+        value_column: Column to aggregate
+        date_column: Datetime column that decides the year
+        agg: Aggregation, e.g. "sum" or "count"
+
+    Returns:
+        dict: For each dimension value a dict mapping the years (as strings) with data to the aggregated value
+    """
+    keys = df[dimension] if isinstance(dimension, str) else dimension
+    grouped = df[value_column].groupby([keys, df[date_column].dt.year], observed=True).agg(agg)
+    result = dict()
+    for (key, year), value in grouped.items():
+        result.setdefault(key, dict())[str(int(float(year)))] = value
+    return result
+
+
+def to_year_dicts(aggregates, keys, years, totals=None):
+    """Turn aggregates as returned by ``aggregate_over_time`` into the result format of the evaluations.
+
+    Args:
+        aggregates: Dict of dicts mapping years to values, for each dimension value
+        keys: Dimension values of the result, in this order
+        years: Years (as strings) of the result
+        totals: Optional dict mapping years to totals, the values are then given as percentage of the total
+
+    Returns:
+        dict: For each key a dict mapping ``years`` to the value as float (0 for years without data)
+    """
+    result = dict()
+    for key in keys:
+        year_dict = dict.fromkeys(years, 0)
+        for year, value in aggregates.get(key, dict()).items():
+            if year in year_dict:
+                year_dict[year] = float(value)/totals[year]*100 if totals is not None else float(value)
+        result[key] = year_dict
+    return result
+
+
+def get_group_labels(values, groups):
+    """Return the label of the group of each value (None for values in no group), the groups must not overlap."""
+    group_labels = np.full(len(values), None, dtype=object)
+    for group_label, group in groups.items():
+        group_labels[values.isin(group).to_numpy() & (group_labels == None)] = group_label
+    return group_labels
+
+
+def sum_by_dimension_over_time(df, dimension, value_column, date_column, years):
+    """Sum a column per value of a dimension and year.
+
+    Returns:
+        dict: For each value of ``dimension`` (sorted) a dict mapping ``years`` to the sum (0 for years without data)
+    """
+    sums = aggregate_over_time(df, dimension, value_column, date_column, agg="sum")
+    return to_year_dicts(sums, np.unique(np.asarray(df[dimension])), years)
+
+
+def count_by_group_over_time(expanded_df, group_column, groups, years, fraction=True):
+    """Count the organizations with known contribution per group and year.
+
+    Args:
+        expanded_df: Organizations per year, as returned by ``expand_years``
+        group_column: Column that decides the group of an organization
+        groups: Dict mapping group labels to the (non-overlapping) values of ``group_column`` belonging to the group
+        years: Years (as strings) of the result
+        fraction: Return percentages of all organizations of the year instead of absolute numbers
+
+    Returns:
+        dict: For each group label a dict mapping the years to the count (0 for years without organizations of the group)
+    """
+    group_labels = get_group_labels(expanded_df[group_column], groups)
+    counts = aggregate_over_time(expanded_df, group_labels, "ecMaxContribution", "ecSignatureDate", agg="count")
+    totals = aggregate_over_time(expanded_df, np.zeros(len(expanded_df)), "ecMaxContribution", "ecSignatureDate", agg="count").get(0, dict())
+    return to_year_dicts(counts, groups, years, totals=totals if fraction else None)
+
+
+COUNTRY_GROUPS = {
+    "Widening Countries (EU)": ["BG", "HR", "CY", "CZ", "EE", "EL", "HU", "LV", "LT", "MT", "PL", "PT", "RO", "SK","SI"],
+    "Other EU": ["AT", "BE", "DE", "DK","ES", "FI", "FR", "IT", "NL", "SE", "IE","LU", "UK"]
+}
+
+ORGANIZATION_TYPE_GROUPS = {'Private entities': ['PRC'], 'Public / academic entities': ['HES', 'PUB', 'REC'], 'Unknown': ['nan', 'OTH']}
+
+
+def get_country_groups(countries):
+    """Return the country groups, with all ``countries`` not belonging to another group as group "Non-EU"."""
+    country_groups = copy.deepcopy(COUNTRY_GROUPS)
+    existing_codes = set(country_groups.keys())
+    for group in country_groups.values():
+        existing_codes.update(group)
+    country_groups["Non-EU"] = list(set(countries) - existing_codes)
+    return country_groups
+
+
+class EvaluationCube():
+    """Facts shared by all evaluations of a workflow run.
+
+    Holds the projects and the organizations repeated for each year of their project
+    (with country group and type group), both prepared only once. The aggregates the
+    evaluations query are computed with one grouped aggregation each and memoized, so
+    further charts on the same dimensions do not pass over the data again.
+    """
+
     def __init__(self, project_df, orga_df):
+        """Initialize with the projects and organizations of the workflow run (facts are built on first use)."""
+        self.project_df = project_df
+        self.orga_df = orga_df
+        self._orga_years_df = None
+        self._country_groups = None
+        self._aggregates = dict()
+
+    def get_orga_years(self):
+        """Return the organizations repeated for each year of their project, with columns countryGroup and typeGroup.
+
+        UK organizations with grants signed after the UK left the EU get the pseudo-country "UKnoteu" (in ``orga_df``).
+        """
+        if self._orga_years_df is None:
+            logger.info('Build organization-year facts of the evaluation cube')
+            #create new pseudo-country for UK when it was still part of the EU
+            if isinstance(self.orga_df["country"].dtype, pd.CategoricalDtype) and "UKnoteu" not in self.orga_df["country"].cat.categories:
+                self.orga_df["country"] = self.orga_df["country"].cat.add_categories(["UKnoteu"])
+            self.orga_df.loc[(self.orga_df["ecSignatureDate"].dt.date > datetime.date(2020, 2, 1)) & (self.orga_df["country"] == "UK"), "country"] = "UKnoteu"
+            orga_years_df = expand_years(self.orga_df, ["country", "type", "ecMaxContribution"])
+            self._country_groups = get_country_groups(orga_years_df["country"])
+            orga_years_df["countryGroup"] = get_group_labels(orga_years_df["country"], self._country_groups)
+            orga_years_df["typeGroup"] = get_group_labels(orga_years_df["type"], ORGANIZATION_TYPE_GROUPS)
+            self._orga_years_df = orga_years_df
+        return self._orga_years_df
+
+    def get_country_groups(self):
+        """Return the country groups, including the "Non-EU" group of all other countries."""
+        self.get_orga_years()
+        return self._country_groups
+
+    def aggregate(self, table, dimension, value_column, date_column, agg):
+        """Return the memoized aggregates over time of table "projects" or "orga_years", see ``aggregate_over_time``.
+
+        A ``dimension`` of None aggregates over all rows (key 0).
+        """
+        key = (table, dimension, value_column, date_column, agg)
+        if key not in self._aggregates:
+            df = self.project_df if table == "projects" else self.get_orga_years()
+            keys = dimension if dimension is not None else np.zeros(len(df))
+            self._aggregates[key] = aggregate_over_time(df, keys, value_column, date_column, agg=agg)
+        return self._aggregates[key]
+
+    def sum_over_time(self, dimension, date_column, years):
+        """Return the funding per value of a project dimension and year, in the result format of the evaluations."""
+        sums = self.aggregate("projects", dimension, "ecMaxContribution", date_column, "sum")
+        return to_year_dicts(sums, np.unique(np.asarray(self.project_df[dimension])), years)
+
+    def count_over_time(self, group_column, group_labels, years, fraction=True):
+        """Return the number (or percentage) of organizations with known contribution per group and year."""
+        counts = self.aggregate("orga_years", group_column, "ecMaxContribution", "ecSignatureDate", "count")
+        totals = self.aggregate("orga_years", None, "ecMaxContribution", "ecSignatureDate", "count").get(0, dict())
+        return to_year_dicts(counts, group_labels, years, totals=totals if fraction else None)
+
+    def total_by(self, dimension):
+        """Return the total funding per value of a project dimension (Series)."""
+        key = ("projects", dimension, "ecMaxContribution")
+        if key not in self._aggregates:
+            self._aggregates[key] = self.project_df["ecMaxContribution"].groupby(self.project_df[dimension], observed=True).sum()
+        return self._aggregates[key]
+
+
+class Evaluation():
+    def __init__(self, project_df, orga_df, cube=None):
         self.project_df = project_df
         self.orga_df = orga_df
+        self.cube = cube
         self.result = None
         logging.info('Evaluation initialized')
 
+    def get_cube(self):
+        """Return the evaluation cube shared with the other evaluations of the run (or one of its own)."""
+        if self.cube is None:
+            self.cube = EvaluationCube(self.project_df, self.orga_df)
+        return self.cube
+
     def get_result(self):
         logging.info('Return evaluation result')
         return self.result
@@ -48,18 +260,7 @@ class TotalFundingByFPOverTime(Evaluation):
     def evaluate(self, start_year, end_year):
         xyears = create_year_list(start_year, end_year)
         self.xyears = xyears
-        fund_dat = dict()
-        for agency in np.unique(np.asarray(self.project_df["programAbbreviation"])):
-            year_dict = copy.deepcopy(dict.fromkeys(self.xyears,0))
-            topic_project_df_filtered_filtered = self.project_df
-            topic_project_df_filtered_filtered = topic_project_df_filtered_filtered[topic_project_df_filtered_filtered["programAbbreviation"] == agency]
-            query = topic_project_df_filtered_filtered["ecMaxContribution"].groupby(topic_project_df_filtered_filtered["ecSignatureDate"].dt.year).sum()
-            
-            for key, value in dict(query).items():
-                yr = str(int(float(key)))
-                if yr in year_dict.keys():
-                    year_dict[yr] = float(value)
-            fund_dat[agency]  = year_dict
+        fund_dat = self.get_cube().sum_over_time("programAbbreviation", "ecSignatureDate", self.xyears)
 
         self.result = fund_dat
         return fund_dat
@@ -93,23 +294,14 @@ class TotalFundingByFPOverTime(Evaluation):
         x = list(range(len(self.xyears)))
         plt.text(-1, -0.18, tt, ha='left', va='top', fontdict={"size": 6});
         plt.savefig(filename, dpi=250)
+        plt.close()
 
 
 class TotalFundingByLLMCategoryOverTime(Evaluation):
 
     def evaluate(self, start_year, end_year):
         self.xyears = create_year_list(start_year, end_year)
-        fund_dat = dict()
-        for agency in np.unique(np.asarray(self.project_df["LLMCategory"])):
-            year_dict = copy.deepcopy(dict.fromkeys(self.xyears,0))
-            topic_project_df_filtered_filtered = self.project_df
-            topic_project_df_filtered_filtered = topic_project_df_filtered_filtered[topic_project_df_filtered_filtered["LLMCategory"] == agency]
-            query = topic_project_df_filtered_filtered["ecMaxContribution"].groupby(topic_project_df_filtered_filtered["startDate"].dt.year).sum()
-            for key, value in dict(query).items():
-                yr = str(int(float(key)))
-                if yr in year_dict.keys():
-                    year_dict[yr] = float(value)
-            fund_dat[agency]  = year_dict
+        fund_dat = self.get_cube().sum_over_time("LLMCategory", "startDate", self.xyears)
 
         self.result = fund_dat
         return fund_dat
@@ -152,60 +344,18 @@ class TotalFundingByLLMCategoryOverTime(Evaluation):
         x = list(range(len(self.xyears)))
         plt.text(-1, -0.1, tt, ha='left', va='top', fontdict={"size": 6});
         plt.savefig(filename, dpi=250)
+        plt.close()
 
 
 class OrganizationsByCountryGroupOverTime(Evaluation):
 
     def evaluate(self, start_year, end_year, fraction = True):
-        #create new pseudo-country for UK when it was still part of the EU
-        self.orga_df.loc[(self.orga_df["ecSignatureDate"].dt.date > datetime.date(2020, 2, 1)) & (self.orga_df["country"] == "UK"), "country"] = "UKnoteu" #create new pseudo-country for UK when it was still part of the EU
-
-        revised_orga_df = pd.DataFrame(columns=self.orga_df.columns)
-
-        #go through each orga in orga_df. for each year lying between startdate and enddate of orga, append orga to revised_orga_df
-        rows = []
-        for index, row in self.orga_df.iterrows():
-            proj_start_year = row["startDate"].year
-            proj_end_year = row["endDate"].year
-            for year in range(proj_start_year, proj_end_year + 1):
-                new_row = row.copy()
-                new_row["ecSignatureDate"] = datetime.datetime(year, 1, 1)
-                rows.append(new_row)
-        revised_orga_df = pd.DataFrame(rows)
-        self.orga_df = revised_orga_df
-        #self.orga_df.to_csv('data/funding_and_tenders_organizations_alldone_new_revised.csv', index=False, sep=";")
-        
+        #organizations repeated for each year lying between startdate and enddate of orga (UK remapped after Brexit)
+        cube = self.get_cube()
+        self.orga_df = cube.get_orga_years()
 
         self.xyears = create_year_list(start_year, end_year)
-        country_groups = {
-            "Widening Countries (EU)": ["BG", "HR", "CY", "CZ", "EE", "EL", "HU", "LV", "LT", "MT", "PL", "PT", "RO", "SK","SI"],
-            "Other EU": ["AT", "BE", "DE", "DK","ES", "FI", "FR", "IT", "NL", "SE", "IE","LU", "UK"]
-        }
-
-        countries = set(list(self.orga_df["country"]))
-
-        existing_codes = set(country_groups.keys())
-        for group in country_groups.values():
-            existing_codes.update(group)
-
-        missing_codes = countries - existing_codes
-        country_groups["Non-EU"] = list(missing_codes)
-
-
-        fund_dat = dict()
-        for country_group_label, country_group in country_groups.items():
-            year_dict = copy.deepcopy(dict.fromkeys(self.xyears,0))
-            topic_organization_df_filtered_filtered = self.orga_df[self.orga_df["country"].isin(country_group)]
-            query = topic_organization_df_filtered_filtered["ecMaxContribution"].groupby(topic_organization_df_filtered_filtered["ecSignatureDate"].dt.year).count()
-            query_total = self.orga_df["ecMaxContribution"].groupby(self.orga_df["ecSignatureDate"].dt.year).count()
-            for key, value in dict(query).items():
-                yr = str(int(float(key)))
-                if yr in year_dict.keys():
-                    if fraction:
-                        year_dict[str(key)] = float(value)/query_total[key]*100
-                    else:
-                        year_dict[str(key)] = float(value)
-            fund_dat[ country_group_label ]  = year_dict
+        fund_dat = cube.count_over_time("countryGroup", cube.get_country_groups(), self.xyears, fraction=fraction)
 
         self.result = fund_dat
         return fund_dat
@@ -239,49 +389,19 @@ class OrganizationsByCountryGroupOverTime(Evaluation):
         tt = textwrap.fill(t, width=25.4*4.2)
         plt.text(-1, -22, tt, ha='left', va='top', fontdict={"size": 6});
         plt.savefig(filename, dpi=300)
-        print(self.orga_df)
+        plt.close()
 
 
 
 class OrganizationTypeByCountryGroupOverTime(Evaluation):
 
     def evaluate(self, start_year, end_year):
-        
-        #create new pseudo-country for UK when it was still part of the EU
-        self.orga_df.loc[(self.orga_df["ecSignatureDate"].dt.date > datetime.date(2020, 2, 1)) & (self.orga_df["country"] == "UK"), "country"] = "UKnoteu" #create new pseudo-country for UK when it was still part of the EU
-
-        revised_orga_df = pd.DataFrame(columns=self.orga_df.columns)
-
-        #go through each orga in orga_df. for each year lying between startdate and enddate of orga, append orga to revised_orga_df
-        rows = []
-        for index, row in self.orga_df.iterrows():
-            proj_start_year = row["startDate"].year
-            proj_end_year = row["endDate"].year
-            for year in range(proj_start_year, proj_end_year + 1):
-                new_row = row.copy()
-                new_row["ecSignatureDate"] = datetime.datetime(year, 1, 1)
-                rows.append(new_row)
-        revised_orga_df = pd.DataFrame(rows)
-        self.orga_df = revised_orga_df
-
-        
+        #organizations repeated for each year lying between startdate and enddate of orga
+        cube = self.get_cube()
+        self.orga_df = cube.get_orga_years()
 
         self.xyears = create_year_list(start_year, end_year)
-        country_groups = {'Private entities': ['PRC'], 'Public / academic entities': ['HES', 'PUB', 'REC'], 'Unknown': ['nan', 'OTH']}
-
-
-
-        fund_dat = dict()
-        for country_group_label, country_group in country_groups.items():
-            year_dict = copy.deepcopy(dict.fromkeys(self.xyears,0))
-            topic_organization_df_filtered_filtered = self.orga_df[self.orga_df["type"].isin(country_group)]
-            query = topic_organization_df_filtered_filtered["ecMaxContribution"].groupby(topic_organization_df_filtered_filtered["ecSignatureDate"].dt.year).count()
-            query_total = self.orga_df["ecMaxContribution"].groupby(self.orga_df["ecSignatureDate"].dt.year).count()
-            for key, value in dict(query).items():
-                yr = str(int(float(key)))
-                if yr in year_dict.keys():
-                    year_dict[str(key)] = float(value)/query_total[key]*100
-            fund_dat[ country_group_label ]  = year_dict
+        fund_dat = cube.count_over_time("typeGroup", ORGANIZATION_TYPE_GROUPS, self.xyears)
 
         self.result = fund_dat
         return fund_dat
@@ -315,7 +435,7 @@ class OrganizationTypeByCountryGroupOverTime(Evaluation):
         tt = textwrap.fill(t, width=25.4*4.2)
         plt.text(-1, -22, tt, ha='left', va='top', fontdict={"size": 6});
         plt.savefig(filename, dpi=250)
-        print(self.orga_df)
+        plt.close()
 
 
 
@@ -327,7 +447,7 @@ class TotalFundingbyFP(Evaluation):
 
     def evaluate(self, start_year, end_year):
     
-        pie_data = self.project_df["ecMaxContribution"].groupby(self.project_df["programAbbreviation"]).sum()
+        pie_data = self.get_cube().total_by("programAbbreviation")
         pie_threshold = 1e8
         pie_data_big = pie_data[pie_data>pie_threshold]
         pie_data_small = pie_data[pie_data<=pie_threshold]
@@ -350,6 +470,7 @@ class TotalFundingbyFP(Evaluation):
         tt = textwrap.fill(t, width=25.4*4.2)
         plt.text(-1, -22, tt, ha='left', va='top', fontdict={"size": 6});
         plt.savefig(filename, dpi=250)
+        plt.close()
 
 
 class CountryCollaborationGraph(Evaluation):
@@ -367,3 +488,120 @@ class CountryCollaborationGraph(Evaluation):
         tt = textwrap.fill(t, width=25.4*4.2)
         plt.text(-1, -22, tt, ha='left', va='top', fontdict={"size": 6});
         plt.savefig(filename, dpi=250)
+        plt.close()
+
+
+def render_chart(evaluation_class, result, xyears, filename):
+    """Render the chart of an evaluation result with ``plot_result`` of its class (runs in a worker process).
+
+    Args:
+        evaluation_class: Class of the evaluation
+        result: Result of ``evaluate``
+        xyears: Years of the evaluation (None for evaluations not over time)
+        filename: PNG file to write
+
+    Returns:
+        str: ``filename``
+    """
+    evaluation = evaluation_class(None, None)
+    evaluation.result = result
+    if xyears is not None:
+        evaluation.xyears = xyears
+    #the style is set again, other modules may have changed it since this module was imported
+    with mpl.rc_context():
+        set_chart_style()
+        try:
+            evaluation.plot_result(filename)
+        finally:
+            plt.close("all")
+    return filename
+
+
+def write_json(result, filename):
+    """Write an evaluation result as JSON."""
+    with open(filename, 'w') as f:
+        json.dump(result, f)
+    return filename
+
+
+def get_code_fingerprint(code):
+    """Return a hash of the bytecode, names and constants of a code object (including nested code objects)."""
+    consts = []
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            consts.append(get_code_fingerprint(const))
+        elif isinstance(const, frozenset):
+            #the order of sets depends on the hash seed of the process
+            consts.append(sorted(map(repr, const)))
+        else:
+            consts.append(repr(const))
+    return fingerprint(code.co_code.hex(), code.co_names, consts)
+
+
+def get_chart_fingerprint(evaluation_class, result, xyears):
+    """Return a hash of everything a chart depends on: its plotting code, the result and the years."""
+    return fingerprint(evaluation_class.__name__, get_code_fingerprint(evaluation_class.plot_result.__code__), result, xyears)
+
+
+class ChartRenderer():
+    """Renders the charts of evaluation results in worker processes and writes the JSON files in the background.
+
+    Only the results are sent to the workers, not the data the evaluations were computed from, so
+    the workflow can go on with the next evaluation while the charts are rendered. ``close`` waits
+    until all files are written and raises the first error of a render or write.
+    """
+
+    def __init__(self, max_workers=None, manifest=None):
+        """Initialize the renderer.
+
+        The worker processes are spawned, they import the main module of the program again. Its
+        code must therefore be behind an ``if __name__ == "__main__":`` guard, as in ``scheduler.py``.
+
+        Args:
+            max_workers: Number of rendering processes (None: one per CPU, at most 4; 0: render in the calling process when submitted)
+            manifest: Optional ``DeliverableManifest``, files whose content did not change are then not written again
+        """
+        self.max_workers = max_workers if max_workers is not None else min(4, os.cpu_count() or 1)
+        self.manifest = manifest
+        self.process_pool = None
+        self.write_pool = ThreadPoolExecutor(max_workers=1)
+        self.futures = []
+
+    def render(self, evaluation, filename):
+        """Submit the chart of an evaluated evaluation for rendering to ``filename``."""
+        #copied as the pool sends the arguments to the workers later, and plot_result modifies xyears
+        args = (type(evaluation), copy.deepcopy(evaluation.result), copy.copy(getattr(evaluation, "xyears", None)), filename)
+        if self.manifest is not None and self.manifest.is_unchanged(filename, get_chart_fingerprint(*args[:3])):
+            logger.info(f"Chart unchanged, skip {filename}")
+            return
+        if self.max_workers == 0:
+            render_chart(*args)
+            return
+        if self.process_pool is None:
+            #spawn instead of fork, the workflow process may hold threads and open database connections
+            self.process_pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        self.futures.append(self.process_pool.submit(render_chart, *args))
+
+    def write_json(self, result, filename):
+        """Submit an evaluation result for writing as JSON to ``filename``."""
+        if self.manifest is not None and self.manifest.is_unchanged(filename, fingerprint(result)):
+            logger.info(f"Result unchanged, skip {filename}")
+            return
+        self.futures.append(self.write_pool.submit(write_json, copy.deepcopy(result), filename))
+
+    def wait(self):
+        """Wait until all submitted charts and JSON files are written."""
+        futures, self.futures = self.futures, []
+        for future in futures:
+            filename = future.result()
+            logger.info(f"Written {filename}")
+
+    def close(self):
+        """Wait for all submitted files and stop the workers."""
+        try:
+            self.wait()
+        finally:
+            if self.process_pool is not None:
+                self.process_pool.shutdown()
+                self.process_pool = None
+            self.write_pool.shutdown()
@@ -16,8 +16,17 @@ import pickle
 import time
 import logging
 import openai
+import re
+import shutil
+import sqlite3
+import hashlib
+from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.parquet as pq
 #from langchain_ollama import OllamaLLM
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from data_utils import RateLimiter
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -35,6 +44,282 @@ def find_all(a_str, sub):
         yield start
         start += len(sub)
 
+def trie_regex(words):
+    """Build a regular expression matching any of ``words``, with common prefixes factored out.
+
+    The regex engine walks such a pattern like a prefix tree, so the cost of trying
+    it at a position hardly grows with the number of words.
+    """
+    trie = dict()
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, dict())
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            pattern = "(?:" + pattern + ")?"
+        return pattern
+
+    return build(trie)
+
+
+class KeywordMatcher():
+    """Find the occurrences of all keywords of a list in a single scan of a text.
+
+    All keywords are compiled into one prefix-tree regular expression inside a
+    lookahead, which stops at every position where at least one keyword starts,
+    including overlapping ones. Only these positions are inspected further, so the
+    cost of a scan hardly depends on the number of keywords. Occurrences are
+    reported exactly like ``find_all`` reports them for each keyword separately
+    (i.e. non-overlapping per keyword).
+    """
+
+    def __init__(self, keyword_list):
+        """Compile the matcher for the given keywords."""
+        self.keyword_list = list(keyword_list)
+        keywords = sorted({word for word in self.keyword_list if word})
+        self.pattern = re.compile("(?=" + trie_regex(keywords) + ")") if keywords else None
+        self.keywords_by_first_char = dict()
+        for word in keywords:
+            self.keywords_by_first_char.setdefault(word[0], []).append(word)
+
+    def find_positions(self, text):
+        """Return a dict mapping each keyword found in ``text`` to the list of its positions."""
+        positions = dict()
+        if self.pattern is None:
+            return positions
+        next_free = dict()
+        for match in self.pattern.finditer(text):
+            pos = match.start()
+            for word in self.keywords_by_first_char[text[pos]]:
+                if pos >= next_free.get(word, 0) and text.startswith(word, pos):
+                    positions.setdefault(word, []).append(pos)
+                    next_free[word] = pos + len(word)
+        return positions
+
+    def score(self, text, keyword_list=None, positions=None):
+        """Return the position-weighted match score and the list of matched keywords of ``text``.
+
+        Args:
+            text: Lowercased text to score
+            keyword_list: Keywords to score with (default: all keywords of the matcher)
+            positions: Result of ``find_positions(text)``, to score several keyword lists with one scan
+        """
+        if positions is None:
+            positions = self.find_positions(text)
+        match_score = 0
+        match_words = []
+        for word in (self.keyword_list if keyword_list is None else keyword_list):
+            word_positions = positions.get(word)
+            if word_positions:
+                for pos in word_positions:
+                    match_score += (1-(pos/float(len(text))))
+                match_words.append(word)
+        return match_score, match_words
+
+
+class InvertedIndex():
+    """On-disk inverted index of the lowercased project texts (title + objective).
+
+    Every maximal run of word characters (``\\w+``) of a text is a term; the index
+    maps each term to the documents and character positions where it occurs and
+    keeps the texts themselves for verification. Keyword match scores are computed
+    from the index by touching only the postings of the terms that can contain the
+    keyword, so trying out a new keyword list does not require a full scan of the
+    corpus. The scores are identical to those of ``KeywordMatchScorer``.
+    """
+
+    def __init__(self, filename):
+        """Open the index stored in ``filename`` (it is created by ``build``)."""
+        self.filename = filename
+        self.vocabulary = None
+        self.terms = None
+        self.term_starts = None
+        self.snapshot = None
+        if os.path.exists(filename):
+            with sqlite3.connect(filename) as conn:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'snapshot'").fetchone()
+            self.snapshot = json.loads(row[0]) if row else None
+
+    def build(self, project_df, snapshot=None):
+        """(Re)build the index for the projects in ``project_df`` (columns id, title and objective).
+
+        Args:
+            project_df: Projects to index
+            snapshot: Version of the raw data snapshot the projects come from
+        """
+        logger.info(f"Build inverted index of {len(project_df)} projects")
+        term_ids = dict()
+        postings_terms, postings_docs, postings_positions = [], [], []
+        docs = []
+        for doc, (project_id, title, objective) in enumerate(zip(np.asarray(project_df["id"]), np.asarray(project_df["title"]),
+                                                                  np.asarray(project_df["objective"]))):
+            sentence = (str(title) + " " + str(objective)).lower()
+            docs.append((doc, str(project_id), len(sentence), sentence))
+            for match in re.finditer(r"\w+", sentence):
+                postings_terms.append(term_ids.setdefault(match.group(), len(term_ids)))
+                postings_docs.append(doc)
+                postings_positions.append(match.start())
+
+        postings_terms = np.asarray(postings_terms, dtype=np.int64)
+        postings_docs = np.asarray(postings_docs, dtype=np.int32)
+        postings_positions = np.asarray(postings_positions, dtype=np.int32)
+        order = np.argsort(postings_terms, kind="stable")
+        bounds = np.searchsorted(postings_terms[order], np.arange(len(term_ids) + 1))
+        postings_docs, postings_positions = postings_docs[order], postings_positions[order]
+
+        tmp_filename = f"{self.filename}.tmp"
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        conn = sqlite3.connect(tmp_filename)
+        with conn:
+            conn.executescript("""
+                CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE docs (doc INTEGER PRIMARY KEY, id TEXT, length INTEGER, text TEXT);
+                CREATE TABLE terms (term TEXT PRIMARY KEY, docs BLOB, positions BLOB);
+            """)
+            conn.execute("INSERT INTO meta VALUES ('snapshot', ?)", (json.dumps(snapshot),))
+            conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?)", docs)
+            conn.executemany("INSERT INTO terms VALUES (?, ?, ?)",
+                             ((term, postings_docs[bounds[i]:bounds[i+1]].tobytes(), postings_positions[bounds[i]:bounds[i+1]].tobytes())
+                              for term, i in term_ids.items()))
+        conn.close()
+        os.replace(tmp_filename, self.filename)
+        self.snapshot = snapshot
+        self.vocabulary = None
+        logger.info(f"Saved inverted index with {len(term_ids)} terms and {len(postings_docs)} postings to {self.filename}")
+
+    def _load_vocabulary(self, conn):
+        """Load all terms as one newline-separated string, searchable with regular expressions."""
+        terms = [row[0] for row in conn.execute("SELECT term FROM terms ORDER BY rowid")]
+        self.vocabulary = "\n".join(terms)
+        self.term_starts = np.cumsum([0] + [len(term) + 1 for term in terms[:-1]]) if terms else np.zeros(0, dtype=np.int64)
+        self.terms = terms
+
+    def _find_terms(self, run, prefix, suffix):
+        """Return the terms containing ``run`` (which have to start/end with it if ``prefix``/``suffix`` is set)."""
+        pattern = ("^" if prefix else "") + re.escape(run) + ("$" if suffix else "")
+        offsets = [match.start() for match in re.finditer(pattern, self.vocabulary, flags=re.MULTILINE)]
+        term_indices = np.unique(np.searchsorted(self.term_starts, offsets, side="right") - 1)
+        return [self.terms[i] for i in term_indices]
+
+    def _postings(self, conn, term):
+        """Return the document and position arrays of a term."""
+        docs, positions = conn.execute("SELECT docs, positions FROM terms WHERE term = ?", (term,)).fetchone()
+        return np.frombuffer(docs, dtype=np.int32), np.frombuffer(positions, dtype=np.int32)
+
+    def _texts(self, conn, docs, texts):
+        """Add the texts of ``docs`` that are not loaded yet to the cache ``texts``."""
+        missing = [doc for doc in docs if doc not in texts]
+        for i in range(0, len(missing), 500):
+            chunk = missing[i:i+500]
+            query = f"SELECT doc, text FROM docs WHERE doc IN ({','.join('?' * len(chunk))})"
+            texts.update(conn.execute(query, chunk))
+        return texts
+
+    @staticmethod
+    def _group_by_doc(docs, positions):
+        """Turn arrays of documents and positions into a dict mapping each document to its sorted positions."""
+        if len(docs) == 0:
+            return dict()
+        order = np.lexsort((positions, docs))
+        docs, positions = docs[order], positions[order]
+        bounds = np.flatnonzero(np.diff(docs)) + 1
+        starts = np.concatenate(([0], bounds))
+        return dict(zip(docs[starts].tolist(), (group.tolist() for group in np.split(positions, bounds))))
+
+    def _keyword_positions(self, conn, keyword, texts):
+        """Return a dict mapping documents to the positions of ``keyword``, as ``find_all`` would find them."""
+        runs = list(re.finditer(r"\w+", keyword))
+        if len(runs) == 1 and runs[0].group() == keyword:
+            # a single word fragment can only occur inside single terms: read the positions from the postings
+            all_docs, all_positions = [], []
+            for term in self._find_terms(keyword, prefix=False, suffix=False):
+                docs, positions = self._postings(conn, term)
+                for offset in find_all(term, keyword):
+                    all_docs.append(docs)
+                    all_positions.append(positions + offset)
+            if not all_docs:
+                return dict()
+            return self._group_by_doc(np.concatenate(all_docs), np.concatenate(all_positions))
+
+        if runs:
+            # every word fragment of the keyword is bounded by a non-word character of the keyword on at least one
+            # side, so it has a fixed place in the terms that fit it: this gives the candidate keyword positions
+            candidates = None
+            for run in runs:
+                prefix, suffix = run.start() > 0, run.end() < len(keyword)
+                keys = []
+                for term in self._find_terms(run.group(), prefix=prefix, suffix=suffix):
+                    docs, positions = self._postings(conn, term)
+                    offset = 0 if prefix else len(term) - len(run.group())
+                    starts = positions + offset - run.start()
+                    keys.append(docs[starts >= 0].astype(np.int64) * 2**32 + starts[starts >= 0])
+                keys = np.unique(np.concatenate(keys)) if keys else np.zeros(0, dtype=np.int64)
+                candidates = keys if candidates is None else np.intersect1d(candidates, keys, assume_unique=True)
+            candidate_positions = self._group_by_doc(candidates // 2**32, candidates % 2**32)
+        else:
+            candidate_positions = {row[0]: None for row in conn.execute("SELECT doc FROM docs")}
+
+        # check the non-word characters of the keyword in the texts and drop overlapping occurrences
+        self._texts(conn, sorted(candidate_positions), texts)
+        keyword_positions = dict()
+        for doc, positions in candidate_positions.items():
+            text = texts[doc]
+            if positions is None:
+                doc_positions = list(find_all(text, keyword))
+            else:
+                doc_positions, next_free = [], 0
+                for pos in positions:
+                    if pos >= next_free and text.startswith(keyword, pos):
+                        doc_positions.append(pos)
+                        next_free = pos + len(keyword)
+            if doc_positions:
+                keyword_positions[doc] = doc_positions
+        return keyword_positions
+
+    def match_scores(self, keyword_list):
+        """Compute the keyword match scores of all indexed projects.
+
+        Returns:
+            DataFrame: id, matchScore and matchWords of all projects, in the order they were indexed
+        """
+        conn = sqlite3.connect(self.filename)
+        if self.vocabulary is None:
+            self._load_vocabulary(conn)
+        ids, lengths = [], []
+        for project_id, length in conn.execute("SELECT id, length FROM docs ORDER BY doc"):
+            ids.append(project_id)
+            lengths.append(length)
+        texts = dict()
+        keyword_positions = {word: self._keyword_positions(conn, word, texts) for word in dict.fromkeys(keyword_list) if word}
+        conn.close()
+
+        # collect the hits of each document in the order of the keyword list, then score like the full scan
+        hits = dict()
+        for word in keyword_list:
+            for doc, positions in keyword_positions.get(word, {}).items():
+                hits.setdefault(doc, []).append((word, positions))
+        match_scores = [0] * len(ids)
+        match_wordss = [[] for _ in ids]
+        for doc, doc_hits in hits.items():
+            match_score = 0
+            length = float(lengths[doc])
+            for word, positions in doc_hits:
+                for pos in positions:
+                    match_score += (1-(pos/length))
+                match_wordss[doc].append(word)
+            match_scores[doc] = match_score
+        logger.info(f"Computed match scores from the inverted index: {len(hits)} matched projects")
+        return pd.DataFrame({"id": ids, "matchScore": match_scores, "matchWords": match_wordss})
+
+
 def split(delimiters, string, maxsplit=0):
     """Split string by multiple delimiters."""
     import re
@@ -51,11 +336,15 @@ class DimensionAdder():
 class KeywordMatchScorer(DimensionAdder):
     """Score projects based on keyword matches in titles and objectives."""
 
-    def __init__(self, project_df, orga_df, keyword_list):
-        """Initialize with project data and scoring keywords."""
+    def __init__(self, project_df, orga_df, keyword_list, index=None):
+        """Initialize with project data and scoring keywords.
+
+        If an ``InvertedIndex`` of the projects is given, the match scores are computed from it.
+        """
         self.project_df = project_df
         self.orga_df = orga_df
         self.keyword_list = keyword_list
+        self.index = index
         self.match_score = None
         self.match_wordss = None
         logger.info('Keyword Match Score Routine initialized')
@@ -65,12 +354,30 @@ class KeywordMatchScorer(DimensionAdder):
         logger.info('Return data')
         return self.project_df, self.orga_df
     
-    def get_filtered_data(self, threshold):
-        """Filter data based on match score threshold."""
+    def get_filtered_data(self, threshold, data_source=None, semantic_threshold=None):
+        """Filter data based on match score threshold.
+
+        If the scorer was only given the text columns of the projects, ``data_source``
+        (e.g. a ``FundingAndTenderPortal``) is used to load the remaining columns and
+        the organizations of the projects that pass the filter. If ``semantic_threshold``
+        is given, projects also need a semantic score (see ``add_semantic_score``) of at
+        least this value.
+        """
         logger.info(f"Apply match score filter to project data")
         project_df = self.project_df.sort_values(by='matchScore')
         topic_threshold = threshold
         topic_project_df = project_df[project_df["matchScore"] > topic_threshold]
+        if semantic_threshold is not None and "semanticScore" in topic_project_df.columns:
+            number_of_projects = len(topic_project_df)
+            topic_project_df = topic_project_df[topic_project_df["semanticScore"] >= semantic_threshold]
+            logger.info(f" --> The semantic score filter removes {number_of_projects - len(topic_project_df)} projects")
+        if data_source is not None:
+            logger.info(f"Load complete data of the {len(topic_project_df)} filtered projects")
+            score_columns = [column for column in ["id", "matchScore", "matchWords", "semanticScore"] if column in topic_project_df.columns]
+            scores = topic_project_df[score_columns].drop_duplicates(subset="id")
+            full_project_df, self.orga_df = data_source.load_saved_data(project_ids=scores["id"])
+            full_project_df = full_project_df.drop(columns=score_columns[1:], errors="ignore")
+            topic_project_df = full_project_df.merge(scores, on="id", how="inner").sort_values(by='matchScore')
         topic_project_df.to_csv('data/funding_and_tenders_projects_filtered.csv', index=False, sep=";")
         logger.info(f" --> There are {len(topic_project_df)} projects left after filtering (out of {len(project_df)})")
         logger.info(f"Apply match score filter to organization data")
@@ -80,6 +387,19 @@ class KeywordMatchScorer(DimensionAdder):
 
     def compute_add_match_score(self):
         """Calculate and add keyword match scores to projects."""
+        if self.index is not None:
+            score_df = self.index.match_scores(self.keyword_list)
+            if list(score_df["id"]) != [str(project_id) for project_id in self.project_df["id"]]:
+                score_df = score_df.drop_duplicates(subset="id").set_index("id").reindex(self.project_df["id"].astype(str))
+                score_df["matchScore"] = score_df["matchScore"].fillna(0)
+                score_df["matchWords"] = [words if isinstance(words, list) else [] for words in score_df["matchWords"]]
+            self.match_score = list(score_df["matchScore"])
+            self.match_words = list(score_df["matchWords"])
+            logger.info('Add match scores to dataset')
+            self.project_df['matchScore'] = self.match_score
+            self.project_df['matchWords'] = self.match_words
+            return
+
         project_ids = list(self.project_df["id"])
         complete_project_ids = np.asarray(self.project_df["id"])
         complete_project_objectives = np.asarray(self.project_df["objective"])
@@ -87,7 +407,8 @@ class KeywordMatchScorer(DimensionAdder):
 
         match_scores = []
         match_wordss = []
-        matched_project_ids = set()
+        number_of_matched_projects = 0
+        matcher = KeywordMatcher(self.keyword_list)
 
         logger.info('Start computing match scores based on keyword list')
         for j, project_id in enumerate(project_ids):
@@ -95,21 +416,14 @@ class KeywordMatchScorer(DimensionAdder):
             objective, title =complete_project_objectives[j], complete_project_titles[j]
             sentence = str(title) + " " + str(objective) 
             sentence = sentence.lower()
-            match_score = 0
-            match_words = []
-            for word in self.keyword_list:
-                if word in sentence:
-                        positions = find_all(sentence, word)
-                        cpos = 0
-                        for pos in positions:
-                            cpos+= 1
-                            match_score += (1-(pos/float(len(sentence))))
-                        matched_project_ids.add(project_id)
-                        match_words.append(word)
+            match_score, match_words = matcher.score(sentence)
+            if match_words:
+                number_of_matched_projects += 1
             #match_score = match_score/len(sentence)
             match_scores.append(match_score)
             match_wordss.append(match_words)
-            print(f"{j/float(len(project_ids))*100:.1f}% - Number of matched projects: {len(matched_project_ids)}", end="\r")
+            if j % 1000 == 0:
+                print(f"{j/float(len(project_ids))*100:.1f}% - Number of matched projects: {number_of_matched_projects}", end="\r")
 
         self.match_score = match_scores 
         self.match_words = match_wordss
@@ -118,6 +432,16 @@ class KeywordMatchScorer(DimensionAdder):
         self.project_df['matchScore'] = match_scores 
         self.project_df['matchWords'] = match_wordss
 
+    def add_semantic_score(self, embedding_store, query_text):
+        """Add the cosine similarity of each project with ``query_text`` as column semanticScore.
+
+        Args:
+            embedding_store: ``EmbeddingStore`` with the vectors of the projects
+            query_text: Description of the topic
+        """
+        logger.info('Add semantic scores to dataset')
+        self.project_df['semanticScore'] = embedding_store.similarity(list(self.project_df["id"]), query_text)
+
     def plot_matchscore_histogram(self, filename):
         """Generate histogram of project match scores."""
         logger.info('Generate match score histogram')
@@ -134,52 +458,459 @@ class KeywordMatchScorer(DimensionAdder):
 
 
 
+class MultiTopicMatchScorer():
+    """Score the projects for the keyword lists of several topics in one pass over the corpus.
+
+    The texts are lowercased once and scanned once with a matcher for the union of
+    all keywords; the positions found are then scored per topic exactly like
+    ``KeywordMatchScorer`` does. The result is a score table with one
+    ``<topic>_matchScore`` and ``<topic>_matchWords`` column per topic, which the
+    topic workflows read instead of scoring the corpus themselves.
+    """
+
+    def __init__(self, project_df, keyword_lists):
+        """Initialize with project texts (id, title, objective) and a dict mapping topic names to keyword lists."""
+        self.project_df = project_df
+        self.keyword_lists = {topic: list(keyword_list) for topic, keyword_list in keyword_lists.items()}
+        self.score_df = None
+        logger.info(f"Multi-topic keyword match score routine initialized for {', '.join(self.keyword_lists)}")
+
+    def compute_match_scores(self):
+        """Compute the match scores of all topics and return the score table."""
+        union_keywords = list(dict.fromkeys(word for keyword_list in self.keyword_lists.values() for word in keyword_list))
+        matcher = KeywordMatcher(union_keywords)
+        scores = {topic: ([], []) for topic in self.keyword_lists}
+
+        logger.info(f"Start computing match scores for {len(self.project_df)} projects and {len(union_keywords)} keywords")
+        for title, objective in zip(np.asarray(self.project_df["title"]), np.asarray(self.project_df["objective"])):
+            sentence = (str(title) + " " + str(objective)).lower()
+            positions = matcher.find_positions(sentence)
+            for topic, keyword_list in self.keyword_lists.items():
+                match_score, match_words = matcher.score(sentence, keyword_list, positions)
+                scores[topic][0].append(match_score)
+                scores[topic][1].append(match_words)
+
+        score_df = pd.DataFrame({"id": np.asarray(self.project_df["id"])})
+        for topic, (match_scores, match_wordss) in scores.items():
+            score_df[f"{topic}_matchScore"] = match_scores
+            score_df[f"{topic}_matchWords"] = match_wordss
+            logger.info(f" --> {topic}: {sum(1 for words in match_wordss if words)} matched projects")
+        self.score_df = score_df
+        return score_df
+
+    def save(self, filename, snapshot=None):
+        """Save the score table as Parquet file, together with the keyword lists and the corpus snapshot it was computed for."""
+        table = pa.Table.from_pandas(self.score_df, preserve_index=False)
+        metadata = {"keyword_lists": self.keyword_lists, "snapshot": snapshot}
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"match_scores": json.dumps(metadata).encode()})
+        pq.write_table(table, f"{filename}.tmp", compression="zstd")
+        os.replace(f"{filename}.tmp", filename)
+        logger.info(f"Saved match scores of {len(self.score_df)} projects to {filename}")
+
+    @staticmethod
+    def load_topic_scores(filename, topic, keyword_list, snapshot=None):
+        """Load the match scores of one topic from a score table.
+
+        Returns None if there is no score table, if it does not contain the topic, or if
+        it was computed with a different keyword list or for a different corpus snapshot.
+
+        Returns:
+            DataFrame: id, matchScore and matchWords of all projects (or None)
+        """
+        try:
+            metadata = pq.read_schema(filename).metadata or {}
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+        metadata = json.loads(metadata.get(b"match_scores", b"{}"))
+        if metadata.get("keyword_lists", {}).get(topic) != list(keyword_list) or metadata.get("snapshot") != snapshot:
+            logger.info(f"No up-to-date {topic} match scores in {filename}")
+            return None
+        score_df = pd.read_parquet(filename, columns=["id", f"{topic}_matchScore", f"{topic}_matchWords"])
+        score_df = score_df.rename(columns={f"{topic}_matchScore": "matchScore", f"{topic}_matchWords": "matchWords"})
+        score_df["matchWords"] = [list(words) for words in score_df["matchWords"]]
+        logger.info(f"Loaded {topic} match scores of {len(score_df)} projects from {filename}")
+        return score_df
+
+
+class LLMResponseCache():
+    """Persistent SQLite cache of LLM responses.
+
+    Responses are stored under a hash of the model, the prompt instruction and the
+    project description, so that only new or edited projects have to be sent to the
+    LLM. Each entry also carries the hash of model and prompt instruction only (its
+    namespace), which allows evicting everything that was generated with another
+    model or prompt.
+    """
+
+    def __init__(self, filename):
+        """Open (or create) the cache stored in ``filename``."""
+        self.filename = filename
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(filename)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, namespace TEXT, response TEXT,
+                                                                    created TEXT, last_used TEXT)""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_namespace ON responses (namespace)")
+
+    @staticmethod
+    def get_namespace(model, prompt_instruction):
+        """Return the hash identifying a combination of model and prompt instruction."""
+        return hashlib.sha256(json.dumps([model, prompt_instruction]).encode()).hexdigest()
+
+    @staticmethod
+    def get_key(model, prompt_instruction, text):
+        """Return the hash identifying the response to ``text`` for a model and prompt instruction."""
+        return hashlib.sha256(json.dumps([model, prompt_instruction, text]).encode()).hexdigest()
+
+    def get(self, model, prompt_instruction, text):
+        """Return the cached response (or None) and count the hit or miss."""
+        key = self.get_key(model, prompt_instruction, text)
+        row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.conn:
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (datetime.now().isoformat(), key))
+        return row[0]
+
+    def put(self, model, prompt_instruction, text, response):
+        """Store a response; empty responses (failed requests) are not cached."""
+        if not response:
+            return
+        now = datetime.now().isoformat()
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                              (self.get_key(model, prompt_instruction, text), self.get_namespace(model, prompt_instruction),
+                               response, now, now))
+
+    def evict(self, model, prompt_instruction, max_unused_days=None):
+        """Remove the responses of other models or prompt instructions, and those not used for ``max_unused_days``.
+
+        Returns:
+            int: Number of removed responses
+        """
+        with self.conn:
+            removed = self.conn.execute("DELETE FROM responses WHERE namespace != ?",
+                                        (self.get_namespace(model, prompt_instruction),)).rowcount
+            if max_unused_days is not None:
+                cutoff = (datetime.now() - timedelta(days=max_unused_days)).isoformat()
+                removed += self.conn.execute("DELETE FROM responses WHERE last_used < ?", (cutoff,)).rowcount
+        if removed:
+            logger.info(f"Evicted {removed} responses from LLM cache {self.filename}")
+        return removed
+
+    def stats(self):
+        """Return the hit/miss statistics and the number of cached responses."""
+        size = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0, "size": size}
+
+    def close(self):
+        """Close the cache."""
+        self.conn.close()
+
+
+class OpenAIBatchRunner():
+    """Runs JSONL batch files through the batch API of an OpenAI-compatible gateway."""
+
+    def __init__(self, client, completion_window="24h"):
+        """Initialize with an ``openai.OpenAI`` client."""
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, input_filename):
+        """Upload the batch file, start the batch job and return its id."""
+        with open(input_filename, "rb") as f:
+            batch_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=batch_file.id, endpoint="/v1/chat/completions",
+                                           completion_window=self.completion_window)
+        return batch.id
+
+    def poll(self, batch_id):
+        """Return the status of a batch job: "pending", "completed" or "failed"."""
+        status = self.client.batches.retrieve(batch_id).status
+        if status == "completed":
+            return "completed"
+        if status in ("failed", "expired", "cancelled"):
+            return "failed"
+        return "pending"
+
+    def download(self, batch_id, output_filename):
+        """Save the results of a completed batch job as JSONL file."""
+        batch = self.client.batches.retrieve(batch_id)
+        content = self.client.files.content(batch.output_file_id).text if batch.output_file_id else ""
+        with open(output_filename, "w") as f:
+            f.write(content)
+
+
+class DirectoryBatchRunner():
+    """Hands JSONL batch files off to another process through a directory.
+
+    A submitted batch is copied to ``<directory>/<batch id>.jsonl``; the batch is
+    completed as soon as the other process has written its results (in the format of
+    the OpenAI batch API) to ``<directory>/<batch id>.output.jsonl``, or failed if
+    it has written ``<directory>/<batch id>.failed``.
+    """
+
+    def __init__(self, directory):
+        """Initialize with the hand-off directory."""
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def submit(self, input_filename):
+        """Hand the batch file off and return the batch id."""
+        batch_id = f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        shutil.copyfile(input_filename, os.path.join(self.directory, f"{batch_id}.jsonl.tmp"))
+        os.replace(os.path.join(self.directory, f"{batch_id}.jsonl.tmp"), os.path.join(self.directory, f"{batch_id}.jsonl"))
+        return batch_id
+
+    def poll(self, batch_id):
+        """Return the status of a batch: "pending", "completed" or "failed"."""
+        if os.path.exists(os.path.join(self.directory, f"{batch_id}.output.jsonl")):
+            return "completed"
+        if os.path.exists(os.path.join(self.directory, f"{batch_id}.failed")):
+            return "failed"
+        return "pending"
+
+    def download(self, batch_id, output_filename):
+        """Copy the results of a completed batch."""
+        shutil.copyfile(os.path.join(self.directory, f"{batch_id}.output.jsonl"), output_filename)
+
+
 class LLMCategorizer(DimensionAdder):
     """Categorize projects using LLM-based analysis."""
 
-    def __init__(self, project_df, orga_df, prompt_instruction):
-        """Initialize with data and LLM prompt template."""
+    def __init__(self, project_df, orga_df, prompt_instruction, max_concurrency=8, requests_per_minute=None, tokens_per_minute=None,
+                 cache=None, pack_size=1):
+        """Initialize with data and LLM prompt template.
+
+        Args:
+            project_df: Projects to categorize
+            orga_df: Organizations of the projects
+            prompt_instruction: Instruction that is prepended to each project description
+            max_concurrency: Maximum number of requests to the LLM at the same time
+            requests_per_minute: Request budget of the LLM endpoint (None: unlimited)
+            tokens_per_minute: Token budget of the LLM endpoint, prompts are estimated at 4 characters per token (None: unlimited)
+            cache: Optional ``LLMResponseCache``, remote responses found in it are not requested again
+            pack_size: Number of project descriptions sent to the remote LLM in one request (1: one request per project)
+        """
         self.project_df = project_df
         self.orga_df = orga_df
         self.prompt_instruction = prompt_instruction
         self.api_key = None
         self.match_wordss = None
+        self.max_concurrency = max_concurrency
+        self.request_limiter = RateLimiter(requests_per_minute / 60.0 if requests_per_minute else None)
+        self.token_limiter = RateLimiter(tokens_per_minute / 60.0 if tokens_per_minute else None)
+        self.cache = cache
+        self.pack_size = max(1, pack_size)
         logger.info('LLM Categorization scheme routine initialized')
 
     def get_prompt(self, desc):
         """Generate LLM prompt from project description."""
         return self.prompt_instruction + '      "' + desc + '"'
 
+    def get_packed_prompt(self, descs):
+        """Generate one LLM prompt for several project descriptions, numbered from 1."""
+        prompt = self.prompt_instruction + f"""
+
+    Apply these instructions to each of the following {len(descs)} project descriptions separately. Answer with exactly one line per project description in the format <number>: <response>, where <number> is the number of the project description, and nothing else.
+"""
+        for i, desc in enumerate(descs):
+            prompt += f'\n{i+1}: "' + str(desc).replace("\n", " ") + '"'
+        return prompt
+
+    @staticmethod
+    def parse_packed_response(response, number_of_descs):
+        """Split the response to a packed prompt into the responses for each project description.
+
+        Returns:
+            dict: Response for each project description (by position) that could be parsed
+        """
+        responses = dict()
+        for line in (response or "").splitlines():
+            match = re.match(r'^\W*(\d+)\W*?[:.)]\s*(.+?)\s*$', line)
+            if match is None:
+                continue
+            i = int(match.group(1)) - 1
+            if 0 <= i < number_of_descs and i not in responses:
+                responses[i] = match.group(2).strip('"')
+        return responses
+
     def get_data(self):
         """Return categorized project and organization data."""
         logger.info('Return data')
         return self.project_df, self.orga_df
     
 
+    def _get_response(self, prompt, client, model):
+        """Request the category of one prompt from the remote LLM, respecting the request and token budgets."""
+        self.request_limiter.acquire()
+        self.token_limiter.acquire(len(prompt) / 4.0)
+        return make_chat_completion(prompt=prompt, model=model, client=client)
+
+    def _get_packed_responses(self, descs, client, model):
+        """Request the categories of several project descriptions at once.
+
+        Descriptions without (parseable) response in the packed answer are requested one by one.
+        """
+        if len(descs) == 1:
+            return [self._get_response(self.get_prompt(descs[0]), client, model)]
+        responses = self.parse_packed_response(self._get_response(self.get_packed_prompt(descs), client, model), len(descs))
+        if len(responses) < len(descs):
+            logger.info(f'    ---> {len(descs) - len(responses)} of {len(descs)} packed responses missing, request them separately')
+        return [responses[i] if i in responses else self._get_response(self.get_prompt(desc), client, model)
+                for i, desc in enumerate(descs)]
+
+    def export_batch(self, filename, model):
+        """Write the prompts of all projects without cached response as JSONL batch file.
+
+        The custom id of each request is the cache key of its response, so projects with
+        the same description are only requested once.
+
+        Returns:
+            int: Number of requests in the batch file
+        """
+        requests_by_key = dict()
+        for project_desc in self.project_df["objective"]:
+            if self.cache.get(model, self.prompt_instruction, project_desc) is None:
+                key = LLMResponseCache.get_key(model, self.prompt_instruction, project_desc)
+                requests_by_key[key] = {"custom_id": key, "method": "POST", "url": "/v1/chat/completions",
+                                        "body": {"model": model, "messages": [{"role": "user", "content": self.get_prompt(project_desc)}]}}
+        with open(filename, "w") as f:
+            for request in requests_by_key.values():
+                f.write(json.dumps(request) + "\n")
+        return len(requests_by_key)
+
+    def ingest_batch(self, filename, model):
+        """Store the responses of a batch result file in the cache.
+
+        Returns:
+            int: Number of responses ingested
+        """
+        descs_by_key = {LLMResponseCache.get_key(model, self.prompt_instruction, project_desc): project_desc
+                        for project_desc in self.project_df["objective"]}
+        ingested = 0
+        with open(filename) as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                    response = result["response"]["body"]["choices"][0]["message"]["content"]
+                except (ValueError, KeyError, IndexError, TypeError):
+                    continue
+                if result.get("custom_id") in descs_by_key and response:
+                    self.cache.put(model, self.prompt_instruction, descs_by_key[result["custom_id"]], response)
+                    ingested += 1
+        return ingested
+
+    def categorize_batch(self, runner, state_filename):
+        """Categorize projects with a batch job that may take longer than one workflow run.
+
+        The first call exports the prompts of all projects without cached response and
+        submits them with ``runner`` (``OpenAIBatchRunner`` or ``DirectoryBatchRunner``);
+        the batch id is kept in ``state_filename``. Later calls poll the job and, once it
+        is completed, ingest its results and add the categories like ``categorize``.
+        Projects without response in the results are requested directly.
+
+        Returns:
+            bool: True if the categories were added, False if the batch job is still pending
+        """
+        if self.cache is None:
+            self.cache = LLMResponseCache(":memory:")
+        model = os.getenv("lite_llm_model")
+        namespace = LLMResponseCache.get_namespace(model, self.prompt_instruction)
+        self.cache.evict(model, self.prompt_instruction)
+
+        state = None
+        if os.path.exists(state_filename):
+            with open(state_filename) as f:
+                state = json.load(f)
+            if state["namespace"] != namespace:
+                logger.info(f'Discard batch {state["batch_id"]}, it was submitted for another model or prompt')
+                state = None
+
+        if state is None:
+            input_filename = f"{os.path.splitext(state_filename)[0]}_input.jsonl"
+            number_of_requests = self.export_batch(input_filename, model)
+            if number_of_requests > 0:
+                batch_id = runner.submit(input_filename)
+                state = {"batch_id": batch_id, "namespace": namespace, "submitted": datetime.now().isoformat(),
+                         "number_of_requests": number_of_requests}
+                with open(f"{state_filename}.tmp", "w") as f:
+                    json.dump(state, f)
+                os.replace(f"{state_filename}.tmp", state_filename)
+                logger.info(f'Submitted batch {batch_id} with {number_of_requests} requests')
+                return False
+        else:
+            status = runner.poll(state["batch_id"])
+            if status == "pending":
+                logger.info(f'Batch {state["batch_id"]} (submitted {state["submitted"]}) is still pending')
+                return False
+            if status == "completed":
+                output_filename = f"{os.path.splitext(state_filename)[0]}_output.jsonl"
+                runner.download(state["batch_id"], output_filename)
+                ingested = self.ingest_batch(output_filename, model)
+                logger.info(f'Ingested {ingested} of {state["number_of_requests"]} responses of batch {state["batch_id"]}')
+            else:
+                logger.warning(f'Batch {state["batch_id"]} failed, request the categories directly')
+            os.remove(state_filename)
+
+        self.categorize(model_location="remote")
+        return True
+
     def categorize(self, model_location="local"):
-        """Categorize projects using LLM."""
-        response_json_list = []
-        for project_id, project_acronym, project_desc, project_kw in zip(
+        """Categorize projects using LLM.
+
+        Remote requests are sent concurrently (at most ``max_concurrency`` at a time) through
+        one shared client, the responses are added in the order of the projects.
+        """
+        projects = list(zip(
             self.project_df["id"],
             self.project_df["acronym"],
             self.project_df["objective"], 
             self.project_df["matchWords"]
-        ):
-            logger.info(f'Generate response for project id {project_id} acronym {project_acronym} (Keywords: {project_kw})')
-            prompt = self.get_prompt(project_desc)
-            
-            if model_location == "local":
+        ))
+
+        if model_location == "local":
+            response_json_list = []
+            for project_id, project_acronym, project_desc, project_kw in projects:
+                logger.info(f'Generate response for project id {project_id} acronym {project_acronym} (Keywords: {project_kw})')
                 #llm = OllamaLLM(model="Meta-Llama-3.3-70B-Instruct")
-                response = llm.invoke(prompt)
-            else:
-                response = make_chat_completion(
-                    prompt=prompt,
-                    model=os.getenv("lite_llm_model"),
-                    api_key=os.getenv("lite_llm_api_key"),
-                    base_url=os.getenv("lite_llm_url")
-                )
-            logger.info(f'    ---> Response: {response}')
-            response_json_list.append(response)
+                response = llm.invoke(self.get_prompt(project_desc))
+                logger.info(f'    ---> Response: {response}')
+                response_json_list.append(response)
+        else:
+            client = openai.OpenAI(api_key=os.getenv("lite_llm_api_key"), base_url=os.getenv("lite_llm_url"))
+            model = os.getenv("lite_llm_model")
+            cached_responses = [None] * len(projects)
+            if self.cache is not None:
+                self.cache.evict(model, self.prompt_instruction)
+                cached_responses = [self.cache.get(model, self.prompt_instruction, project_desc)
+                                    for project_id, project_acronym, project_desc, project_kw in projects]
+                logger.info(f'LLM cache: {self.cache.stats()}')
+            logger.info(f'Generate responses for {sum(response is None for response in cached_responses)} projects with up to {self.max_concurrency} concurrent requests ({self.pack_size} projects per request)')
+            missing = [i for i, cached in enumerate(cached_responses) if cached is None]
+            packs = [missing[i:i+self.pack_size] for i in range(0, len(missing), self.pack_size)]
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                futures = dict()
+                for pack in packs:
+                    future = executor.submit(self._get_packed_responses, [projects[i][2] for i in pack], client, model)
+                    for position, i in enumerate(pack):
+                        futures[i] = (future, position)
+                response_json_list = []
+                for i, (project_id, project_acronym, project_desc, project_kw) in enumerate(projects):
+                    if i not in futures:
+                        response = cached_responses[i]
+                    else:
+                        future, position = futures[i]
+                        response = future.result()[position]
+                        if self.cache is not None:
+                            self.cache.put(model, self.prompt_instruction, project_desc, response)
+                    logger.info(f'Response for project id {project_id} acronym {project_acronym} (Keywords: {project_kw}): {response}')
+                    response_json_list.append(response)
+            client.close()
 
         logger.info('Add categories to dataset')
         self.project_df['LLMCategory'] = response_json_list
@@ -191,12 +922,17 @@ def make_chat_completion(
     base_url: Optional[str] = None,
     max_retries: int = 3,
     base_delay: float = 1,
-    delay_multiplier: float = 3
+    delay_multiplier: float = 3,
+    client: Optional[openai.OpenAI] = None
 ) -> str:
-    """Make a chat completion request with retry logic."""
+    """Make a chat completion request with retry logic.
+
+    Pass a ``client`` to reuse its connection pool across requests; otherwise one is created from ``api_key`` and ``base_url``.
+    """
+    if client is None:
+        client = openai.OpenAI(api_key=api_key, base_url=base_url)
     for attempt in range(max_retries + 1):  # +1 for initial attempt
         try:
-            client = openai.OpenAI(api_key=api_key, base_url=base_url)
             response = client.chat.completions.create(
                 model=model,
                 messages=[{"role": "user", "content": prompt}]
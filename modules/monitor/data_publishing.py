@@ -0,0 +1,354 @@
+import logging
+import sqlite3
+import os
+import json
+import hashlib
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from data_utils import hash_rows
+
+logger = logging.getLogger(__name__)
+
+ROW_HASH_COLUMN = "_row_hash"
+
+# Schemas of the tables read by the dashboards. Columns that are not listed get the type of their
+# dtype. Indexes whose columns are all in the table are created; they cover the common dashboard
+# filters (time, programme, category, country, organization type) together with the funding.
+PROJECT_SCHEMA = {
+    "key": "id",
+    "primary_key": True,
+    "column_types": {"id": "TEXT", "ecMaxContribution": "REAL", "startDate": "TIMESTAMP", "endDate": "TIMESTAMP",
+                     "ecSignatureDate": "TIMESTAMP", "matchScore": "REAL", "semanticScore": "REAL"},
+    "foreign_keys": {},
+    "indexes": [["ecSignatureDate", "programAbbreviation", "ecMaxContribution"],
+                ["programAbbreviation", "ecSignatureDate", "ecMaxContribution"],
+                ["LLMCategory", "startDate", "ecMaxContribution"]],
+}
+
+ORGANIZATION_SCHEMA = {
+    "key": "projectID",
+    "primary_key": False,
+    "column_types": {"projectID": "TEXT", "ecMaxContribution": "REAL", "latitude": "REAL", "longitude": "REAL",
+                     "startDate": "TIMESTAMP", "endDate": "TIMESTAMP", "ecSignatureDate": "TIMESTAMP", "country": "TEXT", "type": "TEXT"},
+    "foreign_keys": {"projectID": ("projects", "id")},
+    "indexes": [["country", "ecSignatureDate", "ecMaxContribution"],
+                ["ecSignatureDate", "country", "type"],
+                ["type", "country", "ecMaxContribution"]],
+}
+
+# Tables without key are replaced as a whole
+TABLE_SCHEMA = {"key": None, "primary_key": False, "column_types": {}, "foreign_keys": {}, "indexes": []}
+
+
+def get_sqlite_type(dtype):
+    """Return the SQLite column type for a pandas dtype (the types ``to_sql`` uses)."""
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP"
+    return "TEXT"
+
+
+def format_timestamps(series):
+    """Format timestamps as text like ``to_sql`` does, e.g. "2024-01-31 00:00:00+00:00" (timezone-aware values in UTC)."""
+    if len(series) == 0:
+        return series.astype(object)
+    suffix = ""
+    if series.dt.tz is not None:
+        series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+        suffix = "+00:00"
+    values = series.to_numpy(dtype="datetime64[us]")
+    valid = ~np.isnat(values)
+    unit = "s" if (values[valid].astype("datetime64[s]") == values[valid]).all() else "us"
+    text = np.char.replace(np.datetime_as_string(values, unit=unit), "T", " ")
+    return pd.Series(np.char.add(text, suffix), index=series.index)
+
+
+def apply_column_types(df, column_types):
+    """Convert the columns of a DataFrame to the SQLite types of the schema (values that do not fit become missing).
+
+    Text columns holding other values than strings and numbers (e.g. lists) are converted to strings.
+
+    Returns:
+        DataFrame: Copy of ``df`` with converted columns
+    """
+    df = df.copy()
+    for column in df.columns:
+        sqlite_type = column_types.get(column) or get_sqlite_type(df[column].dtype)
+        series = df[column]
+        if sqlite_type in ("INTEGER", "REAL") and not pd.api.types.is_numeric_dtype(series.dtype):
+            df[column] = pd.to_numeric(series, errors="coerce")
+        elif sqlite_type == "TIMESTAMP" and not pd.api.types.is_datetime64_any_dtype(series.dtype):
+            df[column] = pd.to_datetime(series, format="mixed", utc=True, errors="coerce")
+        elif sqlite_type == "TEXT" and pd.api.types.infer_dtype(series, skipna=True) not in ("string", "empty"):
+            df[column] = series.astype(str).where(series.notna(), None)
+    return df
+
+
+def to_sqlite_rows(df):
+    """Return the rows of a DataFrame as tuples of values SQLite can bind, missing values as None.
+
+    Timestamps are written as text in the format of ``to_sql``, e.g. "2024-01-31 00:00:00+00:00".
+    """
+    columns = []
+    for column in df.columns:
+        series = df[column]
+        missing = series.isna().to_numpy()
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            series = format_timestamps(series)
+        values = series.astype(object).to_numpy(copy=True)
+        values[missing] = None
+        columns.append(values)
+    return list(zip(*columns))
+
+
+def get_group_signatures(keys, row_hashes):
+    """Return for each key the number of rows and the (wrapping) sum of their hashes, which does not depend on the row order.
+
+    Args:
+        keys: Key of each row
+        row_hashes: Hash of each row (int64)
+
+    Returns:
+        DataFrame: Columns count and hash_sum, indexed by the keys as strings
+    """
+    unique_keys, inverse = np.unique(np.asarray(keys, dtype=str), return_inverse=True)
+    hash_sums = np.zeros(len(unique_keys), dtype=np.uint64)
+    np.add.at(hash_sums, inverse, np.asarray(row_hashes, dtype=np.int64).view(np.uint64))
+    return pd.DataFrame({"count": np.bincount(inverse, minlength=len(unique_keys)), "hash_sum": hash_sums}, index=unique_keys)
+
+
+class SQLitePublisher():
+    """Publishes DataFrames as tables of an SQLite database read by the dashboards, writing only what changed.
+
+    Tables are created from a schema (see ``PROJECT_SCHEMA``) with typed columns, keys and
+    indexes. Each table stores a hash of every row in column ``_row_hash``. When a table is
+    published again, the rows are compared per key (e.g. the projectID of organizations) and only
+    the rows of new, changed or removed keys are deleted and inserted with ``executemany``, all in
+    one transaction. The database is in WAL mode, so dashboards can keep reading while a table is
+    published. A table is created from scratch when its definition changed.
+
+    Args:
+        filename: SQLite database file
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.conn = sqlite3.connect(filename)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+    @staticmethod
+    def get_create_statement(table, df, schema):
+        """Return the CREATE TABLE statement of a table for the columns of ``df``."""
+        definitions = []
+        for column in df.columns:
+            definition = f'"{column}" {schema["column_types"].get(column) or get_sqlite_type(df[column].dtype)}'
+            if schema["primary_key"] and column == schema["key"]:
+                definition += " PRIMARY KEY"
+            definitions.append(definition)
+        definitions.append(f'"{ROW_HASH_COLUMN}" INTEGER')
+        for column, (referenced_table, referenced_column) in schema["foreign_keys"].items():
+            if column in df.columns:
+                definitions.append(f'FOREIGN KEY ("{column}") REFERENCES "{referenced_table}" ("{referenced_column}")')
+        return f'CREATE TABLE "{table}" ({", ".join(definitions)})'
+
+    def publish(self, table, df, schema=TABLE_SCHEMA):
+        """Publish a DataFrame as table, writing only the rows of keys whose rows changed.
+
+        Args:
+            table: Name of the table
+            df: Data to publish (the index is not written)
+            schema: Schema of the table. Its key identifies the rows to compare; all rows with the same
+                key are replaced together (if the key is the primary key, only the first row of each key
+                is kept). Tables without key are replaced as a whole.
+
+        Returns:
+            dict: Number of inserted and deleted rows
+        """
+        key = schema["key"]
+        df = apply_column_types(df.reset_index(drop=True), schema["column_types"])
+        if schema["primary_key"] and df[key].duplicated().any():
+            logger.warning(f"{df[key].duplicated().sum()} rows of {table} have the same {key} as a previous row, keep only the first")
+            df = df.drop_duplicates(subset=key).reset_index(drop=True)
+        row_hashes = hash_rows(df).to_numpy().view(np.int64)
+        columns = list(df.columns)
+        column_list = ", ".join(f'"{column}"' for column in columns + [ROW_HASH_COLUMN])
+        create_statement = self.get_create_statement(table, df, schema)
+        with self.conn:
+            existing_statement = self.conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+            if existing_statement is None or existing_statement[0] != create_statement:
+                logger.info(f"Create table {table} in {self.filename}")
+                self.conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+                self.conn.execute(create_statement)
+            if key is None:
+                deleted = self.conn.execute(f'DELETE FROM "{table}"').rowcount
+                insert_rows = np.ones(len(df), dtype=bool)
+            else:
+                existing = self.conn.execute(f'SELECT "{key}", "{ROW_HASH_COLUMN}" FROM "{table}"').fetchall()
+                existing_keys = [row[0] for row in existing]
+                previous = get_group_signatures(existing_keys, [row[1] for row in existing])
+                current = get_group_signatures(df[key], row_hashes)
+                merged = current.join(previous, how="outer", lsuffix="_current", rsuffix="_previous")
+                changed = (merged["count_current"] != merged["count_previous"]) | (merged["hash_sum_current"] != merged["hash_sum_previous"])
+                changed_keys = np.asarray(merged.index[changed], dtype=str)
+                #keys are deleted with the values stored in the table, which may have another type than in df
+                delete_rows = np.flatnonzero(np.isin(np.asarray(existing_keys, dtype=str), changed_keys))
+                delete_keys = [(stored_key,) for stored_key in dict.fromkeys(existing_keys[row] for row in delete_rows)]
+                if not schema["primary_key"]:
+                    self.conn.execute(f'CREATE INDEX IF NOT EXISTS "{table}_{key}" ON "{table}" ("{key}")')
+                deleted = self.conn.executemany(f'DELETE FROM "{table}" WHERE "{key}" IS ?', delete_keys).rowcount if delete_keys else 0
+                insert_rows = np.isin(np.asarray(df[key], dtype=str), changed_keys)
+            rows = to_sqlite_rows(df[insert_rows])
+            hashes = row_hashes[insert_rows].tolist()
+            placeholders = ", ".join(["?"] * (len(columns) + 1))
+            self.conn.executemany(f'INSERT INTO "{table}" ({column_list}) VALUES ({placeholders})',
+                                  (row + (row_hash,) for row, row_hash in zip(rows, hashes)))
+            for index_columns in schema["indexes"]:
+                if set(index_columns) <= set(columns):
+                    index_name = "_".join([table] + index_columns)
+                    index_column_list = ", ".join(f'"{column}"' for column in index_columns)
+                    self.conn.execute(f'CREATE INDEX IF NOT EXISTS "{index_name}" ON "{table}" ({index_column_list})')
+        logger.info(f"Published {table} to {self.filename}: {len(rows)} rows inserted, {deleted} rows deleted")
+        return {"inserted": len(rows), "deleted": deleted}
+
+    def publish_projects_and_organizations(self, project_df, orga_df):
+        """Publish the projects, the organizations and the summary tables computed from them."""
+        self.publish("projects", project_df, PROJECT_SCHEMA)
+        self.publish("organizations", orga_df, ORGANIZATION_SCHEMA)
+        for table, summary_df in get_summary_tables(project_df, orga_df).items():
+            self.publish(table, summary_df)
+
+    def close(self):
+        """Move all changes from the write-ahead log into the database file and close the connection."""
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.conn.close()
+
+
+def get_summary_tables(project_df, orga_df):
+    """Return precomputed aggregates for the dashboards, so that they do not have to scan projects and organizations.
+
+    Returns:
+        dict: DataFrames by table name: funding and number of projects per year (of the signature date) and
+            programme (and LLM category, if the projects are categorized), and number of organizations, projects
+            and funding of the organizations per year and country.
+    """
+    summaries = dict()
+    projects = project_df.assign(year=pd.to_datetime(project_df["ecSignatureDate"], format="mixed", utc=True, errors="coerce").dt.year,
+                                 ecMaxContribution=pd.to_numeric(project_df["ecMaxContribution"], errors="coerce"))
+    dimensions = {"summary_projects_by_year_programme": ["year", "programAbbreviation"],
+                  "summary_projects_by_year_category": ["year", "LLMCategory"]}
+    for table, columns in dimensions.items():
+        if set(columns) <= set(projects.columns):
+            summaries[table] = (projects.groupby(columns, dropna=False)
+                                .agg(projects=("id", "nunique"), ecMaxContribution=("ecMaxContribution", "sum")).reset_index())
+    organizations = orga_df.assign(year=pd.to_datetime(orga_df["ecSignatureDate"], format="mixed", utc=True, errors="coerce").dt.year,
+                                   ecMaxContribution=pd.to_numeric(orga_df["ecMaxContribution"], errors="coerce"))
+    summaries["summary_organizations_by_year_country"] = (organizations.groupby(["year", "country"], dropna=False)
+                                                          .agg(organizations=("projectID", "size"), projects=("projectID", "nunique"),
+                                                               ecMaxContribution=("ecMaxContribution", "sum")).reset_index())
+    for summary_df in summaries.values():
+        summary_df["year"] = summary_df["year"].astype("Int64")
+    return summaries
+
+
+def database_fingerprint(conn, ignored_tables=()):
+    """Return the sha256 hash of the schema and rows of the tables of a SQLite database.
+
+    Args:
+        conn: Connection to the database
+        ignored_tables: Tables left out of the hash (e.g. the metadata table, which holds the time of each run)
+    """
+    sha = hashlib.sha256()
+    objects = conn.execute("SELECT type, name, tbl_name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY type, name").fetchall()
+    for object_type, name, table, sql in objects:
+        if table in ignored_tables:
+            continue
+        sha.update(repr((object_type, name, sql)).encode())
+        if object_type == "table":
+            for row in conn.execute(f'SELECT * FROM "{name}"'):
+                sha.update(repr(row).encode())
+    return sha.hexdigest()
+
+
+class SnapshotPublisher():
+    """Publishes SQLite databases into the data directory of the dashboard (the Metabase volume).
+
+    A database is only copied when its content changed since it was last published. The content is
+    the schema and the rows of its tables except ``ignored_tables``: the metadata table is written
+    with the time of the run in every run and would otherwise make every database look changed.
+    The copy is made with SQLite's online backup API into a temporary file in the data directory, which then
+    replaces the published file with an atomic rename, so the dashboard never reads a half-written
+    file (open connections keep reading the previous version). The published copies use a rollback
+    journal, so they can be read from a read-only volume. ``versions.json`` in the data directory
+    records version, fingerprint, size and time of each published database.
+
+    Args:
+        directory: Data directory of the dashboard
+        ignored_tables: Tables whose changes alone are not published
+    """
+
+    def __init__(self, directory, ignored_tables=("metadata",)):
+        self.directory = directory
+        self.ignored_tables = ignored_tables
+        self.versions_filename = os.path.join(directory, "versions.json")
+
+    def get_versions(self):
+        """Return the versions of the published databases by file name."""
+        if not os.path.exists(self.versions_filename):
+            return dict()
+        with open(self.versions_filename) as f:
+            return json.load(f)
+
+    def _save_versions(self, versions):
+        with open(self.versions_filename + ".tmp", "w") as f:
+            json.dump(versions, f, indent=4)
+        os.replace(self.versions_filename + ".tmp", self.versions_filename)
+
+    def publish(self, filename):
+        """Publish a database if its content changed.
+
+        Args:
+            filename: SQLite database to publish
+
+        Returns:
+            int: Published version, or None if the published database is up to date
+
+        Raises:
+            FileNotFoundError: If ``filename`` does not exist (connecting would create an empty database)
+        """
+        if not os.path.isfile(filename):
+            raise FileNotFoundError(f"Database to publish not found: {filename}")
+        name = os.path.basename(filename)
+        published_filename = os.path.join(self.directory, name)
+        source = sqlite3.connect(filename)
+        try:
+            content_fingerprint = database_fingerprint(source, self.ignored_tables)
+            versions = self.get_versions()
+            previous = versions.get(name, dict())
+            if previous.get("fingerprint") == content_fingerprint and os.path.exists(published_filename):
+                logger.info(f"{name} unchanged since version {previous['version']}, not published")
+                return None
+
+            tmp_filename = os.path.join(self.directory, f".{name}.tmp")
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            target = sqlite3.connect(tmp_filename)
+            try:
+                source.backup(target)
+                target.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                target.close()
+            os.replace(tmp_filename, published_filename)
+        finally:
+            source.close()
+
+        version = previous.get("version", 0) + 1
+        versions[name] = {"version": version, "fingerprint": content_fingerprint, "size": os.path.getsize(published_filename),
+                          "published": datetime.now().isoformat()}
+        self._save_versions(versions)
+        logger.info(f"Published {name} as version {version} to {self.directory}")
+        return version
@@ -7,30 +7,445 @@ from lxml import etree
 import copy
 import networkx as nx
 import requests
-import requests
 import json
 from tqdm import tqdm
 import pickle
 import yaml
 import logging
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 import sqlite3
+import threading
+import shutil
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+from data_utils import RateLimiter, PROJECT_DTYPES, ORGANIZATION_DTYPES, apply_dtypes
+from data_publishing import SQLitePublisher
 logger = logging.getLogger(__name__)
 
+# journal code of the delta query of incremental crawls, the id suffix queries use the codes 1 to 9999
+DELTA_CODE = 0
+
 class DataSource:
     """Base class for data sources."""
     def __init__(self):
         pass
 
 
+def _to_arrow_compatible(values):
+    """Encode nested values (dicts, lists) as JSON strings and everything else non-null as str."""
+    def encode(value):
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return None
+        return str(value)
+    return values.map(encode).astype(object)
+
+
+def write_snapshot(df, path, partition_cols=("programAbbreviation",), sort_by=None):
+    """Write a frame as a zstd-compressed Parquet dataset, partitioned by ``partition_cols``.
+
+    Object columns that Arrow cannot store as they are (nested dicts/lists, mixed
+    types) are stored as strings, with nested values encoded as JSON. Categorical
+    columns are stored with their plain values. Rows are
+    sorted by ``sort_by`` so that the row group statistics allow predicate pushdown
+    on that column. Every write goes to a new version directory inside ``path`` and is
+    then made current by atomically replacing the ``_current`` pointer file, so readers
+    never see a half-written or missing snapshot. The previous version is kept for
+    readers that are still reading it; older versions and leftovers of failed writes
+    are removed.
+
+    Args:
+        df: Frame to store
+        path: Directory of the dataset
+        partition_cols: Low-cardinality columns used for hive-style partitioning
+        sort_by: Optional column to sort by before writing
+    """
+    if sort_by is not None:
+        df = df.sort_values(sort_by, kind="stable")
+    df = df.reset_index(drop=True)
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(df[column].cat.categories.dtype)
+        if df[column].dtype != object:
+            continue
+        try:
+            arrow_type = pa.array(df[column], from_pandas=True).type
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrow_type = None
+        if arrow_type is None or pa.types.is_nested(arrow_type):
+            df[column] = _to_arrow_compatible(df[column])
+    partition_cols = [column for column in partition_cols if column in df.columns]
+    for column in partition_cols:
+        df[column] = _to_arrow_compatible(df[column])
+
+    os.makedirs(path, exist_ok=True)
+    pointer = os.path.join(path, "_current")
+    previous_version = _current_snapshot_version(path)
+    written = datetime.now()
+    version = written.strftime("v%Y%m%dT%H%M%S%f")
+    version_path = os.path.join(path, version)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(table, version_path, partition_cols=partition_cols, compression="zstd", row_group_size=10000)
+    with open(os.path.join(version_path, "_schema.json"), "w") as f:
+        json.dump({"columns": list(df.columns), "partition_cols": partition_cols,
+                   "written": written.isoformat()}, f)
+
+    with open(f"{pointer}.tmp", "w") as f:
+        f.write(version)
+    os.replace(f"{pointer}.tmp", pointer)
+    # older versions, unfinished writes and the files of the unversioned layout
+    for name in os.listdir(path):
+        if name not in ("_current", version, previous_version):
+            item = os.path.join(path, name)
+            if os.path.isdir(item):
+                shutil.rmtree(item, ignore_errors=True)
+            else:
+                os.remove(item)
+    for leftover in [f"{path}.tmp", f"{path}.old"]:
+        shutil.rmtree(leftover, ignore_errors=True)
+
+
+def _current_snapshot_version(path):
+    """Return the name of the current version directory of the snapshot at ``path``, or None."""
+    try:
+        with open(os.path.join(path, "_current")) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def _snapshot_dir(path):
+    """Return the directory holding the current dataset of the snapshot at ``path``.
+
+    Snapshots written before the versioned layout hold the dataset in ``path`` itself.
+    """
+    version = _current_snapshot_version(path)
+    return os.path.join(path, version) if version else path
+
+
+def read_snapshot(path, columns=None, filters=None):
+    """Read a Parquet dataset written by ``write_snapshot``.
+
+    Args:
+        path: Directory of the dataset
+        columns: Optional list of columns to read (column projection)
+        filters: Optional pyarrow filters, e.g. [("id", "in", ids)], applied while reading (predicate pushdown)
+
+    Returns:
+        DataFrame: Selected rows and columns in the stored column order
+    """
+    path = _snapshot_dir(path)
+    if not os.path.exists(os.path.join(path, "_schema.json")):
+        raise FileNotFoundError(f"No snapshot found at {path}")
+    with open(os.path.join(path, "_schema.json")) as f:
+        schema = json.load(f)
+    partitioning = ds.partitioning(pa.schema([(column, pa.string()) for column in schema["partition_cols"]]), flavor="hive")
+    table = pq.read_table(path, columns=columns, filters=filters, partitioning=partitioning)
+    df = table.to_pandas()
+    return df[[column for column in (columns or schema["columns"]) if column in df.columns]]
+
+
+def snapshot_version(path):
+    """Return the write time stamp identifying the snapshot at ``path``, or None if there is none."""
+    try:
+        with open(os.path.join(_snapshot_dir(path), "_schema.json")) as f:
+            return json.load(f).get("written")
+    except FileNotFoundError:
+        return None
+
+
+def _first_value(value):
+    """Unwrap the single-element lists used for metadata values by the search API."""
+    try:
+        return value[0]
+    except (IndexError, KeyError, TypeError):
+        return value
+
+
+class ColumnarRowBuffer:
+    """Collects dict rows column by column and turns them into a DataFrame in one go.
+
+    Columns missing in a row are filled with NaN, like ``pd.DataFrame.from_dict`` would do.
+    """
+
+    def __init__(self):
+        self.columns = dict()
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def extend(self, rows):
+        """Append rows (dicts) to the buffer."""
+        for row in rows:
+            for key, value in row.items():
+                column = self.columns.get(key)
+                if column is None:
+                    column = self.columns[key] = [np.nan] * self.length
+                elif len(column) < self.length:
+                    column.extend([np.nan] * (self.length - len(column)))
+                column.append(value)
+            self.length += 1
+
+    def to_frame(self):
+        """Build the DataFrame and release the buffered columns."""
+        for column in self.columns.values():
+            if len(column) < self.length:
+                column.extend([np.nan] * (self.length - len(column)))
+        frame = pd.DataFrame(self.columns)
+        self.columns = dict()
+        self.length = 0
+        return frame
+
+
+class CrawlJournal:
+    """Durable SQLite journal of a F&T portal crawl.
+
+    Records the status of every id suffix (running, done, incomplete or failed)
+    together with the parsed project and organization rows of every downloaded
+    page, so that an interrupted crawl can be resumed and failed suffixes can be
+    crawled again without repeating the rest.
+    """
+
+    def __init__(self, filename):
+        """Open (or create) the journal stored in ``filename``."""
+        self.filename = filename
+        self.conn = sqlite3.connect(filename)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS run (mode TEXT, started TEXT, finished TEXT);
+            CREATE TABLE IF NOT EXISTS suffixes (code INTEGER PRIMARY KEY, status TEXT, total_results INTEGER, updated TEXT);
+            CREATE TABLE IF NOT EXISTS pages (code INTEGER, page INTEGER, status TEXT, projects TEXT, organizations TEXT,
+                                              number_of_projects INTEGER, number_of_orgas INTEGER, PRIMARY KEY (code, page));
+        """)
+
+    def get_mode(self):
+        """Return the mode ("full" or "incremental") of the last run, or None."""
+        row = self.conn.execute("SELECT mode FROM run").fetchone()
+        return row[0] if row else None
+
+    def open_run(self, mode):
+        """Resume the unfinished run of the same mode or start a new, empty one.
+
+        Returns:
+            bool: True if an unfinished run is resumed
+        """
+        row = self.conn.execute("SELECT mode, finished FROM run").fetchone()
+        if row is not None and row[0] == mode and row[1] is None:
+            logger.info(f'Resume unfinished {mode} crawl from journal {self.filename}')
+            return True
+        with self.conn:
+            self.conn.execute("DELETE FROM pages")
+            self.conn.execute("DELETE FROM suffixes")
+            self.conn.execute("DELETE FROM run")
+            self.conn.execute("INSERT INTO run VALUES (?, ?, NULL)", (mode, datetime.now().isoformat()))
+        return False
+
+    def reopen_failed(self):
+        """Forget failed and incomplete suffixes so that they are crawled again.
+
+        Returns:
+            list: Codes of the reopened suffixes
+        """
+        codes = self.get_codes(("failed", "incomplete"))
+        with self.conn:
+            self.conn.executemany("DELETE FROM pages WHERE code = ?", [(code,) for code in codes])
+            self.conn.executemany("DELETE FROM suffixes WHERE code = ?", [(code,) for code in codes])
+            self.conn.execute("UPDATE run SET finished = NULL")
+        logger.info(f'Reopened {len(codes)} failed suffixes')
+        return codes
+
+    def finish_run(self):
+        """Mark the current run as finished."""
+        with self.conn:
+            self.conn.execute("UPDATE run SET finished = ?", (datetime.now().isoformat(),))
+
+    def get_suffix(self, code):
+        """Return (status, total_results) of a suffix, or None if it was not started."""
+        return self.conn.execute("SELECT status, total_results FROM suffixes WHERE code = ?", (int(code),)).fetchone()
+
+    def start_suffix(self, code, total_results):
+        """Record that the pages of a suffix are being downloaded."""
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO suffixes (code, status, total_results, updated) VALUES (?, 'running', ?, ?)",
+                              (int(code), int(total_results), datetime.now().isoformat()))
+
+    def finish_suffix(self, code, status, total_results=None):
+        """Set the final status of a suffix."""
+        with self.conn:
+            self.conn.execute("""INSERT INTO suffixes (code, status, total_results, updated) VALUES (?, ?, ?, ?)
+                                 ON CONFLICT(code) DO UPDATE SET status = excluded.status, updated = excluded.updated,
+                                 total_results = COALESCE(excluded.total_results, total_results)""",
+                              (int(code), status, total_results, datetime.now().isoformat()))
+
+    def record_page(self, code, page, projects, organizations):
+        """Store the parsed rows of a page, or mark it as failed if ``projects`` is None."""
+        with self.conn:
+            if projects is None:
+                self.conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, 'failed', NULL, NULL, 0, 0)", (int(code), int(page)))
+            else:
+                self.conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, 'done', ?, ?, ?, ?)",
+                                  (int(code), int(page), json.dumps(projects), json.dumps(organizations), len(projects), len(organizations)))
+
+    def get_done_pages(self, code):
+        """Return the set of page numbers of a suffix that were downloaded successfully."""
+        return {row[0] for row in self.conn.execute("SELECT page FROM pages WHERE code = ? AND status = 'done'", (int(code),))}
+
+    def get_page_summary(self, code):
+        """Return (number_of_projects, number_of_orgas, number_of_failed_pages) of a suffix."""
+        row = self.conn.execute("""SELECT COALESCE(SUM(number_of_projects), 0), COALESCE(SUM(number_of_orgas), 0),
+                                   COALESCE(SUM(status = 'failed'), 0) FROM pages WHERE code = ?""", (int(code),)).fetchone()
+        return tuple(row)
+
+    def get_codes(self, statuses):
+        """Return the sorted codes of all suffixes with one of the given statuses."""
+        placeholders = ",".join("?" * len(statuses))
+        return [row[0] for row in self.conn.execute(f"SELECT code FROM suffixes WHERE status IN ({placeholders}) ORDER BY code", tuple(statuses))]
+
+    def iter_rows(self, statuses):
+        """Yield the project and organization rows of every page of the suffixes with one of the given statuses.
+
+        Pages are read one at a time in suffix and page order, so only a single page is held in memory.
+        """
+        placeholders = ",".join("?" * len(statuses))
+        cursor = self.conn.execute(f"""SELECT pages.projects, pages.organizations FROM pages JOIN suffixes USING (code)
+                                        WHERE suffixes.status IN ({placeholders}) AND pages.status = 'done'
+                                        ORDER BY pages.code, pages.page""", tuple(statuses))
+        for projects, organizations in cursor:
+            yield json.loads(projects), json.loads(organizations)
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
+
+
+class CorpusCache:
+    """Keeps the raw project and organization snapshots in memory for all workflows of a long-running process.
+
+    The snapshots are read once and only read again when a new snapshot was written (its version
+    changed). The columns get the dtypes of ``PROJECT_DTYPES`` and ``ORGANIZATION_DTYPES``, further
+    text columns with few distinct values are stored as categoricals too. Workflows get new frames
+    with the requested rows and columns in the dtypes of the schema (other columns in their original
+    dtypes), so the cached frames are never changed by a workflow.
+
+    Args:
+        raw_project_data_filename: Path of the raw project snapshot
+        raw_orga_data_filename: Path of the raw organization snapshot
+        max_category_fraction: Text columns with at most this fraction of distinct values are stored as categoricals
+    """
+
+    def __init__(self, raw_project_data_filename, raw_orga_data_filename, max_category_fraction=0.5):
+        self.raw_project_data_filename = raw_project_data_filename
+        self.raw_orga_data_filename = raw_orga_data_filename
+        self.max_category_fraction = max_category_fraction
+        self.version = None
+        self.frames = dict()
+        self.dtypes = dict()
+        self._lock = threading.Lock()
+
+    def _compact(self, df, schema_dtypes):
+        """Return the frame in the dtypes of the schema with further low-cardinality text columns as categoricals,
+        and the original dtypes of these further columns."""
+        df = apply_dtypes(df, schema_dtypes)
+        dtypes = dict()
+        for column in df.columns:
+            if column in schema_dtypes or not (pd.api.types.is_object_dtype(df[column].dtype) or pd.api.types.is_string_dtype(df[column].dtype)):
+                continue
+            try:
+                number_of_values = df[column].nunique()
+            except TypeError:
+                continue
+            if number_of_values <= self.max_category_fraction * len(df):
+                dtypes[column] = df[column].dtype
+                df[column] = df[column].astype("category")
+        return df, dtypes
+
+    def refresh(self):
+        """Read the snapshots if a new snapshot was written since they were read.
+
+        Returns:
+            str: Version of the cached snapshot (None if there is no snapshot)
+        """
+        with self._lock:
+            version = snapshot_version(self.raw_project_data_filename)
+            if version is not None and version != self.version:
+                logger.info(f'Load F&T snapshot {version} into the corpus cache')
+                self.frames, self.dtypes = dict(), dict()
+                for table, filename, schema_dtypes in [("projects", self.raw_project_data_filename, PROJECT_DTYPES),
+                                                       ("organizations", self.raw_orga_data_filename, ORGANIZATION_DTYPES)]:
+                    self.frames[table], self.dtypes[table] = self._compact(read_snapshot(filename), schema_dtypes)
+                self.version = version
+            return self.version
+
+    def load(self, table, columns=None, key=None, values=None):
+        """Return (a projection of) a cached table, optionally only the rows whose ``key`` is in ``values``.
+
+        The frame is read from the snapshot first if a new one was written.
+        """
+        self.refresh()
+        df = self.frames[table]
+        if values is not None:
+            df = df[df[key].isin(list(values))]
+        df = df[[column for column in (columns or df.columns) if column in df.columns]].reset_index(drop=True)
+        for column in df.columns:
+            if column in self.dtypes[table]:
+                df[column] = df[column].astype(self.dtypes[table][column])
+            elif values is not None and isinstance(df[column].dtype, pd.CategoricalDtype):
+                # same categories as a frame read from the snapshot
+                df[column] = df[column].cat.remove_unused_categories()
+        return df
+
+    def load_projects(self, columns=None, project_ids=None):
+        """Return (a projection of) the cached projects, optionally only those with the given ids."""
+        return self.load("projects", columns=columns, key="id", values=project_ids)
+
+    def load_organizations(self, columns=None, project_ids=None):
+        """Return (a projection of) the cached organizations, optionally only those of the given projects."""
+        return self.load("organizations", columns=columns, key="projectID", values=project_ids)
+
+
 class FundingAndTenderPortal(DataSource):
     """Handles data retrieval from EU Funding & Tenders Portal."""
     
-    def __init__(self, raw_project_data_filename, raw_orga_data_filename):
-        """Initialize with paths for project and organization data storage."""
+    def __init__(self, raw_project_data_filename, raw_orga_data_filename, max_in_flight=16, requests_per_second=20,
+                 crawl_state_filename=None, full_crawl_interval_days=28, delta_lookback_days=90, crawl_journal_filename=None,
+                 raw_db_filename="deliverables/ft_portal_raw.db", corpus_cache=None):
+        """Initialize with paths for project and organization data storage.
+
+        Args:
+            raw_project_data_filename: Path of the raw project snapshot
+            raw_orga_data_filename: Path of the raw organization snapshot
+            max_in_flight: Maximum number of concurrent API requests during a crawl
+            requests_per_second: Maximum number of API requests started per second
+            crawl_state_filename: Path of the start times of the last full and complete crawl, used by incremental crawls
+            full_crawl_interval_days: Maximum age of the last full crawl before an incremental crawl falls back to a full one
+            delta_lookback_days: Incremental crawls download the projects signed up to this many days before the last
+                complete crawl, as projects show up in the portal some time after their signature
+            crawl_journal_filename: Path of the SQLite crawl journal (defaults to ft_crawl_journal.db next to the project snapshot,
+                ":memory:" keeps it in memory, so crawls cannot be resumed or rebuilt)
+            raw_db_filename: Path of the SQLite database of the raw data for the dashboards
+            corpus_cache: Optional ``CorpusCache`` of the snapshots, used instead of reading them
+        """
         self.raw_project_data_filename = raw_project_data_filename
         self.raw_orga_data_filename = raw_orga_data_filename
+        self.crawl_state_filename = crawl_state_filename
+        self.full_crawl_interval_days = full_crawl_interval_days
+        self.delta_lookback_days = delta_lookback_days
+        if crawl_journal_filename is None:
+            crawl_journal_filename = os.path.join(os.path.dirname(raw_project_data_filename), "ft_crawl_journal.db")
+        self.crawl_journal_filename = crawl_journal_filename
+        self.raw_db_filename = raw_db_filename
+        self.corpus_cache = corpus_cache
+        self.max_in_flight = max_in_flight
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.max_attempts = 5
+        self.request_timeout = 60
+        self._thread_local = threading.local()
         logger.info('F&T Data sourcer initialized')
 
     @staticmethod
@@ -46,177 +461,235 @@ class FundingAndTenderPortal(DataSource):
         api_key = os.getenv('SEDIA_API_KEY', '???????')
         return f"https://api.tech.ec.europa.eu/search-api/prod/rest/search?apiKey={api_key}&text={text}&pageNumber={page_number}&pageSize={page_size}"
 
-    def update_source(self, suppress_crawl=False):
+    def update_source(self, suppress_crawl=False, incremental=False, retry_failed=False):
         """Update data by crawling F&T portal or loading from cache if suppressed."""
         logger.info('Select F&T portal as data source')
-        project_df, orga_df = self.crawl_funding_and_tenders_portal(suppress_crawl=suppress_crawl)
+        project_df, orga_df = self.crawl_funding_and_tenders_portal(suppress_crawl=suppress_crawl, incremental=incremental, retry_failed=retry_failed)
         return project_df, orga_df
 
-    def load_saved_data(self):
-        """Load previously saved project and organization data from pickle files."""
+    def load_saved_data(self, project_columns=None, orga_columns=None, project_ids=None):
+        """Load previously saved project and organization data from the Parquet snapshots.
+
+        The frames get the dtypes of ``PROJECT_DTYPES`` and ``ORGANIZATION_DTYPES``.
+
+        Args:
+            project_columns: Optional list of project columns to load
+            orga_columns: Optional list of organization columns to load
+            project_ids: Optional list of project ids; only these projects and their organizations are loaded
+        """
         logger.info('Load saved F&T data')
-        project_df = pd.read_pickle(self.raw_project_data_filename)
-        organization_df = pd.read_pickle(self.raw_orga_data_filename)
+        project_df = self.load_projects(columns=project_columns, project_ids=project_ids)
+        organization_df = self.load_organizations(columns=orga_columns, project_ids=project_ids)
         logger.info('Finished saved F&T data')
         return project_df, organization_df
 
+    def load_projects(self, columns=None, project_ids=None):
+        """Load (a projection of) the saved projects, optionally only those with the given ids."""
+        if self.corpus_cache is not None and self.corpus_cache.refresh() is not None:
+            return self.corpus_cache.load_projects(columns=columns, project_ids=project_ids)
+        filters = [("id", "in", list(project_ids))] if project_ids is not None else None
+        return apply_dtypes(read_snapshot(self.raw_project_data_filename, columns=columns, filters=filters), PROJECT_DTYPES)
+
+    def load_organizations(self, columns=None, project_ids=None):
+        """Load (a projection of) the saved organizations, optionally only those of the given projects."""
+        if self.corpus_cache is not None and self.corpus_cache.refresh() is not None:
+            return self.corpus_cache.load_organizations(columns=columns, project_ids=project_ids)
+        filters = [("projectID", "in", list(project_ids))] if project_ids is not None else None
+        return apply_dtypes(read_snapshot(self.raw_orga_data_filename, columns=columns, filters=filters), ORGANIZATION_DTYPES)
+
+    def get_snapshot_version(self):
+        """Return the version of the saved project snapshot (None if nothing was saved yet)."""
+        return snapshot_version(self.raw_project_data_filename)
+
+    def save_data(self, project_df, orga_df):
+        """Save project and organization data as partitioned Parquet snapshots."""
+        write_snapshot(project_df, self.raw_project_data_filename, sort_by="id")
+        write_snapshot(orga_df, self.raw_orga_data_filename, sort_by="projectID")
+
+
+    def _get_session(self):
+        """Return the requests session of the calling crawler thread."""
+        session = getattr(self._thread_local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._thread_local.session = session
+        return session
+
+    def _fetch_page(self, text, page_number, page_size, retry_delay, query=None):
+        """Download one result page, respecting the request budget.
 
-    def crawl_funding_and_tenders_portal(self, suppress_crawl):
-        """Crawl F&T portal API for project data or load from cache if suppressed.
-        
         Args:
-            suppress_crawl: If True, load from cache instead of crawling
+            text: Search text, e.g. ***0042
+            page_number: Page number for pagination
+            page_size: Number of items per page
+            retry_delay: Seconds to wait between failed attempts
+            query: Optional filter of the results (e.g. ``_get_delta_query``), all results by default
 
         Returns:
-            tuple: (project_dataframe, organization_dataframe)
+            dict: Decoded JSON response, or None if all attempts failed
         """
-        metadata = dict()
-        metadata["SourcingStartDate"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        if not suppress_crawl:
-        
-            logger.info('Begin systematic crawl by project id')
-            pdfsnew = []
-            odfsnew = []
-
-            codes = np.arange(1,10000)
-
-
-            for code in codes:
-                text = "***" + f"{code:04}"
-                logger.info(f'Initiate download for {text}')
-
-                pageNumber = 1
-                pageSize = 100
-                
-                query = {
-                "bool": {
-                }
-                }
-
-                attempts = 0
-                successful = False
-                while not successful:
-                    attempts += 1
-                    if attempts > 5:
-                        logger.error(f'{text}: Skip {text}')
-                        break
-                    try:
-                        response = requests.post(self._get_api_url(text, pageNumber, pageSize), json=query)
-                        out = response.json()
+        if query is None:
+            query = {
+            "bool": {
+            }
+            }
+        for attempts in range(1, self.max_attempts + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self._get_session().post(self._get_api_url(text, page_number, page_size), json=query, timeout=self.request_timeout)
+                out = response.json()
+                if 'totalResults' not in out:
+                    raise ValueError(f'Unexpected response: {str(out)[:200]}')
+                return out
+            except requests.exceptions.ConnectionError:
+                logger.error(f'{text}: ConnectionError. Download failed for page {page_number} on attempt {attempts}. Will try again in {retry_delay}s.')
+            except requests.exceptions.JSONDecodeError:
+                logger.error(f'{text}: JSONDecodeError. JSON Decoding failed for page {page_number} on attempt {attempts}. Will try to redownload in {retry_delay}s.')
+            except Exception as e:
+                logger.error(f'{text}: Unknown error ({e!r}) for page {page_number} on attempt {attempts}. Will try to redownload in {retry_delay}s.')
+            time.sleep(retry_delay)
+        logger.error(f'{text}: Skip page {page_number}')
+        return None
+
+    def _crawl(self, codes, journal, page_size=100, query=None):
+        """Download all result pages of the given project id suffixes concurrently.
+
+        The overview request of a suffix doubles as its first page. Follow-up pages
+        are scheduled as soon as the number of results is known, so suffixes and
+        pages are fetched in parallel. At most ``max_in_flight`` requests run at the
+        same time and at most ``requests_per_second`` requests are started per second.
+        Only a bounded window of suffixes is open at any time to keep memory in check.
+
+        Every page is parsed as soon as it arrives and its rows are written to the
+        journal. Suffixes already finished in the journal are skipped and suffixes
+        that were interrupted only download their missing pages.
+
+        Args:
+            codes: Iterable of integer id suffixes, ``DELTA_CODE`` queries all projects
+            journal: CrawlJournal recording the progress
+            page_size: Number of items per page
+            query: Optional filter of the results of all requests (see ``_fetch_page``)
+        """
+        codes = iter(codes)
+        max_open_suffixes = 2 * self.max_in_flight
+        remaining = dict()
+        overviews = set()
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            pending = dict()
+
+            def submit(code, page_number, retry_delay):
+                future = executor.submit(self._fetch_page, self._get_search_text(code), page_number, page_size, retry_delay, query)
+                pending[future] = (code, page_number)
+
+            def open_next_suffix():
+                for code in codes:
+                    suffix = journal.get_suffix(code)
+                    if suffix is None:
+                        logger.info(f'Initiate download for {self._get_search_text(code)}')
+                        overviews.add(code)
+                        submit(code, 1, 30)
+                        return True
+                    status, total_results = suffix
+                    if status != "running":
+                        continue
+                    done_pages = journal.get_done_pages(code)
+                    missing_pages = [page for page in range(1, total_results // page_size + 2) if page not in done_pages]
+                    if not missing_pages:
+                        self._finish_suffix(journal, code)
+                        continue
+                    logger.info(f'{self._get_search_text(code)}: Resume download of {len(missing_pages)} page(s)')
+                    remaining[code] = len(missing_pages)
+                    for page_number in missing_pages:
+                        submit(code, page_number, 5)
+                    return True
+                return False
+
+            def fill_window():
+                while len(remaining) + len(overviews) < max_open_suffixes and open_next_suffix():
+                    pass
+
+            fill_window()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    code, page_number = pending.pop(future)
+                    out = future.result()
+                    text = self._get_search_text(code)
+
+                    if code in overviews:
+                        overviews.discard(code)
+                        if out is None:
+                            logger.error(f'{text}: Skip {text}')
+                            journal.finish_suffix(code, "failed")
+                            continue
                         total_results = out['totalResults']
-                        successful = True
-                    except requests.exceptions.ConnectionError:
-                        logger.error(f'{text}: ConnectionError. Overview download failed for  {text} on attempt {attempts}. Will try again in 30s.')
-                        time.sleep(30)
-                    except requests.exceptions.JSONDecodeError:
-                        logger.error(f'{text}: JSONDecodeError. JSON Decoding failed for overview download for {text} on attempt {attempts}. Will try to redownloads in 30s.')
-                        time.sleep(30)
-                    except:
-                        logger.error(f'{text}: Unknown error for overview download for {text} on attempt {attempts}. Will try to redownloads in 30s.')
-                        time.sleep(30)
-
-                if total_results < 1: 
-                    continue
-                    print(text, "skipped")
-                
-                
-                jsons = []
-                
-                for pageNumber in np.arange(1, total_results // pageSize + 2):
-
-                    successful = False
-                    logger.info(f'{text}: Download page {pageNumber}')
-                    #print(pageNumber, "/", total_results // pageSize + 1)
-                    attempts = 0
-                    while not successful:
-                        attempts += 1
-                        if attempts > 5:
-                            logger.error(f'{text}: Skip page {pageNumber}')
-                        try:
-                            response = requests.post(self._get_api_url(text, pageNumber, pageSize), json=query)
-                            jsons.append(response.json())
-                            successful = True
-                        except requests.exceptions.ConnectionError:
-                            logger.error(f'{text}: ConnectionError. Download failed for page {pageNumber} on attempt {attempts}. Will try again in 5s.')
-                            time.sleep(5)
-                        except requests.exceptions.JSONDecodeError:
-                            logger.error(f'{text}: JSONDecodeError. JSON Decoding failed for page {pageNumber} on attempt {attempts}. Will try to redownloads in 5s.')
-                            time.sleep(5)
-
-                
-                ###############################################
-                
-                
-                rawdatas = []
-                rawdatas_orga = []
-
-                logger.info(f'{text}: Read pages and extract data')
-                
-                for j, jsond in enumerate(jsons):
-                    results = jsond["results"]
-                    for result in results:
-                        rawdata = copy.deepcopy(result["metadata"])
-                        for key, value in rawdata.items():
-                            try:
-                                rawdata[key] = value[0]
-                            except:
-                                rawdata[key] = value
-
-                        if rawdata["projectId"][-4:None] == f"{code:04}":
-                            rawdatas.append(rawdata)
-                            
-                            try:
-                                organizations = rawdata["participants"][0]
-                                organizations = json.loads(organizations)
-                                for organization in organizations:
-                                    organization["projectID"] = rawdata["projectId"]
-                                    rawdatas_orga.append(copy.deepcopy(organization))
-                            except: 
-                                organizations = rawdata["participants"]
-                                organizations = json.loads(organizations)
-                                for organization in organizations:
-                                    organization["projectID"] = rawdata["projectId"]
-                                    rawdatas_orga.append(copy.deepcopy(organization))
-                                
-                
-                part_project_df = pd.DataFrame.from_dict(rawdatas, orient='columns')
-                part_orga_df = pd.DataFrame.from_dict(rawdatas_orga, orient='columns')
-                pdfsnew.append(part_project_df)
-                odfsnew.append(part_orga_df)
-
-                logger.info(f'{text}: Data extraction finished: #Results:, {total_results},  #Projects:, {len(rawdatas)}, #Orgas:, {len(rawdatas_orga)}')
-
-
-
-            logger.info(f'Save data as pickle file')
-            with open("projects_tmp.dat", "wb") as fp:   #Pickling
-                pickle.dump(pdfsnew, fp)
-                
-            with open("orgas_tmp.dat", "wb") as fp:   #Pickling
-                pickle.dump(odfsnew, fp)
-
-        if suppress_crawl == True:
-            file = open("projects_tmp.dat",'rb') #TODO: Triggers memory error, possibly remove
-            pdfsnew = pickle.load(file)
-            file = open("orgas_tmp.dat",'rb')
-            odfsnew = pickle.load(file)
-        
+                        journal.start_suffix(code, total_results)
+                        number_of_pages = total_results // page_size + 1
+                        remaining[code] = number_of_pages
+                        logger.info(f'{text}: Download {number_of_pages} page(s)')
+                        for next_page in range(2, number_of_pages + 1):
+                            submit(code, next_page, 5)
+
+                    if out is None:
+                        journal.record_page(code, page_number, None, None)
+                    else:
+                        journal.record_page(code, page_number, *self._extract_page(code, out))
+                    remaining[code] -= 1
+                    if remaining[code] == 0:
+                        del remaining[code]
+                        self._finish_suffix(journal, code)
+                fill_window()
 
-        project_df = pd.concat(pdfsnew)
-        orga_df = pd.concat(odfsnew)
+    @staticmethod
+    def _get_search_text(code):
+        """Return the search text of an id suffix (e.g. ***0042), or the text matching all projects for ``DELTA_CODE``."""
+        return "***" if code == DELTA_CODE else "***" + f"{code:04}"
+
+    @classmethod
+    def _finish_suffix(cls, journal, code):
+        """Mark a suffix whose pages have all been attempted as done or incomplete."""
+        number_of_projects, number_of_orgas, number_of_failed_pages = journal.get_page_summary(code)
+        _, total_results = journal.get_suffix(code)
+        journal.finish_suffix(code, "incomplete" if number_of_failed_pages else "done")
+        logger.info(f'{cls._get_search_text(code)}: Data extraction finished: #Results:, {total_results},  #Projects:, {number_of_projects}, #Orgas:, {number_of_orgas}')
 
+    @staticmethod
+    def _extract_page(code, jsond):
+        """Extract project and organization rows belonging to one id suffix from a result page.
+
+        Rows are built as new dicts straight from the decoded page, so no copies of
+        the page are needed. All rows of a page of the delta query (``DELTA_CODE``) are kept.
+        """
+        rawdatas = []
+        rawdatas_orga = []
 
+        for result in jsond["results"]:
+            rawdata = {key: _first_value(value) for key, value in result["metadata"].items()}
+            if code != DELTA_CODE and rawdata["projectId"][-4:None] != f"{code:04}":
+                continue
+            rawdatas.append(rawdata)
+
+            participants = rawdata["participants"]
+            try:
+                organizations = json.loads(participants[0])
+            except (json.JSONDecodeError, TypeError, KeyError, IndexError):
+                organizations = json.loads(participants)
+            for organization in organizations:
+                organization["projectID"] = rawdata["projectId"]
+                rawdatas_orga.append(organization)
+
+        return rawdatas, rawdatas_orga
+
+    def _process_raw_data(self, project_df, orga_df):
+        """Rename and reformat raw crawl results and enrich organizations with project data."""
         logger.info(f'Rename and reformat dimensions in project data')
         project_df.rename(columns={'euContributionAmount': 'ecMaxContribution'}, inplace=True)
         project_df.rename(columns={'projectId': 'id'}, inplace=True)
         #project_df.rename(columns={'topicAbbreviation': 'topicId'}, inplace=True)
         project_df.rename(columns={'frameworkProgramme': 'programAbbreviation'}, inplace=True)
-        project_df['startDate'] = pd.to_datetime(project_df['startDate'], format='mixed', utc=True, errors = 'coerce')
-        project_df['endDate'] = pd.to_datetime(project_df['endDate'], format='mixed', utc=True, errors = 'coerce')
-        project_df['ecSignatureDate'] = pd.to_datetime(project_df['ecSignatureDate'], format='mixed', utc=True, errors = 'coerce')
-        
-        
+    
+    
         new_eccontribs = list()
         for j, val in enumerate(project_df['ecMaxContribution']):
             try:
@@ -224,50 +697,159 @@ class FundingAndTenderPortal(DataSource):
             except:
                 new_eccontribs.append(0)
         project_df['ecMaxContribution'] = new_eccontribs
+        project_df = apply_dtypes(project_df, PROJECT_DTYPES)
 
 
         logger.info(f'Enrich organization data using project data')
-        countries = []
-        for k, orga_row in enumerate(orga_df["postalAddress"]):
-            #country = yaml.load(orga_row.replace("None", '\"nan\"'), yaml.SafeLoader)["countryCode"]["abbreviation"]
-            country = orga_row["countryCode"]["abbreviation"]
-            countries.append(country)
-        ## EC Signature date
-        signaturedates = []
-        startdates = []
-        enddates = []
-        acronyms = []
-        hierarchylevel2s = []
-        lastpid =0
-        for k, pid in enumerate(orga_df["projectID"]):
-            if k % 10000 == 0: 
-                logger.info(f'  {k} out of {len(orga_df["projectID"])} organizations enriched')
-            if lastpid != pid: pid_proj_df = project_df[project_df["id"] == pid] #this accelerates the process by a factor of approx 10, since the number of pid filtering processes is minimized.
-            lastpid = pid
-            signaturedates.append( pid_proj_df["ecSignatureDate"].values[0])
-            startdates.append( pid_proj_df["startDate"].values[0])
-            enddates.append( pid_proj_df["endDate"].values[0])
-
-            hierarchylevel2s.append( pid_proj_df["programAbbreviation"].values[0])
-            acronyms.append( pid_proj_df["acronym"].values[0])
+        countries = orga_df["postalAddress"].str.get("countryCode").str.get("abbreviation")
+        # hash join on the project id: each organization gets the dates, programme and acronym of the first project with its id
+        project_attributes = project_df.drop_duplicates(subset="id").set_index("id")[["ecSignatureDate", "startDate", "endDate", "programAbbreviation", "acronym"]]
+        enriched = project_attributes.reindex(orga_df["projectID"])
 
         logger.info(f'Rename dimensions in organization data')
 
-        orga_df["ecSignatureDate"] = signaturedates
-        orga_df["startDate"] = startdates
-        orga_df["endDate"] = enddates
-        orga_df["programAbbreviation"] = hierarchylevel2s
-        orga_df["acronym"] = acronyms
+        orga_df["ecSignatureDate"] = enriched["ecSignatureDate"].array
+        orga_df["startDate"] = enriched["startDate"].array
+        orga_df["endDate"] = enriched["endDate"].array
+        orga_df["programAbbreviation"] = enriched["programAbbreviation"].array
+        orga_df["acronym"] = enriched["acronym"].array
         orga_df["country"] = countries
         
         orga_df.rename(columns={'eucontribution': 'ecMaxContribution'}, inplace=True)
-        orga_df['latitude'] = pd.to_numeric(orga_df['latitude'], errors="coerce")
-        orga_df['longitude'] = pd.to_numeric(orga_df['longitude'], errors="coerce")
+        return project_df, apply_dtypes(orga_df, ORGANIZATION_DTYPES)
+
+    def _load_crawl_state(self):
+        """Load the start times of the last full and the last complete crawl."""
+        try:
+            with open(self.crawl_state_filename) as f:
+                return json.load(f)
+        except (FileNotFoundError, TypeError, json.JSONDecodeError):
+            return {"last_full_crawl": None, "last_crawl": None}
+
+    def _save_crawl_state(self, state):
+        """Persist the crawl state for the next incremental run."""
+        if self.crawl_state_filename is None:
+            return
+        tmp_filename = self.crawl_state_filename + ".tmp"
+        with open(tmp_filename, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_filename, self.crawl_state_filename)
+
+    def _get_delta_query(self, state):
+        """Return the filter of the delta query: projects signed since ``delta_lookback_days`` before the last complete crawl."""
+        last_crawl = datetime.fromisoformat(state.get("last_crawl") or state["last_full_crawl"])
+        since = (last_crawl - timedelta(days=self.delta_lookback_days)).strftime('%Y-%m-%d')
+        return {
+        "bool": {
+            "must": [{"range": {"ecSignatureDate": {"gte": since}}}]
+        }
+        }
+
+    @staticmethod
+    def _upsert(previous_df, new_df, key, project_ids):
+        """Merge freshly crawled rows into the previous snapshot.
+
+        Rows of the crawled projects ``project_ids`` are replaced by the new rows
+        (also when a project has no rows anymore, e.g. no organizations), all other
+        rows are kept. The result is ordered by id suffix like a full crawl.
+        """
+        keep = ~previous_df[key].isin(project_ids)
+        merged_df = pd.concat([previous_df[keep], new_df], ignore_index=True)
+        order = merged_df[key].astype(str).str[-4:].argsort(kind="stable")
+        return merged_df.iloc[order].reset_index(drop=True)
+
+    def crawl_funding_and_tenders_portal(self, suppress_crawl, incremental=False, retry_failed=False):
+        """Crawl F&T portal API for project data or load from cache if suppressed.
         
+        In incremental mode only the projects signed since ``delta_lookback_days``
+        before the last complete crawl are downloaded, with a single delta query
+        instead of one query per id suffix, and upserted into the saved snapshot.
+        Changes to older projects and removed projects are picked up by the next full
+        crawl, which is performed if there is no previous snapshot or the last full
+        crawl is older than ``full_crawl_interval_days``.
+
+        Progress is recorded in the crawl journal. An interrupted crawl continues where
+        it stopped when it is started again in the same mode.
+
+        Args:
+            suppress_crawl: If True, rebuild the data from the journal of the last crawl instead of crawling
+            incremental: If True, only crawl the recently signed projects
+            retry_failed: If True, only crawl the suffixes that failed in the last run again
+
+        Returns:
+            tuple: (project_dataframe, organization_dataframe)
+
+        Raises:
+            ValueError: If ``suppress_crawl`` or ``retry_failed`` is used with an in-memory journal
+        """
+        if (suppress_crawl or retry_failed) and self.crawl_journal_filename == ":memory:":
+            raise ValueError("suppress_crawl and retry_failed need the journal of the last crawl, which is not kept with an in-memory journal")
+        metadata = dict()
+        metadata["SourcingStartDate"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        logger.info(f'Save data as dataframe')
-        project_df.to_pickle(self.raw_project_data_filename)
-        orga_df.to_pickle(self.raw_orga_data_filename)
+        journal = CrawlJournal(self.crawl_journal_filename)
+        state = self._load_crawl_state()
+        if suppress_crawl or retry_failed:
+            incremental = journal.get_mode() == "incremental"
+        elif incremental:
+            last_full_crawl = state.get("last_full_crawl")
+            if last_full_crawl is None or datetime.now() - datetime.fromisoformat(last_full_crawl) > timedelta(days=self.full_crawl_interval_days):
+                logger.info('Last full crawl is missing or too old, fall back to full crawl')
+                incremental = False
+
+        previous_project_df, previous_orga_df = None, None
+        if incremental:
+            try:
+                previous_project_df, previous_orga_df = self.load_saved_data()
+            except FileNotFoundError:
+                logger.info('No previous snapshot found, fall back to full crawl')
+                incremental = False
+        metadata["SourcingMode"] = "incremental" if incremental else "full"
+
+        if not suppress_crawl:
+            if retry_failed:
+                codes = journal.reopen_failed()
+            else:
+                journal.open_run(metadata["SourcingMode"])
+                codes = [DELTA_CODE] if incremental else np.arange(1,10000)
+            # the start of the delta only moves on after a complete crawl, so resumed and retried crawls use the same query
+            query = self._get_delta_query(state) if incremental else None
+
+            logger.info('Begin delta crawl of recently signed projects' if incremental else 'Begin systematic crawl by project id')
+            self._crawl(codes, journal, query=query)
+            journal.finish_run()
+
+        failed_codes = journal.get_codes(("failed", "incomplete"))
+        if failed_codes:
+            logger.error(f'{len(failed_codes)} suffixes failed or are incomplete, e.g. {failed_codes[:10]}')
+
+        logger.info('Build data frames from journal')
+        project_rows = ColumnarRowBuffer()
+        orga_rows = ColumnarRowBuffer()
+        for rawdatas, rawdatas_orga in journal.iter_rows(("done", "incomplete")):
+            project_rows.extend(rawdatas)
+            orga_rows.extend(rawdatas_orga)
+
+        has_new_rows = len(project_rows) > 0
+        if has_new_rows or not incremental:
+            project_df = project_rows.to_frame()
+            orga_df = orga_rows.to_frame()
+            del project_rows, orga_rows
+            project_df, orga_df = self._process_raw_data(project_df, orga_df)
+
+        if incremental:
+            if has_new_rows:
+                changed = ~project_df["id"].isin(previous_project_df["id"]) | ~project_df["esST_checksum"].isin(previous_project_df["esST_checksum"])
+                logger.info(f'Upsert {changed.sum()} new or changed projects into the previous snapshot')
+                crawled_ids = project_df["id"]
+                project_df = self._upsert(previous_project_df, project_df, "id", crawled_ids)
+                orga_df = self._upsert(previous_orga_df, orga_df, "projectID", crawled_ids)
+            else:
+                logger.info('No recently signed projects found, keep previous snapshot')
+                project_df, orga_df = previous_project_df, previous_orga_df
+
+        logger.info(f'Save data as Parquet snapshot')
+        self.save_data(project_df, orga_df)
         
         #################
 
@@ -280,30 +862,27 @@ class FundingAndTenderPortal(DataSource):
                                               'destinationGroup', 'mission', 'destination', 'missionGroup'])
         orga_df = orga_df.drop(columns=['organizationType', 'website'])
         
-        project_df = project_df.astype(str)
-        orga_df = orga_df.astype(str)
-        orga_df['latitude'] = pd.to_numeric(orga_df['latitude'], errors="coerce")
-        orga_df['longitude'] = pd.to_numeric(orga_df['longitude'], errors="coerce") 
-        project_df['ecMaxContribution'] = pd.to_numeric(project_df['ecMaxContribution'], errors="coerce")
-        orga_df['ecMaxContribution'] = pd.to_numeric(orga_df['ecMaxContribution'], errors="coerce")
-        project_df['startDate'] = pd.to_datetime(project_df['startDate'], format='mixed', utc=True, errors = 'coerce')
-        project_df['endDate'] = pd.to_datetime(project_df['endDate'], format='mixed', utc=True, errors = 'coerce')
-        project_df['ecSignatureDate'] = pd.to_datetime(project_df['ecSignatureDate'], format='mixed', utc=True, errors = 'coerce')
-        orga_df['startDate'] = pd.to_datetime(orga_df['startDate'], format='mixed', utc=True, errors = 'coerce')
-        orga_df['endDate'] = pd.to_datetime(orga_df['endDate'], format='mixed', utc=True, errors = 'coerce')
-        orga_df['ecSignatureDate'] = pd.to_datetime(orga_df['ecSignatureDate'], format='mixed', utc=True, errors = 'coerce')
+        project_df = apply_dtypes(project_df, PROJECT_DTYPES)
+        orga_df = apply_dtypes(orga_df, ORGANIZATION_DTYPES)
         print(project_df.columns)
         
         logger.info(f'Save data as database:')
         metadata["SourcingEndDate"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         metadata_df = pd.DataFrame([metadata])
-        conn_db = sqlite3.connect("deliverables/ft_portal_raw.db")
-        logger.info(f'Add projects...')
-        project_df.to_sql('projects', conn_db, if_exists='replace')
-        logger.info(f'Add orgas...')
-        orga_df.to_sql('organizations', conn_db, if_exists='replace')
+        publisher = SQLitePublisher(self.raw_db_filename)
+        logger.info(f'Add projects, orgas and summaries...')
+        publisher.publish_projects_and_organizations(project_df, orga_df)
         logger.info(f'Add metadata...')
-        metadata_df.to_sql('metadata', conn_db, if_exists='replace')
+        publisher.publish('metadata', metadata_df)
+        publisher.close()
+
+        if not suppress_crawl and not retry_failed:
+            if not incremental:
+                state = {"last_full_crawl": metadata["SourcingStartDate"], "last_crawl": metadata["SourcingStartDate"]}
+            elif not failed_codes:
+                state["last_crawl"] = metadata["SourcingStartDate"]
+            self._save_crawl_state(state)
+        journal.close()
         logger.info(f'Completed.')
         
 
@@ -319,8 +898,8 @@ class ManualData(DataSource):
         logger.info('Manual Data sourcer initialized')
 
     def load_saved_data(self, manual_project_data_filename, manual_orga_data_filename):
-        """Load project and organization data from CSV files with semicolon delimiter."""
+        """Load project and organization data from CSV files with semicolon delimiter (in the dtypes of the F&T data)."""
         logger.info(f'Load manual data from {manual_project_data_filename} and {manual_orga_data_filename}')
-        project_df = pd.read_csv(manual_project_data_filename, delimiter=";")
-        orga_df = pd.read_csv(manual_orga_data_filename, delimiter=";")
+        project_df = apply_dtypes(pd.read_csv(manual_project_data_filename, delimiter=";"), PROJECT_DTYPES)
+        orga_df = apply_dtypes(pd.read_csv(manual_orga_data_filename, delimiter=";"), ORGANIZATION_DTYPES)
         return project_df, orga_df
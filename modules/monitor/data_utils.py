@@ -2,7 +2,12 @@
 import os
 from zipfile import ZipFile
 import datetime
+import threading
+import time
 import requests
+import hashlib
+import json
+import pandas as pd
 
 def delete_files_except_zip(self, folder):
         for filename in os.listdir(folder):
@@ -58,6 +63,48 @@ def strip_by_dimension(project_df, orga_df, dimension_key, value):
     orga_df = orga_df[orga_df["projectID"].isin(project_df["id"])]
     return project_df, orga_df
 
+
+# Dtypes of the project and organization frames: low-cardinality text columns are categoricals, amounts,
+# coordinates and scores numbers and dates timestamps in UTC. Columns that are not listed keep their dtype.
+# Scores stay float64 as they are compared with the (float64) thresholds of the workflow settings.
+PROJECT_DTYPES = {"programAbbreviation": "category", "LLMCategory": "category", "LLMSubCategory": "category", "LLM_TRL": "category",
+                  "ecMaxContribution": "float64", "matchScore": "float64", "semanticScore": "float64",
+                  "startDate": "datetime", "endDate": "datetime", "ecSignatureDate": "datetime"}
+
+ORGANIZATION_DTYPES = {"programAbbreviation": "category", "country": "category", "role": "category", "type": "category",
+                       "ecMaxContribution": "float64", "latitude": "float64", "longitude": "float64",
+                       "startDate": "datetime", "endDate": "datetime", "ecSignatureDate": "datetime"}
+
+
+def apply_dtypes(df, dtypes):
+    """Convert the columns of a DataFrame to the dtypes of a schema (values that do not fit become missing).
+
+    Args:
+        df: Project or organization frame
+        dtypes: Dict mapping columns to "category", "datetime" (UTC) or a numeric dtype, e.g. ``PROJECT_DTYPES``
+
+    Returns:
+        DataFrame: Copy of ``df`` with converted columns
+    """
+    df = df.copy(deep=False)
+    for column, dtype in dtypes.items():
+        if column not in df.columns:
+            continue
+        series = df[column]
+        if dtype == "category":
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                df[column] = series.astype("category")
+        elif dtype == "datetime":
+            if not pd.api.types.is_datetime64_any_dtype(series.dtype):
+                df[column] = pd.to_datetime(series, format="mixed", utc=True, errors="coerce")
+            elif series.dt.tz is None:
+                df[column] = series.dt.tz_localize("UTC")
+            elif str(series.dt.tz) != "UTC":
+                df[column] = series.dt.tz_convert("UTC")
+        elif series.dtype != dtype:
+            df[column] = pd.to_numeric(series, errors="coerce").astype(dtype)
+    return df
+
 def send_teams_message(webhook_url: str, message: str) -> bool:
     """Send a message to a Microsoft Teams channel via Incoming Webhook.
     
@@ -76,4 +123,97 @@ def send_teams_message(webhook_url: str, message: str) -> bool:
         return True
     except requests.RequestException as e:
         print(f"Error: {e}")
-        return False
\ No newline at end of file
+        return False
+
+
+class RateLimiter:
+    """Thread-safe token bucket that limits how often an operation may run.
+
+    A caller is always charged the full amount. If the bucket holds fewer tokens, it goes into
+    debt and the caller waits until the debt is paid off, so amounts larger than the capacity
+    (e.g. long prompts against a token budget) are limited correctly as well.
+
+    Args:
+        rate: Number of tokens refilled per second. ``None`` or 0 disables limiting.
+        capacity: Maximum number of tokens that can be saved up for bursts (defaults to ``rate``)
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate or 1, 1)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        """Consume ``amount`` tokens, blocking until the bucket is no longer in debt."""
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+
+def fingerprint(*parts):
+    """Return a hash of JSON-serializable parts (e.g. an evaluation result and its plotting parameters)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def hash_rows(df, index=False):
+    """Return a 64-bit hash of each row of a DataFrame (stable across processes)."""
+    try:
+        return pd.util.hash_pandas_object(df, index=index)
+    except TypeError:
+        #columns holding lists or dicts cannot be hashed directly
+        return pd.util.hash_pandas_object(df.astype(str), index=index)
+
+
+def fingerprint_df(df):
+    """Return a hash of the columns, dtypes and values of a DataFrame."""
+    sha = hashlib.sha256(json.dumps([list(map(str, df.columns)), list(map(str, df.dtypes))]).encode())
+    sha.update(hash_rows(df, index=True).to_numpy().tobytes())
+    return sha.hexdigest()
+
+
+class DeliverableManifest:
+    """Fingerprints of the deliverables of a workflow, to write only the deliverables whose content changed.
+
+    The manifest is a JSON file listing for each deliverable the fingerprint of its content and
+    when it last changed, and which deliverables changed in the last run. It is only written by
+    ``save``, so deliverables of a run that failed are written again in the next run.
+
+    Args:
+        filename: JSON file of the manifest
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.previous = dict()
+        if os.path.exists(filename):
+            with open(filename) as f:
+                self.previous = json.load(f).get("deliverables", dict())
+        self.deliverables = dict()
+        self.changed = []
+
+    def is_unchanged(self, path, content_fingerprint):
+        """Record the fingerprint of a deliverable and return whether the existing file already has this content."""
+        previous = self.previous.get(path, dict())
+        unchanged = previous.get("fingerprint") == content_fingerprint and os.path.exists(path)
+        if unchanged:
+            self.deliverables[path] = previous
+        else:
+            self.deliverables[path] = {"fingerprint": content_fingerprint, "updated": datetime.datetime.now().isoformat()}
+            self.changed.append(path)
+        return unchanged
+
+    def save(self):
+        """Write the manifest with the deliverables recorded in this run."""
+        manifest = {"updated": datetime.datetime.now().isoformat(), "changed": self.changed, "deliverables": self.deliverables}
+        with open(self.filename + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(self.filename + ".tmp", self.filename)
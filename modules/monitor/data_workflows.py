@@ -1,8 +1,10 @@
 import logging
 from data_sourcing import FundingAndTenderPortal, ManualData
-from data_processing import KeywordMatchScorer, LLMCategorizer
-from data_evaluation import OrganizationsByCountryGroupOverTime
+from data_processing import KeywordMatchScorer, MultiTopicMatchScorer, InvertedIndex, LLMCategorizer, LLMResponseCache, OpenAIBatchRunner, DirectoryBatchRunner
+from data_evaluation import OrganizationsByCountryGroupOverTime, EvaluationCube, ChartRenderer
 from data_delivering import TeamsDeliverer
+from data_embedding import EmbeddingStore, IVFIndex
+from data_publishing import SQLitePublisher, SnapshotPublisher
 from data_utils import *
 
 import pandas as pd 
@@ -12,6 +14,7 @@ import sqlite3
 import shutil
 from workflow_settings import sourcing_settings
 import os
+import openai
 
 logger = logging.getLogger(__name__)
 
@@ -27,19 +30,57 @@ class Workflow():
         self.settings = settings_class
 
 class DataSourcingWorkflow(Workflow):
-    def __init__(self, name, settings_class):
+    def __init__(self, name, settings_class, topic_settings=None, corpus_cache=None):
         super().__init__(name, settings_class)
+        self.topic_settings = topic_settings or []
+        self.corpus_cache = corpus_cache
 
     def run(self):
-        data_source_ft = FundingAndTenderPortal(self.settings.raw_projects_filename, self.settings.raw_organizations_filename)
-        data_source_ft.update_source(suppress_crawl=self.settings.suppress_ft_crawl)
+        data_source_ft = FundingAndTenderPortal(self.settings.raw_projects_filename, self.settings.raw_organizations_filename,
+                                                max_in_flight=self.settings.crawl_max_in_flight,
+                                                requests_per_second=self.settings.crawl_requests_per_second,
+                                                crawl_state_filename=self.settings.crawl_state_filename,
+                                                full_crawl_interval_days=self.settings.full_crawl_interval_days,
+                                                delta_lookback_days=self.settings.delta_lookback_days,
+                                                crawl_journal_filename=self.settings.crawl_journal_filename,
+                                                raw_db_filename=self.settings.raw_db_filename,
+                                                corpus_cache=self.corpus_cache)
+        data_source_ft.update_source(suppress_crawl=self.settings.suppress_ft_crawl, incremental=self.settings.incremental_sourcing)
+        if self.corpus_cache is not None:
+            # load the new snapshot once for all topic workflows
+            self.corpus_cache.refresh()
+        if self.settings.metabase_directory:
+            SnapshotPublisher(self.settings.metabase_directory).publish(self.settings.raw_db_filename)
+
+        project_df = data_source_ft.load_projects(columns=["id", "title", "objective"])
+        InvertedIndex(self.settings.inverted_index_filename).build(project_df, snapshot=data_source_ft.get_snapshot_version())
+        embedding_store = EmbeddingStore(self.settings.embedding_directory)
+        embedding_store.update(project_df)
+        IVFIndex(embedding_store).update()
+
+        if self.topic_settings:
+            # score all topics in one pass, the topic workflows read their columns of the score table
+            match_scorer = MultiTopicMatchScorer(project_df, {settings.topic: settings.keyword_list for settings in self.topic_settings})
+            match_scorer.compute_match_scores()
+            match_scorer.save(self.settings.match_scores_filename, snapshot=data_source_ft.get_snapshot_version())
     
 
 
 
 class MonitorWorkflow(Workflow):
-    def __init__(self, name, settings_class):
+    def __init__(self, name, settings_class, corpus_cache=None):
         super().__init__(name, settings_class)
+        self.corpus_cache = corpus_cache
+
+    def has_pending_batch(self):
+        """Return True if a LLM batch job of this workflow waits to be ingested."""
+        return self.settings.llm_batch_mode and os.path.exists(self.settings.llm_batch_state_filename)
+
+    def get_batch_runner(self):
+        """Return the runner for LLM batch jobs selected in the settings."""
+        if self.settings.llm_batch_runner == "directory":
+            return DirectoryBatchRunner(self.settings.llm_batch_directory)
+        return OpenAIBatchRunner(openai.OpenAI(api_key=os.getenv("lite_llm_api_key"), base_url=os.getenv("lite_llm_url")))
         
     def run(self):
 
@@ -50,19 +91,46 @@ class MonitorWorkflow(Workflow):
         
 
         if not self.settings.suppress_llm_categorization:
-            data_source_ft = FundingAndTenderPortal(sourcing_settings.raw_projects_filename, sourcing_settings.raw_organizations_filename)
-            project_df, orga_df = data_source_ft.load_saved_data()
-
-
-            match_scorer = KeywordMatchScorer(project_df, orga_df, self.settings.keyword_list)
-            match_scorer.compute_add_match_score()
+            data_source_ft = FundingAndTenderPortal(sourcing_settings.raw_projects_filename, sourcing_settings.raw_organizations_filename,
+                                                    corpus_cache=self.corpus_cache)
+            # use the scores computed for all topics after sourcing if they are up to date
+            project_df = MultiTopicMatchScorer.load_topic_scores(sourcing_settings.match_scores_filename, self.settings.topic,
+                                                                 self.settings.keyword_list, snapshot=data_source_ft.get_snapshot_version())
+            if project_df is not None:
+                match_scorer = KeywordMatchScorer(project_df, None, self.settings.keyword_list)
+            else:
+                # only the ids are needed for scoring from the index, the text columns for scoring without it,
+                # the rest is loaded for the filtered projects
+                index = InvertedIndex(sourcing_settings.inverted_index_filename)
+                if index.snapshot is None or index.snapshot != data_source_ft.get_snapshot_version():
+                    index = None
+                project_df = data_source_ft.load_projects(columns=["id"] if index is not None else ["id", "title", "objective"])
+                match_scorer = KeywordMatchScorer(project_df, None, self.settings.keyword_list, index=index)
+                match_scorer.compute_add_match_score()
+            embedding_store = EmbeddingStore(sourcing_settings.embedding_directory)
+            if embedding_store.exists():
+                # the topic is described by its keywords and the categorization prompt
+                match_scorer.add_semantic_score(embedding_store, " ".join(self.settings.keyword_list) + " " + self.settings.prompt_instruction)
             match_scorer.plot_matchscore_histogram(self.settings.matchscore_histogram_filename)
-            project_df, orga_df = match_scorer.get_filtered_data(self.settings.match_score_threshold)
+            project_df, orga_df = match_scorer.get_filtered_data(self.settings.match_score_threshold, data_source=data_source_ft,
+                                                                 semantic_threshold=self.settings.semantic_score_threshold)
             
 
 
-            llm_categorizer = LLMCategorizer(project_df, orga_df, self.settings.prompt_instruction)
-            llm_categorizer.categorize(model_location=self.settings.llm_location)
+            llm_categorizer = LLMCategorizer(project_df, orga_df, self.settings.prompt_instruction,
+                                             max_concurrency=self.settings.llm_max_concurrency,
+                                             requests_per_minute=self.settings.llm_requests_per_minute,
+                                             tokens_per_minute=self.settings.llm_tokens_per_minute,
+                                             cache=LLMResponseCache(self.settings.llm_cache_filename),
+                                             pack_size=self.settings.llm_pack_size)
+            if self.settings.llm_batch_mode:
+                if not llm_categorizer.categorize_batch(self.get_batch_runner(), self.settings.llm_batch_state_filename):
+                    # the workflow is run again by the scheduler until the batch job is done
+                    llm_categorizer.cache.close()
+                    return
+            else:
+                llm_categorizer.categorize(model_location=self.settings.llm_location)
+            llm_categorizer.cache.close()
             project_df, orga_df = llm_categorizer.get_data()
 
 
@@ -122,13 +190,9 @@ class MonitorWorkflow(Workflow):
         current_year = datetime.now().year
         print(current_year)
 
-        #not sure if the block below is needed as the same is already done in the sourcing class....
-        project_df['startDate'] = pd.to_datetime(project_df['startDate'], format='mixed', utc=True, errors = 'coerce')
-        project_df['endDate'] = pd.to_datetime(project_df['endDate'], format='mixed', utc=True, errors = 'coerce')
-        project_df['ecSignatureDate'] = pd.to_datetime(project_df['ecSignatureDate'], format='mixed', utc=True, errors = 'coerce')
-        orga_df['ecSignatureDate'] = pd.to_datetime(orga_df['ecSignatureDate'], format='mixed', utc=True, errors = 'coerce')
-        orga_df['startDate'] = pd.to_datetime(orga_df['startDate'], format='mixed', utc=True, errors = 'coerce')
-        orga_df['endDate'] = pd.to_datetime(orga_df['endDate'], format='mixed', utc=True, errors = 'coerce')
+        #the CSV files hold text, categories, amounts and dates get the dtypes of the F&T data again
+        project_df = apply_dtypes(project_df, PROJECT_DTYPES)
+        orga_df = apply_dtypes(orga_df, ORGANIZATION_DTYPES)
 
 
         print(project_df.columns)
@@ -147,32 +211,41 @@ class MonitorWorkflow(Workflow):
         metadata["keyword_list"] = ",".join(self.settings.keyword_list)
         metadata["matchscore_threshold"] = self.settings.match_score_threshold
         metadata_df = pd.DataFrame([metadata])
-        conn_db = sqlite3.connect(self.settings.db_filename)
-        project_df.to_sql('projects', conn_db, if_exists='replace')
-        orga_df.to_sql('organizations', conn_db, if_exists='replace')
-        metadata_df.to_sql('metadata', conn_db, if_exists='replace')
-
-
-
-
+        #deliverables (database tables, charts, results) are only written again when their content changed
+        manifest = DeliverableManifest(self.settings.deliverable_manifest_filename)
+        tables_unchanged = manifest.is_unchanged(self.settings.db_filename, fingerprint(fingerprint_df(project_df), fingerprint_df(orga_df)))
+        publisher = SQLitePublisher(self.settings.db_filename)
+        if tables_unchanged:
+            logger.info(f"Projects and organizations unchanged, skip writing them to {self.settings.db_filename}")
+        else:
+            publisher.publish_projects_and_organizations(project_df, orga_df)
+        publisher.publish('metadata', metadata_df)
+        publisher.close()
+        if self.settings.metabase_directory:
+            SnapshotPublisher(self.settings.metabase_directory).publish(self.settings.db_filename)
+
+
+
+
+        #facts and aggregates shared by all evaluations, prepared once per run
+        cube = EvaluationCube(project_df, orga_df)
+        #charts are rendered in worker processes and files written in the background while the next evaluations run
+        renderer = ChartRenderer(max_workers=self.settings.render_max_workers, manifest=manifest)
         for evaluation_name, evaluation_class in self.settings.evaluations.items():
-            evaluation = evaluation_class(project_df, orga_df)
+            evaluation = evaluation_class(project_df, orga_df, cube=cube)
             evaluation.evaluate(2015, current_year)
-            evaluation.plot_result(f"deliverables/{self.name}/{evaluation_name}.png")
-            json_string = json.dumps(evaluation.result, indent=4)
-            with open(f"deliverables/{self.name}/{evaluation_name}.json", 'w') as f:
-                json.dump(evaluation.result, f)
+            renderer.render(evaluation, f"deliverables/{self.name}/{evaluation_name}.png")
+            renderer.write_json(evaluation.result, f"deliverables/{self.name}/{evaluation_name}.json")
 
         evaluation_name = "OrganizationsByCountryGroupOverTime"
-        evaluation = OrganizationsByCountryGroupOverTime(project_df, orga_df)
+        evaluation = OrganizationsByCountryGroupOverTime(project_df, orga_df, cube=cube)
         evaluation.evaluate(2015, current_year, fraction=False)
-        json_string = json.dumps(evaluation.result, indent=4)
-        with open(f"deliverables/{self.name}/{evaluation_name}_absolute.json", 'w') as f:
-            json.dump(evaluation.result, f)
+        renderer.write_json(evaluation.result, f"deliverables/{self.name}/{evaluation_name}_absolute.json")
 
 
         ################# DELIVERY OF THE DELIVERABLES ########################
         if self.settings.send_deliverable == True:
+            renderer.wait()
             zip_filename = zip_files_in_folder(f"deliverables/{self.name}", f"deliverables/{self.name}/deliverables")
             #deliverer = GMailDeliverer(self.settings.deliverable_email_settings["sender"], self.settings.deliverable_email_settings["recipients"], self.settings.deliverable_email_settings["subject"], self.settings.deliverable_email_settings["message"], attachment_filename=f"{zip_filename}")
             #deliverer.send_mail()
@@ -216,4 +289,7 @@ This is an automated message generated by EFMO, the European Funding Monitor. If
         ################# Set downloaded data as new ########################
         #Delete old project and orga data and Rename new project and orga file such that it becomes the old one
         shutil.copy(self.settings.filtered_projects_filename, self.settings.filtered_prev_projects_filename)
+        renderer.close()
+        manifest.save()
+        logger.info(f"Deliverables changed in this run: {manifest.changed}")
         logger.info(f"WORKFLOW COMPLETED")
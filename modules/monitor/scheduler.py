@@ -1,5 +1,6 @@
 import logging
 from data_workflows import MonitorWorkflow, DataSourcingWorkflow
+from data_sourcing import CorpusCache
 from workflow_settings import quantum_settings, hpc_settings, sourcing_settings, ai_settings, cybersecurity_settings
 
 import schedule
@@ -8,58 +9,77 @@ import os
 from dotenv import load_dotenv
 
 
-logging.basicConfig(
-    level=logging.INFO,
-    datefmt='%Y-%m-%d %H:%M:%S',
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler("scheduler.log"),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-load_dotenv()  # Load environment variables from .env file
-
-env = os.getenv('ENV', 'dev')
-# Verify environment variables are loaded correctly
-logger.info("Environment variables loaded:")
-logger.info(f"ENV: {os.getenv('ENV', 'not set')[:10]}")
-logger.info(f"lite_llm_url: {os.getenv('lite_llm_url', 'not set')[:10]}")
-logger.info(f"lite_llm_model: {os.getenv('lite_llm_model', 'not set')[:10]}")
-logger.info(f"lite_llm_api_key: {os.getenv('lite_llm_api_key', 'not set')[:10]}")
-logger.info(f"hook_teams: {os.getenv('hook_teams', 'not set')[:10]}")
-
-# create necessary folders if missing
-folders = ["data", "deliverables", "embedding"]
-for folder in folders:
-    if not os.path.exists(folder):
-        os.makedirs(folder)
-        logger.info(f"Created folder: {folder}")
+
+def main():
+    """Set up the workflows and run them on schedule (never returns).
+
+    Everything happens in here and not at import, as the worker processes rendering the charts
+    (``render_max_workers``) import this module again.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        datefmt='%Y-%m-%d %H:%M:%S',
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        handlers=[
+            logging.FileHandler("scheduler.log"),
+            logging.StreamHandler()
+        ]
+    )
+
+    load_dotenv()  # Load environment variables from .env file
+
+    env = os.getenv('ENV', 'dev')
+    # Verify environment variables are loaded correctly
+    logger.info("Environment variables loaded:")
+    logger.info(f"ENV: {os.getenv('ENV', 'not set')[:10]}")
+    logger.info(f"lite_llm_url: {os.getenv('lite_llm_url', 'not set')[:10]}")
+    logger.info(f"lite_llm_model: {os.getenv('lite_llm_model', 'not set')[:10]}")
+    logger.info(f"lite_llm_api_key: {os.getenv('lite_llm_api_key', 'not set')[:10]}")
+    logger.info(f"hook_teams: {os.getenv('hook_teams', 'not set')[:10]}")
+
+    # create necessary folders if missing
+    folders = ["data", "deliverables", "embedding"]
+    for folder in folders:
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+            logger.info(f"Created folder: {folder}")
+        else:
+            logger.info(f"Folder already exists: {folder}")
+
+
+    # the F&T snapshot is kept in memory once for all workflows and only read again after a new snapshot was written
+    corpus_cache = CorpusCache(sourcing_settings.raw_projects_filename, sourcing_settings.raw_organizations_filename)
+    sourcing_workflow = DataSourcingWorkflow("sourcing", sourcing_settings,
+                                             topic_settings=[quantum_settings, hpc_settings, ai_settings, cybersecurity_settings],
+                                             corpus_cache=corpus_cache)
+    quantum_workflow = MonitorWorkflow("quantum", quantum_settings, corpus_cache=corpus_cache)
+    hpc_workflow = MonitorWorkflow("hpc", hpc_settings, corpus_cache=corpus_cache)
+    ai_workflow = MonitorWorkflow("ai", ai_settings, corpus_cache=corpus_cache)
+    cybersecurity_workflow = MonitorWorkflow("cybersecurity", cybersecurity_settings, corpus_cache=corpus_cache)
+
+
+    if env == 'prod':
+        schedule.every().wednesday.at("0:35").do(lambda: sourcing_workflow.run())
+        schedule.every().tuesday.at("06:35").do(lambda: cybersecurity_workflow.run())
+        schedule.every().friday.at("06:35").do(lambda: quantum_workflow.run())
+        schedule.every().monday.at("06:35").do(lambda: hpc_workflow.run())
+        schedule.every().tuesday.at("06:35").do(lambda: ai_workflow.run())
+        # finish the workflows that wait for a LLM batch job
+        for monitor_workflow in [quantum_workflow, hpc_workflow, ai_workflow, cybersecurity_workflow]:
+            schedule.every().hour.do(lambda workflow=monitor_workflow: workflow.run() if workflow.has_pending_batch() else None)
     else:
-        logger.info(f"Folder already exists: {folder}")
-
-
-sourcing_workflow = DataSourcingWorkflow("sourcing", sourcing_settings)
-quantum_workflow = MonitorWorkflow("quantum", quantum_settings)
-hpc_workflow = MonitorWorkflow("hpc", hpc_settings)
-ai_workflow = MonitorWorkflow("ai", ai_settings)
-cybersecurity_workflow = MonitorWorkflow("cybersecurity", cybersecurity_settings)
-
-
-if env == 'prod':
-    schedule.every().wednesday.at("0:35").do(lambda: sourcing_workflow.run())
-    schedule.every().tuesday.at("06:35").do(lambda: cybersecurity_workflow.run())
-    schedule.every().friday.at("06:35").do(lambda: quantum_workflow.run())
-    schedule.every().monday.at("06:35").do(lambda: hpc_workflow.run())
-    schedule.every().tuesday.at("06:35").do(lambda: ai_workflow.run())
-else:
-    # dev test - run sourcing immediately and quantum 10 seconds after
-    #sourcing_workflow.run()
-    #time.sleep(10)  # wait 10 seconds
-    quantum_workflow.run()
-
-while True:
-    logger.info('Keep alive')
-    schedule.run_pending()
-    time.sleep(60)
+        # dev test - run sourcing immediately and quantum 10 seconds after
+        #sourcing_workflow.run()
+        #time.sleep(10)  # wait 10 seconds
+        quantum_workflow.run()
+
+    while True:
+        logger.info('Keep alive')
+        schedule.run_pending()
+        time.sleep(60)
+
+
+if __name__ == "__main__":
+    main()
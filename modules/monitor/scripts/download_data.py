@@ -20,20 +20,24 @@ def main():
     data_dir = base_dir / "data_test"
     data_dir.mkdir(exist_ok=True)
     
-    project_file = data_dir / "raw_projects.pkl"
-    orga_file = data_dir / "raw_organizations.pkl"
+    project_file = data_dir / "raw_projects.parquet"
+    orga_file = data_dir / "raw_organizations.parquet"
+    journal_file = data_dir / "crawl_journal.db"
     
     # Initialize and run download
     ft_portal = FundingAndTenderPortal(
         raw_project_data_filename=str(project_file),
-        raw_orga_data_filename=str(orga_file)
+        raw_orga_data_filename=str(orga_file),
+        crawl_journal_filename=str(journal_file)
     )
     
     # You can choose to suppress crawling if you want to use cached data
     suppress_crawl = False  # Set to True to use cached data
+    # Set to True to crawl only the suffixes that failed in the last run again
+    retry_failed = False
     
     print("Starting data download...")
-    project_df, orga_df = ft_portal.update_source(suppress_crawl=suppress_crawl)
+    project_df, orga_df = ft_portal.update_source(suppress_crawl=suppress_crawl, retry_failed=retry_failed)
     
     print(f"\nDownload completed!")
     print(f"Projects downloaded: {len(project_df)}")
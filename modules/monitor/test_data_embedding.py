@@ -0,0 +1,72 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from data_embedding import EmbeddingStore, HashingEmbedder, IVFIndex
+
+
+def test_embedding_store_incremental_update(tmp_path):
+    """Incremental updates must give the same vectors as embedding everything from scratch."""
+    embedder = HashingEmbedder(dim=64)
+    store = EmbeddingStore(str(tmp_path), embedder=embedder)
+    project_df = pd.DataFrame({"id": [f"p{i}" for i in range(10)], "title": [f"title {i}" for i in range(10)],
+                               "objective": [f"quantum computing with qubits number {i}" if i % 2 else f"robots in factories {i}" for i in range(10)]})
+    store.update(project_df)
+
+    project_df.loc[3, "objective"] = "an edited description about supercomputers"
+    project_df = pd.concat([project_df.drop(index=[0, 1]), pd.DataFrame({"id": ["p10"], "title": ["new"], "objective": ["quantum sensors"]})])
+    store.update(project_df)
+
+    ids = list(project_df["id"]) + ["p0", "unknown"]
+    expected = embedder.embed([str(title) + " " + str(objective) for title, objective in zip(project_df["title"], project_df["objective"])])
+    vectors = store.get_vectors(ids)
+    assert np.array_equal(vectors[:len(project_df)], expected)
+    assert not vectors[-2:].any()
+
+    # dropping most projects compacts the matrix
+    store.update(project_df.iloc[:2])
+    assert np.array_equal(store.get_vectors(list(project_df["id"][:2])), expected[:2])
+    assert np.array_equal(store.get_vectors(list(project_df["id"])[2:]), np.zeros((len(project_df) - 2, 64), dtype=np.float32))
+
+
+def test_semantic_similarity_ranks_related_texts_higher():
+    """Texts about the topic must be more similar to the topic description than unrelated texts."""
+    embedder = HashingEmbedder()
+    topic = embedder.embed_text("quantum computing, qubits, quantum communication and quantum sensing")
+    related, unrelated = embedder.embed(["A quantum computer based on superconducting qubits", "Sustainable farming of potatoes in dry regions"])
+    assert related @ topic > unrelated @ topic
+    assert abs(np.linalg.norm(related) - 1) < 1e-6
+
+
+def topic_projects(n, seed=0):
+    """Projects whose texts are drawn from a few vocabularies, so that they form clusters."""
+    rng = random.Random(seed)
+    vocabularies = [[f"{topic}{i}" for i in range(30)] for topic in ["quantum", "robot", "climate", "health", "energy"]]
+    return pd.DataFrame({"id": [f"p{i}" for i in range(n)], "title": [""] * n,
+                         "objective": [" ".join(rng.choice(vocabularies[i % 5]) for _ in range(40)) for i in range(n)]})
+
+
+def test_ivf_index_recall_and_updates(tmp_path):
+    """The IVF index must find most of the exact nearest neighbours and follow the updates of the store."""
+    store = EmbeddingStore(str(tmp_path), embedder=HashingEmbedder(dim=128))
+    project_df = topic_projects(1000)
+    store.update(project_df)
+    index = IVFIndex(store)
+    index.update()
+
+    vectors = store.get_vectors(list(project_df["id"]))
+    recalls = []
+    for i in range(0, 1000, 50):
+        exact = set(np.array(project_df["id"])[np.argsort(-(vectors @ vectors[i]))[:10]])
+        approximate = set(project_id for project_id, score in index.query(vectors[i], k=10))
+        recalls.append(len(exact & approximate) / 10)
+    assert np.mean(recalls) >= 0.9
+
+    # a new project is found right after the incremental update, a removed one is not found anymore
+    twin = pd.DataFrame({"id": ["twin"], "title": [""], "objective": [project_df["objective"][7]]})
+    store.update(pd.concat([project_df.drop(index=[3]), twin]))
+    index = IVFIndex(store)
+    index.update()
+    assert index.similar_projects("p7", k=1)[0][0] == "twin"
+    assert "p3" not in [project_id for project_id, score in index.query(vectors[3], k=50)]
@@ -0,0 +1,245 @@
+import copy
+import datetime
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+import pandas as pd
+
+from data_utils import DeliverableManifest, PROJECT_DTYPES, ORGANIZATION_DTYPES, apply_dtypes
+from data_evaluation import (ChartRenderer, render_chart, EvaluationCube, OrganizationsByCountryGroupOverTime, OrganizationTypeByCountryGroupOverTime, TotalFundingbyFP,
+                             TotalFundingByFPOverTime, TotalFundingByLLMCategoryOverTime, create_year_list)
+
+
+def reference_count_over_time(orga_df, group_column, groups, xyears, fraction=True):
+    """Year expansion and counts as computed by the original row-by-row implementation."""
+    rows = []
+    for index, row in orga_df.iterrows():
+        for year in range(row["startDate"].year, row["endDate"].year + 1):
+            new_row = row.copy()
+            new_row["ecSignatureDate"] = datetime.datetime(year, 1, 1)
+            rows.append(new_row)
+    orga_df = pd.DataFrame(rows)
+    if callable(groups):
+        groups = groups(orga_df)
+    fund_dat = dict()
+    for group_label, group in groups.items():
+        year_dict = copy.deepcopy(dict.fromkeys(xyears, 0))
+        group_df = orga_df[orga_df[group_column].isin(group)]
+        query = group_df["ecMaxContribution"].groupby(group_df["ecSignatureDate"].dt.year).count()
+        query_total = orga_df["ecMaxContribution"].groupby(orga_df["ecSignatureDate"].dt.year).count()
+        for key, value in dict(query).items():
+            if str(int(float(key))) in year_dict.keys():
+                year_dict[str(key)] = float(value)/query_total[key]*100 if fraction else float(value)
+        fund_dat[group_label] = year_dict
+    return fund_dat
+
+
+def random_orgas(n, seed=0):
+    """Organizations with multi-year projects, missing contributions and UK participants before and after Brexit."""
+    rng = np.random.default_rng(seed)
+    start = pd.to_datetime("2012-01-01") + pd.to_timedelta(rng.integers(0, 12 * 365, n), unit="D")
+    return pd.DataFrame({
+        "projectID": rng.integers(0, n // 3, n).astype(str),
+        "country": rng.choice(["DE", "FR", "PL", "UK", "CH", "US", "EL", "IT", "RO"], n),
+        "type": rng.choice(["PRC", "HES", "PUB", "REC", "OTH", "nan", "XYZ"], n),
+        "ecMaxContribution": np.where(rng.random(n) < 0.1, np.nan, rng.random(n) * 1e6),
+        "ecSignatureDate": start - pd.to_timedelta(rng.integers(0, 200, n), unit="D"),
+        "startDate": start,
+        "endDate": start + pd.to_timedelta(rng.integers(-100, 6 * 365, n), unit="D"),
+    })
+
+
+def non_eu_groups(orga_df):
+    """Country groups of OrganizationsByCountryGroupOverTime, with all other countries as Non-EU."""
+    groups = {"Widening Countries (EU)": ["BG", "HR", "CY", "CZ", "EE", "EL", "HU", "LV", "LT", "MT", "PL", "PT", "RO", "SK", "SI"],
+              "Other EU": ["AT", "BE", "DE", "DK", "ES", "FI", "FR", "IT", "NL", "SE", "IE", "LU", "UK"]}
+    existing_codes = set(groups.keys()).union(*groups.values())
+    groups["Non-EU"] = list(set(orga_df["country"]) - existing_codes)
+    return groups
+
+
+def test_organizations_by_country_group_parity():
+    """The vectorized year expansion must give the same JSON as the row-by-row expansion."""
+    for fraction in [True, False]:
+        orga_df = random_orgas(500)
+        expected_df = orga_df.copy()
+        expected_df.loc[(expected_df["ecSignatureDate"].dt.date > datetime.date(2020, 2, 1)) & (expected_df["country"] == "UK"), "country"] = "UKnoteu"
+        expected = reference_count_over_time(expected_df, "country", non_eu_groups, create_year_list(2015, 2024), fraction=fraction)
+
+        evaluation = OrganizationsByCountryGroupOverTime(None, orga_df)
+        evaluation.evaluate(2015, 2024, fraction=fraction)
+        assert json.dumps(evaluation.result) == json.dumps(expected)
+        # the UK remap is applied to the frame passed in, as before
+        assert (orga_df["country"] == "UKnoteu").any()
+
+
+def test_organization_type_by_country_group_parity():
+    """The vectorized year expansion must give the same JSON as the row-by-row expansion."""
+    orga_df = random_orgas(500, seed=1)
+    groups = {'Private entities': ['PRC'], 'Public / academic entities': ['HES', 'PUB', 'REC'], 'Unknown': ['nan', 'OTH']}
+    expected = reference_count_over_time(orga_df.copy(), "type", groups, create_year_list(2015, 2024))
+
+    evaluation = OrganizationTypeByCountryGroupOverTime(None, orga_df)
+    evaluation.evaluate(2015, 2024)
+    assert json.dumps(evaluation.result) == json.dumps(expected)
+
+
+def reference_sum_over_time(project_df, dimension, date_column, xyears):
+    """Sums per dimension value and year as computed by the original scan per value."""
+    fund_dat = dict()
+    for agency in np.unique(np.asarray(project_df[dimension])):
+        year_dict = copy.deepcopy(dict.fromkeys(xyears, 0))
+        filtered_df = project_df[project_df[dimension] == agency]
+        query = filtered_df["ecMaxContribution"].groupby(filtered_df[date_column].dt.year).sum()
+        for key, value in dict(query).items():
+            yr = str(int(float(key)))
+            if yr in year_dict.keys():
+                year_dict[yr] = float(value)
+        fund_dat[agency] = year_dict
+    return fund_dat
+
+
+def random_projects(n, seed=2):
+    """Projects with missing contributions and signature dates."""
+    rng = np.random.default_rng(seed)
+    dates = pd.to_datetime("2013-01-01") + pd.to_timedelta(rng.integers(0, 12 * 365, n), unit="D")
+    project_df = pd.DataFrame({
+        "programAbbreviation": rng.choice(["H2020", "HORIZON", "FP7", "DIGITAL", "CEF"], n),
+        "LLMCategory": rng.choice(["quantum computing", "quantum sensing", "quantum communication", "other"], n),
+        "ecMaxContribution": np.where(rng.random(n) < 0.1, np.nan, rng.random(n) * 1e7),
+        "ecSignatureDate": dates.where(rng.random(n) > 0.05),
+        "startDate": dates + pd.to_timedelta(rng.integers(0, 300, n), unit="D"),
+    })
+    project_df.loc[project_df["programAbbreviation"] == "CEF", "ecSignatureDate"] = pd.NaT
+    return project_df
+
+
+def test_total_funding_parity():
+    """The single grouped aggregation must give the same JSON as the scan per programme or category."""
+    project_df = random_projects(2000)
+    for evaluation_class, dimension, date_column in [(TotalFundingByFPOverTime, "programAbbreviation", "ecSignatureDate"),
+                                                     (TotalFundingByLLMCategoryOverTime, "LLMCategory", "startDate")]:
+        expected = reference_sum_over_time(project_df, dimension, date_column, create_year_list(2015, 2024))
+        evaluation = evaluation_class(project_df, None)
+        evaluation.evaluate(2015, 2024)
+        assert json.dumps(evaluation.result) == json.dumps(expected)
+
+
+def test_shared_cube_gives_same_results():
+    """Evaluations sharing one cube must give the same results as evaluations each preparing their own data."""
+    evaluations = [(TotalFundingByFPOverTime, {}), (TotalFundingByLLMCategoryOverTime, {}), (OrganizationsByCountryGroupOverTime, {}),
+                   (OrganizationTypeByCountryGroupOverTime, {}), (TotalFundingbyFP, {}), (OrganizationsByCountryGroupOverTime, {"fraction": False})]
+    project_df, orga_df = random_projects(2000), random_orgas(500)
+    cube = EvaluationCube(project_df, orga_df)
+    for evaluation_class, kwargs in evaluations:
+        shared = evaluation_class(project_df, orga_df, cube=cube)
+        shared.evaluate(2015, 2024, **kwargs)
+        separate = evaluation_class(project_df.copy(), random_orgas(500))
+        separate.evaluate(2015, 2024, **kwargs)
+        assert json.dumps(shared.result) == json.dumps(separate.result)
+    # the organizations are expanded only once
+    assert cube.get_orga_years() is shared.orga_df
+
+
+def test_compact_dtypes_give_same_results():
+    """Evaluations of frames with categoricals and UTC timestamps must give the same results as evaluations of plain frames."""
+    evaluations = [(TotalFundingByFPOverTime, {}), (TotalFundingByLLMCategoryOverTime, {}), (OrganizationsByCountryGroupOverTime, {}),
+                   (OrganizationTypeByCountryGroupOverTime, {}), (TotalFundingbyFP, {}), (OrganizationsByCountryGroupOverTime, {"fraction": False})]
+    project_df, orga_df = random_projects(2000), random_orgas(500)
+    compact_project_df, compact_orga_df = apply_dtypes(project_df, PROJECT_DTYPES), apply_dtypes(orga_df, ORGANIZATION_DTYPES)
+    assert isinstance(compact_orga_df["country"].dtype, pd.CategoricalDtype)
+    cube, compact_cube = EvaluationCube(project_df, orga_df), EvaluationCube(compact_project_df, compact_orga_df)
+    for evaluation_class, kwargs in evaluations:
+        plain = evaluation_class(project_df, orga_df, cube=cube)
+        plain.evaluate(2015, 2024, **kwargs)
+        compact = evaluation_class(compact_project_df, compact_orga_df, cube=compact_cube)
+        compact.evaluate(2015, 2024, **kwargs)
+        assert json.dumps(compact.result) == json.dumps(plain.result)
+
+
+def test_chart_renderer_matches_direct_plots(tmp_path):
+    """Charts rendered in worker processes must be identical to charts rendered in the calling process, JSON files must hold the results."""
+    project_df, orga_df = random_projects(500), random_orgas(200)
+    cube = EvaluationCube(project_df, orga_df)
+    renderer = ChartRenderer(max_workers=2)
+    for evaluation_class in [TotalFundingByFPOverTime, OrganizationTypeByCountryGroupOverTime, TotalFundingbyFP]:
+        evaluation = evaluation_class(project_df, orga_df, cube=cube)
+        evaluation.evaluate(2015, 2024)
+        renderer.render(evaluation, str(tmp_path / f"{evaluation_class.__name__}.png"))
+        renderer.write_json(evaluation.result, str(tmp_path / f"{evaluation_class.__name__}.json"))
+        render_chart(evaluation_class, evaluation.result, getattr(evaluation, "xyears", None), str(tmp_path / f"{evaluation_class.__name__}_direct.png"))
+        expected_json = json.dumps(evaluation.result)
+    renderer.close()
+
+    for evaluation_class in [TotalFundingByFPOverTime, OrganizationTypeByCountryGroupOverTime, TotalFundingbyFP]:
+        assert (tmp_path / f"{evaluation_class.__name__}.png").read_bytes() == (tmp_path / f"{evaluation_class.__name__}_direct.png").read_bytes()
+    assert (tmp_path / "TotalFundingbyFP.json").read_text() == expected_json
+
+
+def test_chart_renderer_workers_in_guarded_script(tmp_path):
+    """By default charts are rendered by workers, which import the main script again: with a __main__ guard its code runs once."""
+    script = tmp_path / "main_script.py"
+    script.write_text(textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r})
+        from data_evaluation import ChartRenderer, TotalFundingByFPOverTime
+
+        with open({str(tmp_path / "imports.txt")!r}, "a") as f:
+            f.write("import\\n")
+
+
+        def main():
+            with open({str(tmp_path / "imports.txt")!r}, "a") as f:
+                f.write("main\\n")
+            evaluation = TotalFundingByFPOverTime(None, None)
+            evaluation.xyears = ["2020", "2021"]
+            evaluation.result = {{"H2020": {{"2020": 1e9, "2021": 2e9}}}}
+            renderer = ChartRenderer()
+            assert renderer.max_workers > 0
+            renderer.render(evaluation, {str(tmp_path / "chart.png")!r})
+            renderer.close()
+
+
+        if __name__ == "__main__":
+            main()
+    """))
+    subprocess.run([sys.executable, str(script)], cwd=tmp_path, timeout=120, check=True)
+    assert (tmp_path / "chart.png").stat().st_size > 0
+    lines = (tmp_path / "imports.txt").read_text().split()
+    assert lines.count("main") == 1 and lines.count("import") >= 2
+
+
+def test_importing_scheduler_does_not_run_it(tmp_path):
+    """The scheduler only sets up and runs the workflows when run as a script, not when imported by a render worker."""
+    code = f"import sys; sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r}); import scheduler"
+    subprocess.run([sys.executable, "-c", code], cwd=tmp_path, timeout=120, check=True)
+    assert not (tmp_path / "scheduler.log").exists()
+
+
+def test_unchanged_deliverables_are_skipped(tmp_path):
+    """Only files whose result changed since the last run are written again, the manifest lists them."""
+    project_df = random_projects(500)
+
+    def run(project_df):
+        manifest = DeliverableManifest(str(tmp_path / "manifest.json"))
+        renderer = ChartRenderer(max_workers=0, manifest=manifest)
+        for evaluation_class in [TotalFundingByFPOverTime, TotalFundingByLLMCategoryOverTime]:
+            evaluation = evaluation_class(project_df, None)
+            evaluation.evaluate(2015, 2024)
+            renderer.render(evaluation, str(tmp_path / f"{evaluation_class.__name__}.png"))
+            renderer.write_json(evaluation.result, str(tmp_path / f"{evaluation_class.__name__}.json"))
+        renderer.close()
+        manifest.save()
+        return json.loads((tmp_path / "manifest.json").read_text())
+
+    assert len(run(project_df)["changed"]) == 4
+    assert run(project_df.copy())["changed"] == []
+    (tmp_path / "TotalFundingByFPOverTime.json").unlink()
+    project_df.loc[project_df["LLMCategory"] == "other", "ecMaxContribution"] += 1
+    assert sorted(run(project_df)["changed"]) == sorted(str(tmp_path / name) for name in
+        ["TotalFundingByFPOverTime.json", "TotalFundingByFPOverTime.png", "TotalFundingByLLMCategoryOverTime.json", "TotalFundingByLLMCategoryOverTime.png"])
+    assert run(project_df)["changed"] == []
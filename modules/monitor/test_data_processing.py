@@ -0,0 +1,273 @@
+import glob
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from data_utils import PROJECT_DTYPES, RateLimiter, apply_dtypes
+from data_processing import (DirectoryBatchRunner, InvertedIndex, KeywordMatchScorer, LLMCategorizer, LLMResponseCache,
+                             MultiTopicMatchScorer, find_all)
+
+
+def reference_match_score(sentence, keyword_list):
+    """Match score and words as computed by the original keyword-by-keyword scan."""
+    match_score = 0
+    match_words = []
+    for word in keyword_list:
+        if word in sentence:
+            for pos in find_all(sentence, word):
+                match_score += (1-(pos/float(len(sentence))))
+            match_words.append(word)
+    return match_score, match_words
+
+
+def test_keyword_matcher_parity():
+    """KeywordMatchScorer must reproduce the scores of the brute-force scan exactly."""
+    keyword_list = ["quantum", "quantum mechanic", " qt ", "qt flagship", "qubit", "quantum comput", "comput",
+                    " ai ", "ai,", "artificial intelligence", "aa", "aaa", "a a", "robot", "qubit", "ion"]
+    fragments = keyword_list + ["a", " ", ",", "the ", "Quantum ", "computing", "ai", "intelligence", "x"]
+    rng = random.Random(42)
+    titles = ["".join(rng.choice(fragments) for _ in range(rng.randint(0, 10))) for _ in range(300)]
+    objectives = ["".join(rng.choice(fragments) for _ in range(rng.randint(0, 80))) for _ in range(300)]
+    titles[0], objectives[0] = "aaaaaaa", "aaaa aaa"
+    titles[1], objectives[1] = None, float("nan")
+
+    project_df = pd.DataFrame({"id": range(len(titles)), "title": titles, "objective": objectives})
+    match_scorer = KeywordMatchScorer(project_df, None, keyword_list)
+    match_scorer.compute_add_match_score()
+
+    for title, objective, match_score, match_words in zip(titles, objectives, project_df["matchScore"], project_df["matchWords"]):
+        sentence = (str(title) + " " + str(objective)).lower()
+        expected_score, expected_words = reference_match_score(sentence, keyword_list)
+        assert match_words == expected_words
+        assert match_score == expected_score
+
+
+def test_multi_topic_scores_match_single_topic_scores(tmp_path):
+    """The score table must hold the same scores as scoring each topic separately."""
+    keyword_lists = {"quantum": ["quantum", "qubit", " qt ", "quantum comput"],
+                     "ai": [" ai ", "ai,", "artificial intelligence", "comput"],
+                     "empty": []}
+    fragments = [word for keyword_list in keyword_lists.values() for word in keyword_list] + ["a", " ", "the ", "x"]
+    rng = random.Random(7)
+    project_df = pd.DataFrame({"id": [f"p{i}" for i in range(200)],
+                               "title": ["".join(rng.choice(fragments) for _ in range(5)) for _ in range(200)],
+                               "objective": ["".join(rng.choice(fragments) for _ in range(40)) for _ in range(200)]})
+
+    multi_scorer = MultiTopicMatchScorer(project_df, keyword_lists)
+    multi_scorer.compute_match_scores()
+    filename = str(tmp_path / "match_scores.parquet")
+    multi_scorer.save(filename, snapshot="v1")
+
+    for topic, keyword_list in keyword_lists.items():
+        single_scorer = KeywordMatchScorer(project_df.copy(), None, keyword_list)
+        single_scorer.compute_add_match_score()
+        score_df = MultiTopicMatchScorer.load_topic_scores(filename, topic, keyword_list, snapshot="v1")
+        assert list(score_df["id"]) == list(project_df["id"])
+        assert list(score_df["matchScore"]) == list(single_scorer.project_df["matchScore"])
+        assert list(score_df["matchWords"]) == list(single_scorer.project_df["matchWords"])
+
+    assert MultiTopicMatchScorer.load_topic_scores(filename, "quantum", ["quantum"], snapshot="v1") is None
+    assert MultiTopicMatchScorer.load_topic_scores(filename, "quantum", keyword_lists["quantum"], snapshot="v2") is None
+    assert MultiTopicMatchScorer.load_topic_scores(str(tmp_path / "missing.parquet"), "quantum", keyword_lists["quantum"]) is None
+
+
+def test_inverted_index_parity(tmp_path):
+    """Scores computed from the inverted index must equal those of the full scan."""
+    keyword_list = ["quantum", "quantum mechanic", " qt ", "qt flagship", "qubit", "quantum comput", "comput",
+                    " ai ", "ai,", "artificial intelligence", "aa", "aaa", "a a", "robot", "qubit", ", ", "ion", "x-ray"]
+    fragments = keyword_list + ["a", " ", ",", "-", "the ", "Quantum ", "computing", "ai", "intelligence", "x", "é", "İ"]
+    rng = random.Random(3)
+    project_df = pd.DataFrame({"id": [f"p{i}" for i in range(300)],
+                               "title": ["".join(rng.choice(fragments) for _ in range(rng.randint(0, 10))) for _ in range(300)],
+                               "objective": ["".join(rng.choice(fragments) for _ in range(rng.randint(0, 80))) for _ in range(300)]})
+    project_df.loc[0, "title"], project_df.loc[1, "objective"] = None, float("nan")
+
+    index = InvertedIndex(str(tmp_path / "index.db"))
+    index.build(project_df, snapshot="v1")
+    assert InvertedIndex(str(tmp_path / "index.db")).snapshot == "v1"
+
+    scan_scorer = KeywordMatchScorer(project_df.copy(), None, keyword_list)
+    scan_scorer.compute_add_match_score()
+    index_scorer = KeywordMatchScorer(project_df[["id"]].copy(), None, keyword_list, index=index)
+    index_scorer.compute_add_match_score()
+    assert list(index_scorer.project_df["matchWords"]) == list(scan_scorer.project_df["matchWords"])
+    assert list(index_scorer.project_df["matchScore"]) == list(scan_scorer.project_df["matchScore"])
+
+
+class StubChatCompletionHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible chat completion endpoint that answers with the quoted project description(s)."""
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.requests += 1
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(random.uniform(0.01, 0.05))
+        prompt = request["messages"][0]["content"]
+        packed = re.findall(r'^(\d+): "(.*)"$', prompt, flags=re.MULTILINE)
+        if packed:
+            # leave out the descriptions containing "skip" to provoke the fallback to single requests
+            answer = "\n".join(f"{number}: {desc.upper()}" for number, desc in packed if "skip" not in desc)
+        else:
+            answer = prompt.rsplit('"', 2)[1].upper()
+        body = json.dumps({"id": "stub", "object": "chat.completion", "created": 0, "model": request["model"],
+                           "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": answer}}]}).encode()
+        with server.lock:
+            server.in_flight -= 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(monkeypatch):
+    """Start the stub chat completion server and point the LLM settings of the environment to it."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubChatCompletionHandler)
+    server.lock, server.in_flight, server.max_in_flight, server.requests = threading.Lock(), 0, 0, 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("lite_llm_url", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setenv("lite_llm_api_key", "test")
+    monkeypatch.setenv("lite_llm_model", "stub")
+    return server
+
+
+def stub_projects(n):
+    """Projects with distinct descriptions for the stub server."""
+    return pd.DataFrame({"id": range(n), "acronym": [f"P{i}" for i in range(n)],
+                         "objective": [f"project {i}" for i in range(n)], "matchWords": [["project"]] * n})
+
+
+def test_llm_categorizer_concurrent(monkeypatch):
+    """Concurrent categorization against a stub server must keep the project order and the concurrency limit."""
+    server = start_stub_server(monkeypatch)
+    project_df = stub_projects(40)
+    llm_categorizer = LLMCategorizer(project_df, None, "Classify:", max_concurrency=4, requests_per_minute=6000)
+    llm_categorizer.categorize(model_location="remote")
+    server.shutdown()
+
+    assert list(llm_categorizer.project_df["LLMCategory"]) == [f"PROJECT {i}" for i in range(40)]
+    assert server.requests == 40
+    assert 1 < server.max_in_flight <= 4
+
+
+def test_llm_response_cache(monkeypatch, tmp_path):
+    """Only projects without cached response for the current prompt must be sent to the LLM."""
+    server = start_stub_server(monkeypatch)
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.db"))
+
+    LLMCategorizer(stub_projects(10), None, "Classify:", cache=cache).categorize(model_location="remote")
+    assert server.requests == 10
+    project_df = stub_projects(12)
+    project_df.loc[3, "objective"] = "edited project 3"
+    llm_categorizer = LLMCategorizer(project_df, None, "Classify:", cache=cache)
+    llm_categorizer.categorize(model_location="remote")
+    assert server.requests == 13
+    assert list(llm_categorizer.project_df["LLMCategory"]) == [f"PROJECT {i}" if i != 3 else "EDITED PROJECT 3" for i in range(12)]
+    assert cache.stats()["hits"] == 9
+
+    LLMCategorizer(stub_projects(2), None, "Classify again:", cache=cache).categorize(model_location="remote")
+    server.shutdown()
+    assert server.requests == 15
+    assert cache.stats()["size"] == 2
+
+
+def test_llm_categorizer_packed(monkeypatch):
+    """Packed requests must give the same responses, unparsed items must be requested separately."""
+    server = start_stub_server(monkeypatch)
+    project_df = stub_projects(10)
+    project_df.loc[5, "objective"] = "skip project 5"
+    llm_categorizer = LLMCategorizer(project_df, None, "Classify:", pack_size=4)
+    llm_categorizer.categorize(model_location="remote")
+    server.shutdown()
+
+    assert list(llm_categorizer.project_df["LLMCategory"]) == [f"PROJECT {i}" if i != 5 else "SKIP PROJECT 5" for i in range(10)]
+    assert server.requests == 4
+
+
+def process_batch_files(directory, fail_custom_ids=()):
+    """Local stand-in for a batch gateway: answer every handed-off batch file like the stub server."""
+    for input_filename in glob.glob(os.path.join(directory, "*.jsonl")):
+        if input_filename.endswith(".output.jsonl"):
+            continue
+        with open(input_filename) as f, open(input_filename.replace(".jsonl", ".output.jsonl"), "w") as out:
+            for line in f:
+                request = json.loads(line)
+                if request["custom_id"] in fail_custom_ids:
+                    result = {"custom_id": request["custom_id"], "response": None, "error": {"message": "failed"}}
+                else:
+                    answer = request["body"]["messages"][0]["content"].rsplit('"', 2)[1].upper()
+                    result = {"custom_id": request["custom_id"], "error": None,
+                              "response": {"status_code": 200, "body": {"choices": [{"message": {"role": "assistant", "content": answer}}]}}}
+                out.write(json.dumps(result) + "\n")
+
+
+def test_llm_categorizer_batch(monkeypatch, tmp_path):
+    """A batch job must survive between workflow runs and its results must be ingested in project order."""
+    server = start_stub_server(monkeypatch)
+    runner = DirectoryBatchRunner(str(tmp_path / "batches"))
+    state_filename = str(tmp_path / "llm_batch_state.json")
+    cache_filename = str(tmp_path / "llm_cache.db")
+
+    llm_categorizer = LLMCategorizer(stub_projects(6), None, "Classify:", cache=LLMResponseCache(cache_filename))
+    assert not llm_categorizer.categorize_batch(runner, state_filename)
+    assert not llm_categorizer.categorize_batch(runner, state_filename)
+    assert os.path.exists(state_filename) and server.requests == 0
+
+    failed_key = LLMResponseCache.get_key("stub", "Classify:", "project 2")
+    process_batch_files(str(tmp_path / "batches"), fail_custom_ids=[failed_key])
+
+    llm_categorizer = LLMCategorizer(stub_projects(6), None, "Classify:", cache=LLMResponseCache(cache_filename))
+    assert llm_categorizer.categorize_batch(runner, state_filename)
+    server.shutdown()
+    assert list(llm_categorizer.project_df["LLMCategory"]) == [f"PROJECT {i}" for i in range(6)]
+    assert server.requests == 1
+    assert not os.path.exists(state_filename)
+
+
+def test_rate_limiter_charges_amounts_above_capacity():
+    """Acquires larger than the capacity (long prompts against a token budget) are charged in full."""
+    limiter = RateLimiter(100, capacity=10)
+    start = time.monotonic()
+    for _ in range(4):
+        limiter.acquire(50)
+    elapsed = time.monotonic() - start
+    # 200 tokens with 10 saved up at a rate of 100 per second
+    assert 1.8 <= elapsed < 2.5
+
+    threads = [threading.Thread(target=limiter.acquire, args=(25,)) for _ in range(4)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 0.9 <= time.monotonic() - start < 1.5
+
+
+def test_score_filter_at_threshold_with_dtypes(tmp_path, monkeypatch):
+    """Scores at or within float32 rounding of the thresholds must be filtered the same with and without the frame dtypes."""
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("data")
+    project_df = pd.DataFrame({"id": ["p0", "p1", "p2", "p3", "p4"], "matchScore": [0.1, 0.3, 0.1000000001, 0.3, 0.3],
+                               "semanticScore": [0.9, 0.1, 0.3, 0.0999999999, 0.5]})
+    orga_df = pd.DataFrame({"projectID": ["p0", "p1", "p2", "p3", "p4"]})
+    for df in [project_df, apply_dtypes(project_df, PROJECT_DTYPES)]:
+        topic_project_df, topic_orga_df = KeywordMatchScorer(df, orga_df, []).get_filtered_data(0.1, semantic_threshold=0.1)
+        assert sorted(topic_project_df["id"]) == ["p1", "p2", "p4"]
+        assert sorted(topic_orga_df["projectID"]) == ["p1", "p2", "p4"]
+
+
+if __name__ == "__main__":
+    test_keyword_matcher_parity()
+    print("Keyword matcher parity: ✅")
@@ -0,0 +1,131 @@
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_publishing import ORGANIZATION_SCHEMA, SnapshotPublisher, SQLitePublisher
+
+
+def random_organizations(n, seed=0):
+    """Organizations with several rows per project, missing values and timestamps."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "projectID": rng.integers(0, n // 3, n).astype(str),
+        "country": rng.choice(["DE", "FR", "PL", None], n),
+        "ecMaxContribution": np.where(rng.random(n) < 0.1, np.nan, rng.random(n) * 1e6),
+        "ecSignatureDate": pd.to_datetime("2015-01-01", utc=True) + pd.to_timedelta(rng.integers(0, 3000, n), unit="D"),
+    })
+
+
+def read_table(filename, table):
+    return sorted(sqlite3.connect(filename).execute(f'SELECT projectID, country, ecMaxContribution, ecSignatureDate FROM "{table}"').fetchall(), key=str)
+
+
+def test_incremental_publish_matches_full_write(tmp_path):
+    """Publishing changes into an existing table must give the same rows as writing the table with to_sql."""
+    orga_df = random_organizations(900)
+    publisher = SQLitePublisher(str(tmp_path / "published.db"))
+    assert publisher.publish("organizations", orga_df, ORGANIZATION_SCHEMA)["inserted"] == 900
+
+    # change a row, drop a project, add a row to a project and add a new project
+    changed_df = orga_df[orga_df["projectID"] != "5"].copy()
+    changed_df.loc[changed_df.index[0], "country"] = "IT"
+    changed_df = pd.concat([changed_df, random_organizations(6, seed=1).assign(projectID=["7", "7", "new", "new", "new", "new"])])
+    changed_keys = {"5", "7", "new", changed_df["projectID"].iloc[0]}
+    stats = publisher.publish("organizations", changed_df.sample(frac=1, random_state=0), ORGANIZATION_SCHEMA)
+    assert stats["inserted"] == changed_df["projectID"].isin(changed_keys).sum()
+    assert stats["deleted"] == orga_df["projectID"].isin(changed_keys).sum()
+    assert publisher.publish("organizations", changed_df, ORGANIZATION_SCHEMA)["inserted"] == 0
+    publisher.close()
+
+    changed_df.to_sql("organizations", sqlite3.connect(str(tmp_path / "reference.db")), index=False)
+    assert read_table(str(tmp_path / "published.db"), "organizations") == read_table(str(tmp_path / "reference.db"), "organizations")
+
+
+def test_typed_schema_and_summaries(tmp_path):
+    """Tables get the declared column types and keys, text values stay text and summary tables hold the aggregates."""
+    orga_df = random_organizations(300).astype(str)
+    project_df = pd.DataFrame({"id": [str(i) for i in range(100)] + ["0"], "programAbbreviation": ["H2020", "HORIZON"] * 50 + ["FP7"],
+                               "ecMaxContribution": ["1000.5"] * 100 + ["nan"], "keywords": [["a", "b"]] * 101,
+                               "ecSignatureDate": ["2020-03-01"] * 60 + ["2021-05-01"] * 41})
+    publisher = SQLitePublisher(str(tmp_path / "typed.db"))
+    publisher.publish_projects_and_organizations(project_df, orga_df)
+    publisher.close()
+
+    conn = sqlite3.connect(str(tmp_path / "typed.db"))
+    types = {row[1]: (row[2], row[5]) for row in conn.execute("PRAGMA table_info(projects)")}
+    assert types["id"] == ("TEXT", 1) and types["ecMaxContribution"] == ("REAL", 0) and types["ecSignatureDate"] == ("TIMESTAMP", 0)
+    assert conn.execute("SELECT count(*), typeof(ecMaxContribution), keywords FROM projects").fetchone() == (100, "real", "['a', 'b']")
+    assert conn.execute("SELECT count(*) FROM organizations WHERE typeof(ecMaxContribution) = 'text'").fetchone() == (0,)
+    assert [row[2:5] for row in conn.execute("PRAGMA foreign_key_list(organizations)")] == [("projects", "projectID", "id")]
+    assert "organizations_country_ecSignatureDate_ecMaxContribution" in [row[1] for row in conn.execute("PRAGMA index_list(organizations)")]
+
+    summary = conn.execute("SELECT year, programAbbreviation, projects, ecMaxContribution FROM summary_projects_by_year_programme ORDER BY 1, 2").fetchall()
+    assert summary == [(2020, "H2020", 30, 30015.0), (2020, "HORIZON", 30, 30015.0), (2021, "FP7", 1, 0.0), (2021, "H2020", 20, 20010.0), (2021, "HORIZON", 20, 20010.0)]
+    organizations = conn.execute("SELECT sum(organizations), typeof(year) FROM summary_organizations_by_year_country").fetchone()
+    assert organizations == (300, "integer")
+
+
+def test_snapshot_publisher_copies_changed_databases(tmp_path):
+    """Databases are only copied when they changed, readers of the published copy keep a consistent version."""
+    (tmp_path / "volume").mkdir()
+    source = str(tmp_path / "topic.db")
+    publisher = SQLitePublisher(source)
+    publisher.publish("organizations", random_organizations(90), ORGANIZATION_SCHEMA)
+    publisher.close()
+    snapshot_publisher = SnapshotPublisher(str(tmp_path / "volume"))
+    assert snapshot_publisher.publish(source) == 1
+    assert snapshot_publisher.publish(source) is None
+
+    reader = sqlite3.connect(str(tmp_path / "volume" / "topic.db"))
+    assert reader.execute("PRAGMA journal_mode").fetchone() == ("delete",)
+    reader.execute("BEGIN")
+    assert reader.execute("SELECT count(*) FROM organizations").fetchone() == (90,)
+
+    publisher = SQLitePublisher(source)
+    publisher.publish("organizations", random_organizations(30), ORGANIZATION_SCHEMA)
+    assert snapshot_publisher.publish(source) == 2
+    publisher.close()
+    assert reader.execute("SELECT count(*) FROM organizations").fetchone() == (90,)
+    reader.close()
+    assert sqlite3.connect(str(tmp_path / "volume" / "topic.db")).execute("SELECT count(*) FROM organizations").fetchone() == (30,)
+    assert snapshot_publisher.get_versions()["topic.db"]["version"] == 2
+    assert sorted(path.name for path in (tmp_path / "volume").iterdir()) == ["topic.db", "versions.json"]
+
+
+def test_snapshot_publisher_skips_new_metadata(tmp_path):
+    """A run that only writes new metadata (the run time) does not copy the database again."""
+    (tmp_path / "volume").mkdir()
+    source = str(tmp_path / "topic.db")
+    published_filename = tmp_path / "volume" / "topic.db"
+    publisher = SQLitePublisher(source)
+    publisher.publish("organizations", random_organizations(90), ORGANIZATION_SCHEMA)
+    publisher.publish("metadata", pd.DataFrame([{"DataAnalysisEndDate": "2024-01-01 12:00:00"}]))
+    publisher.close()
+    snapshot_publisher = SnapshotPublisher(str(tmp_path / "volume"))
+    assert snapshot_publisher.publish(source) == 1
+    published = os.stat(published_filename)
+
+    publisher = SQLitePublisher(source)
+    publisher.publish("metadata", pd.DataFrame([{"DataAnalysisEndDate": "2024-01-08 12:00:00"}]))
+    publisher.close()
+    assert snapshot_publisher.publish(source) is None
+    assert os.stat(published_filename).st_ino == published.st_ino and os.stat(published_filename).st_mtime_ns == published.st_mtime_ns
+    assert snapshot_publisher.get_versions()["topic.db"]["version"] == 1
+
+    publisher = SQLitePublisher(source)
+    publisher.publish("organizations", random_organizations(30), ORGANIZATION_SCHEMA)
+    publisher.close()
+    assert snapshot_publisher.publish(source) == 2
+
+
+def test_snapshot_publisher_rejects_missing_database(tmp_path):
+    """A missing source database is neither created nor published."""
+    (tmp_path / "volume").mkdir()
+    snapshot_publisher = SnapshotPublisher(str(tmp_path / "volume"))
+    with pytest.raises(FileNotFoundError):
+        snapshot_publisher.publish(str(tmp_path / "typo.db"))
+    assert not (tmp_path / "typo.db").exists()
+    assert list((tmp_path / "volume").iterdir()) == []
@@ -0,0 +1,497 @@
+import copy
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+
+from data_sourcing import (DELTA_CODE, ColumnarRowBuffer, CorpusCache, CrawlJournal, FundingAndTenderPortal, read_snapshot, snapshot_version,
+                           write_snapshot)
+
+
+def random_snapshot(n, seed=0):
+    """Projects and organizations as stored by the sourcing step, with low- and high-cardinality text columns."""
+    rng = np.random.default_rng(seed)
+    project_df = pd.DataFrame({
+        "id": [f"{100000 + i}" for i in range(n)],
+        "programAbbreviation": rng.choice(["H2020", "HORIZON", "FP7"], n),
+        "title": [f"project {i}" for i in range(n)],
+        "keywords": [["a", "b"] if i % 3 else None for i in range(n)],
+        "ecMaxContribution": rng.random(n) * 1e6,
+        "ecSignatureDate": pd.to_datetime("2015-01-01", utc=True) + pd.to_timedelta(rng.integers(0, 3000, n), unit="D"),
+    })
+    orga_df = pd.DataFrame({
+        "projectID": rng.choice(project_df["id"], 3 * n),
+        "programAbbreviation": rng.choice(["H2020", "HORIZON", "FP7"], 3 * n),
+        "country": rng.choice(["DE", "FR", None], 3 * n),
+        "name": [f"organization {i}" for i in range(3 * n)],
+    })
+    return project_df, orga_df
+
+
+# project columns of the search results that the sourcing step drops before publishing
+DROPPED_PROJECT_COLUMNS = ["subTypeOfAction", "language", "deliverables", "esST_FileName", "DATASOURCE", "REFERENCE", "subProgramme",
+                           "es_ContentType", "esST_URL", "publications", "typeOfMGAs", "pics", "typeOfActions", "countries", "projectObjective",
+                           "publicationsAvailable", "legalEntityNames", "programmeDivision", "cenTagsA", "cenTagsB", "destinationGroup",
+                           "mission", "destination", "missionGroup"]
+
+
+def fake_record(project_id, version=0, number_of_organizations=2):
+    """Metadata of a search result as returned by the portal (values wrapped in lists, participants as JSON)."""
+    organizations = [{"name": f"organization {project_id}-{i}", "type": ["PRC", "HES", "REC"][i % 3], "role": "participant" if i else "coordinator",
+                      "postalAddress": {"countryCode": {"abbreviation": ["DE", "FR", "PL"][(int(project_id) + i) % 3]}},
+                      "latitude": "50.1", "longitude": "8.6", "eucontribution": f"{1000 * (i + 1)}", "organizationType": "", "website": ""}
+                     for i in range(number_of_organizations)]
+    metadata = {column: [""] for column in DROPPED_PROJECT_COLUMNS}
+    metadata.update({"projectId": [project_id], "acronym": [f"P{project_id}v{version}"], "esST_checksum": [f"{project_id}-{version}"],
+                     "title": [f"project {project_id}"], "objective": [f"objective {project_id} version {version}"],
+                     "euContributionAmount": [f"{int(project_id) % 997 * 1000.5}"], "frameworkProgramme": ["HORIZON" if int(project_id) % 2 else "H2020"],
+                     "startDate": ["2021-01-01"], "endDate": ["2023-12-31"], "ecSignatureDate": ["2020-12-01"],
+                     "participants": [json.dumps(organizations)]})
+    return metadata
+
+
+class FakePortalApi:
+    """Search API of the portal serving fixed records per id suffix, with injectable failures.
+
+    The text ``***`` matches all records (each once), which can be filtered with range conditions
+    on their dates like the delta query of incremental crawls.
+
+    Args:
+        records: Dict mapping suffix codes to lists of record metadata (see ``fake_record``)
+        rate_limiter: Optional ``RateLimiter`` charged for every request, like ``_fetch_page`` does
+    """
+
+    def __init__(self, records, rate_limiter=None):
+        self.records = records
+        self.rate_limiter = rate_limiter
+        self.failing_pages = set()
+        self.crash_after = None
+        self.requests = []
+        self.queries = []
+
+    def fetch_page(self, text, page_number, page_size, retry_delay, query=None):
+        """Replacement of ``FundingAndTenderPortal._fetch_page``."""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        code = int(text[3:]) if text != "***" else DELTA_CODE
+        self.requests.append((code, page_number))
+        self.queries.append(query)
+        if self.crash_after is not None and len(self.requests) > self.crash_after:
+            raise RuntimeError("crawler process killed")
+        if (code, page_number) in self.failing_pages:
+            return None
+        if code == DELTA_CODE:
+            results = [metadata for suffix in sorted(self.records) for metadata in self.records[suffix]
+                       if metadata["projectId"][0].endswith(f"{suffix:04}")]
+            for condition in (query or {}).get("bool", {}).get("must", []):
+                for field, bounds in condition["range"].items():
+                    results = [metadata for metadata in results if metadata[field][0] >= bounds["gte"]]
+        else:
+            results = self.records.get(code, [])
+        page = results[(page_number - 1) * page_size:page_number * page_size]
+        return {"totalResults": len(results), "results": [{"metadata": metadata} for metadata in page]}
+
+
+def fake_records():
+    """Records of a few suffixes, suffix 2 has two result pages and suffix 3 also lists a record of suffix 7."""
+    records = {2: [fake_record(f"{i}0002") for i in range(1, 151)], 3: [fake_record("10003"), fake_record("10007")],
+               7: [fake_record("10007"), fake_record("20007", number_of_organizations=0)], 42: [fake_record("10042")]}
+    return records
+
+
+def fake_portal(tmp_path, api):
+    """Portal with all files in ``tmp_path`` that sends its requests to ``api``."""
+    portal = FundingAndTenderPortal(str(tmp_path / "projects"), str(tmp_path / "organizations"), requests_per_second=None,
+                                    crawl_state_filename=str(tmp_path / "crawl_state.json"),
+                                    crawl_journal_filename=str(tmp_path / "crawl_journal.db"), raw_db_filename=str(tmp_path / "raw.db"))
+    portal._fetch_page = api.fetch_page
+    return portal
+
+
+class SlowPortalApi(FakePortalApi):
+    """Fake API whose requests take a while, recording how many of them run at the same time."""
+
+    def __init__(self, records, rate_limiter=None):
+        super().__init__(records, rate_limiter)
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def fetch_page(self, text, page_number, page_size, retry_delay, query=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.02)
+        with self.lock:
+            self.running -= 1
+        return super().fetch_page(text, page_number, page_size, retry_delay, query)
+
+
+def test_concurrent_crawl_respects_request_budget(tmp_path):
+    """All pages are downloaded by concurrent requests, at most ``max_in_flight`` at a time and ``requests_per_second`` per second."""
+    portal = FundingAndTenderPortal(str(tmp_path / "projects"), str(tmp_path / "organizations"), max_in_flight=4, requests_per_second=40)
+    api = SlowPortalApi(fake_records(), rate_limiter=portal.rate_limiter)
+    portal._fetch_page = api.fetch_page
+    journal = CrawlJournal(str(tmp_path / "crawl_journal.db"))
+    start = time.monotonic()
+    portal._crawl(range(1, 61), journal)
+    # 60 overviews and the second page of suffix 2, 40 requests may start at once
+    assert len(api.requests) == 61 and sorted(set(api.requests)) == sorted(api.requests)
+    assert time.monotonic() - start >= (61 - 40) / 40
+    assert 1 < api.max_running <= 4
+    assert journal.get_codes(("done",)) == list(range(1, 61))
+    projects = [project["projectId"] for projects, _ in journal.iter_rows(("done",)) for project in projects]
+    assert len(projects) == 150 + 1 + 2 + 1 and "10007" in projects
+
+
+class FlakySession:
+    """Session whose first ``failures`` requests fail with a connection error."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def post(self, url, json, timeout):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise requests.exceptions.ConnectionError("connection reset")
+        response = requests.models.Response()
+        response._content = b'{"totalResults": 0, "results": []}'
+        return response
+
+
+def test_fetch_page_retries_failed_requests():
+    """Failed requests are retried up to ``max_attempts`` times, then the page is given up."""
+    portal = FundingAndTenderPortal("projects", "organizations", requests_per_second=None)
+    for failures, expected, calls in [(2, {"totalResults": 0, "results": []}, 3), (10, None, 5)]:
+        session = FlakySession(failures)
+        portal._get_session = lambda: session
+        assert portal._fetch_page("***0042", 1, 100, retry_delay=0) == expected
+        assert session.calls == calls
+
+
+def recently_signed(record):
+    """Copy of a record signed today, so that it is part of the delta query of incremental crawls."""
+    return dict(record, ecSignatureDate=[datetime.now().strftime("%Y-%m-%d")])
+
+
+def test_incremental_crawl_fetches_recently_signed_projects(tmp_path):
+    """An incremental crawl downloads only the recently signed projects with one query, the next full crawl gets all other changes."""
+    api = FakePortalApi(fake_records())
+    portal = fake_portal(tmp_path, api)
+    portal.update_source(incremental=False)
+    assert portal.load_projects(columns=["acronym"])["acronym"].str.endswith("v0").all()
+
+    api.records[2][120] = recently_signed(fake_record("1210002", version=1))
+    api.records[1234] = [recently_signed(fake_record("51234"))]
+    # changes of projects signed long ago and removals wait for the next full crawl
+    api.records[42][0] = fake_record("10042", version=1)
+    api.records[7].pop()
+    api.requests, api.queries = [], []
+    portal.update_source(incremental=True)
+    assert api.requests == [(DELTA_CODE, 1)]
+    since = (datetime.now() - timedelta(days=portal.delta_lookback_days)).strftime("%Y-%m-%d")
+    assert api.queries == [{"bool": {"must": [{"range": {"ecSignatureDate": {"gte": since}}}]}}]
+    project_df = portal.load_projects(columns=["id", "acronym"]).set_index("id")
+    assert project_df.loc["1210002", "acronym"] == "P1210002v1" and project_df.loc["51234", "acronym"] == "P51234v0"
+    assert project_df.loc["10042", "acronym"] == "P10042v0" and "20007" in project_df.index
+    assert len(project_df) == 155 and project_df.index.is_unique
+    assert CrawlJournal(str(tmp_path / "crawl_journal.db")).get_codes(("done",)) == [DELTA_CODE]
+
+    with open(tmp_path / "crawl_state.json") as f:
+        state = json.load(f)
+    state["last_full_crawl"] = (datetime.now() - timedelta(days=portal.full_crawl_interval_days + 1)).isoformat()
+    with open(tmp_path / "crawl_state.json", "w") as f:
+        json.dump(state, f)
+    api.requests = []
+    portal.update_source(incremental=True)
+    assert len(api.requests) == 9999 + 1
+    project_df = portal.load_projects(columns=["id", "acronym"]).set_index("id")
+    assert project_df.loc["10042", "acronym"] == "P10042v1" and "20007" not in project_df.index
+
+
+def test_incremental_crawl_matches_full_crawl(tmp_path):
+    """After edits and additions of recently signed projects, an incremental crawl must give the same snapshot as a full crawl."""
+    api = FakePortalApi(fake_records())
+    (tmp_path / "incremental").mkdir()
+    portal = fake_portal(tmp_path / "incremental", api)
+    portal.update_source(incremental=False)
+
+    api.records[2][130] = recently_signed(fake_record("1310002", version=2, number_of_organizations=3))
+    api.records[2][5] = recently_signed(fake_record("60002", version=1, number_of_organizations=0))
+    api.records[7][1] = recently_signed(fake_record("20007", version=1))
+    api.records[3].append(recently_signed(fake_record("30003")))
+    api.records[1234] = [recently_signed(fake_record("51234"))]
+    number_of_requests = len(api.requests)
+    portal.update_source(incremental=True)
+    assert len(api.requests) - number_of_requests == 1
+
+    (tmp_path / "full").mkdir()
+    full_portal = fake_portal(tmp_path / "full", api)
+    full_portal.update_source(incremental=False)
+    for incremental_df, full_df, key in zip(portal.load_saved_data(), full_portal.load_saved_data(), ["id", "projectID"]):
+        sort_columns = [key, "name"] if "name" in full_df.columns else [key]
+        incremental_df = incremental_df.sort_values(sort_columns, ignore_index=True)
+        full_df = full_df.sort_values(sort_columns, ignore_index=True)
+        pd.testing.assert_frame_equal(incremental_df, full_df)
+    assert "51234" in set(portal.load_projects(columns=["id"])["id"]) and "60002" not in set(portal.load_organizations(columns=["projectID"])["projectID"])
+
+
+def test_incremental_crawl_retries_failed_delta_pages(tmp_path):
+    """Failed pages of the delta query are retried with the same query, the delta only moves on after a complete crawl."""
+    api = FakePortalApi(fake_records())
+    portal = fake_portal(tmp_path, api)
+    portal.update_source(incremental=False)
+    with open(tmp_path / "crawl_state.json") as f:
+        state = json.load(f)
+
+    api.records[2] = [recently_signed(fake_record(f"{i}0002", version=1)) for i in range(1, 151)]
+    api.failing_pages, api.requests, api.queries = {(DELTA_CODE, 2)}, [], []
+    project_df, _ = portal.update_source(incremental=True)
+    assert sorted(api.requests) == [(DELTA_CODE, 1), (DELTA_CODE, 2)]
+    assert (project_df["acronym"].str.endswith("v1")).sum() == 100
+    with open(tmp_path / "crawl_state.json") as f:
+        assert json.load(f) == state
+
+    query = api.queries[0]
+    api.failing_pages, api.requests, api.queries = set(), [], []
+    project_df, _ = portal.update_source(retry_failed=True)
+    assert sorted(api.requests) == [(DELTA_CODE, 1), (DELTA_CODE, 2)] and api.queries == [query, query]
+    assert (project_df["acronym"].str.endswith("v1")).sum() == 150 and len(project_df) == 154
+
+
+def test_interrupted_crawl_is_resumed(tmp_path):
+    """A crawl that died is continued from the journal: finished suffixes are not downloaded again."""
+    api = FakePortalApi(fake_records())
+    portal = fake_portal(tmp_path, api)
+    api.crash_after = 3000
+    with pytest.raises(RuntimeError):
+        portal.update_source()
+    journal = CrawlJournal(str(tmp_path / "crawl_journal.db"))
+    finished_codes = set(journal.get_codes(("done",)))
+    journal.close()
+    assert 2500 < len(finished_codes) < 3000
+
+    api.crash_after, api.requests = None, []
+    project_df, orga_df = portal.update_source()
+    assert not finished_codes & {code for code, _ in api.requests}
+    assert len(finished_codes) + len({code for code, _ in api.requests}) == 9999
+    assert len(project_df) == 154 and len(orga_df) == 2 * 153
+
+
+def test_retry_failed_and_rebuild_from_journal(tmp_path):
+    """Failed suffixes and pages can be crawled again on their own, and the data can be rebuilt from the journal alone."""
+    api = FakePortalApi(fake_records())
+    api.failing_pages = {(42, 1), (2, 2)}
+    portal = fake_portal(tmp_path, api)
+    project_df, _ = portal.update_source()
+    assert len(project_df) == 100 + 1 + 2
+    journal = CrawlJournal(str(tmp_path / "crawl_journal.db"))
+    assert journal.get_codes(("failed",)) == [42] and journal.get_codes(("incomplete",)) == [2]
+    journal.close()
+
+    api.failing_pages, api.requests = set(), []
+    project_df, _ = portal.update_source(retry_failed=True)
+    assert sorted(api.requests) == [(2, 1), (2, 2), (42, 1)]
+    assert len(project_df) == 154
+
+    api.crash_after, api.requests = 0, []
+    rebuilt_df, rebuilt_orga_df = portal.update_source(suppress_crawl=True)
+    assert api.requests == []
+    pd.testing.assert_frame_equal(rebuilt_df, project_df)
+    assert len(rebuilt_orga_df) == 2 * 153
+
+
+def test_columnar_row_buffer_matches_dataframe_of_rows():
+    """The buffer must give the same frame as building it from the list of rows, also when keys are missing or appear later."""
+    rows = [{"id": "1", "title": "a"}, {"id": "2", "keywords": ["x", "y"]}, {"title": "c", "id": "3", "address": {"city": "Paris"}},
+            {"id": "4", "title": None}]
+    buffer = ColumnarRowBuffer()
+    buffer.extend(rows[:2])
+    buffer.extend([])
+    buffer.extend(rows[2:])
+    assert len(buffer) == 4
+    pd.testing.assert_frame_equal(buffer.to_frame(), pd.DataFrame(rows))
+    assert len(buffer) == 0 and buffer.to_frame().empty
+
+
+def test_extract_page_keeps_rows_of_the_suffix_only():
+    """Only the records of the crawled suffix are extracted, with their organizations, and the page is not modified."""
+    page = {"totalResults": 3, "results": [{"metadata": fake_record("10003")}, {"metadata": fake_record("10007")},
+                                           {"metadata": fake_record("20003", number_of_organizations=1)}]}
+    original = copy.deepcopy(page)
+    projects, organizations = FundingAndTenderPortal._extract_page(3, page)
+    assert [project["projectId"] for project in projects] == ["10003", "20003"]
+    assert projects[0]["acronym"] == "P10003v0" and projects[0]["participants"] == page["results"][0]["metadata"]["participants"][0]
+    assert [(organization["projectID"], organization["name"]) for organization in organizations] == [
+        ("10003", "organization 10003-0"), ("10003", "organization 10003-1"), ("20003", "organization 20003-0")]
+    assert page == original
+
+
+def test_snapshot_round_trip(tmp_path):
+    """Snapshots keep values, missing partition values and the column order, nested values come back as JSON, every write is a new version."""
+    path = str(tmp_path / "snapshot")
+    df = pd.DataFrame({"id": ["3", "1", "2", "4"], "programAbbreviation": ["H2020", None, "FP7", np.nan],
+                       "postalAddress": [{"a": 1}, None, {"b": [1, 2]}, {}], "keywords": [["x"], None, [], ["y", "z"]],
+                       "amount": [1.5, np.nan, 3.0, 4.0]})
+    with pytest.raises(FileNotFoundError):
+        read_snapshot(path)
+    assert snapshot_version(path) is None
+    write_snapshot(df, path, sort_by="id")
+    version = snapshot_version(path)
+
+    snapshot_df = read_snapshot(path).sort_values("id", ignore_index=True)
+    assert list(snapshot_df.columns) == list(df.columns)
+    assert list(snapshot_df["programAbbreviation"].fillna("missing")) == ["missing", "FP7", "H2020", "missing"]
+    assert list(snapshot_df["postalAddress"].fillna("missing")) == ["missing", '{"b": [1, 2]}', '{"a": 1}', "{}"]
+    assert list(snapshot_df["keywords"].fillna("missing")) == ["missing", "[]", '["x"]', '["y", "z"]']
+    assert snapshot_df["amount"].isna().tolist() == [True, False, False, False]
+    projected_df = read_snapshot(path, columns=["amount", "programAbbreviation", "id"], filters=[("id", "in", ["2", "1"])])
+    assert list(projected_df.columns) == ["amount", "programAbbreviation", "id"] and sorted(projected_df["id"]) == ["1", "2"]
+
+    time.sleep(0.01)
+    first_version = (tmp_path / "snapshot" / "_current").read_text()
+    write_snapshot(df.iloc[:2], path)
+    assert snapshot_version(path) > version and len(read_snapshot(path)) == 2
+    current_version = (tmp_path / "snapshot" / "_current").read_text()
+    with open(tmp_path / "snapshot" / current_version / "_schema.json") as f:
+        assert json.load(f)["partition_cols"] == ["programAbbreviation"]
+    # the previous version is kept for readers that are still reading it
+    assert sorted(item.name for item in (tmp_path / "snapshot").iterdir()) == sorted(["_current", first_version, current_version])
+    write_snapshot(df.iloc[:3], path)
+    assert len(read_snapshot(path)) == 3 and not (tmp_path / "snapshot" / first_version).exists()
+    assert sorted(item.name for item in tmp_path.iterdir()) == ["snapshot"]
+
+
+def test_snapshot_write_after_crash(tmp_path):
+    """Leftovers of crashed writes and snapshots of the unversioned layout must not block later writes."""
+    path = str(tmp_path / "snapshot")
+    df = pd.DataFrame({"id": ["1", "2"], "programAbbreviation": ["H2020", "FP7"]})
+    # unversioned snapshot with the directories a crash during the old rename swap left behind
+    pq.write_to_dataset(pa.Table.from_pandas(df), path, partition_cols=["programAbbreviation"])
+    with open(os.path.join(path, "_schema.json"), "w") as f:
+        json.dump({"columns": ["id", "programAbbreviation"], "partition_cols": ["programAbbreviation"], "written": "2024-01-01T00:00:00"}, f)
+    for leftover in [f"{path}.old", f"{path}.tmp"]:
+        pq.write_to_dataset(pa.Table.from_pandas(df), leftover, partition_cols=["programAbbreviation"])
+    assert sorted(read_snapshot(path)["id"]) == ["1", "2"] and snapshot_version(path) == "2024-01-01T00:00:00"
+
+    write_snapshot(df.iloc[:1], path)
+    assert list(read_snapshot(path)["id"]) == ["1"]
+    assert sorted(item.name for item in tmp_path.iterdir()) == ["snapshot"]
+    # a write that died before switching the pointer leaves the current version untouched
+    os.makedirs(os.path.join(path, "v20240101T000000000000", "programAbbreviation=FP7"))
+    assert list(read_snapshot(path)["id"]) == ["1"]
+    write_snapshot(df, path)
+    assert sorted(read_snapshot(path)["id"]) == ["1", "2"]
+    assert not os.path.exists(os.path.join(path, "v20240101T000000000000"))
+
+
+def reference_enrichment(project_df, orga_df):
+    """Project attributes and countries of the organizations as looked up by the original row-by-row loop."""
+    columns = ["ecSignatureDate", "startDate", "endDate", "programAbbreviation", "acronym"]
+    enriched = {column: [] for column in columns}
+    lastpid = 0
+    for pid in orga_df["projectID"]:
+        if lastpid != pid:
+            pid_proj_df = project_df[project_df["id"] == pid]
+        lastpid = pid
+        for column in columns:
+            enriched[column].append(pid_proj_df[column].values[0])
+    enriched["country"] = [orga_row["countryCode"]["abbreviation"] for orga_row in orga_df["postalAddress"]]
+    return enriched
+
+
+def test_organization_enrichment_matches_row_wise_lookup():
+    """The hash join must give each organization the attributes of the first project with its id, like the original loop."""
+    records = fake_records()
+    records[7].append(dict(fake_record("10007", version=3), startDate=["2019-05-05"], frameworkProgramme=["FP7"]))
+    records[9] = [dict(fake_record("10009"), ecSignatureDate=["not a date"], participants=[json.dumps([
+        {"name": "without country", "postalAddress": {"countryCode": {"abbreviation": None}}, "latitude": None, "longitude": None, "eucontribution": None}])])]
+    project_rows, orga_rows = ColumnarRowBuffer(), ColumnarRowBuffer()
+    for code in sorted(records):
+        page = {"totalResults": len(records[code]), "results": [{"metadata": metadata} for metadata in records[code]]}
+        projects, organizations = FundingAndTenderPortal._extract_page(code, page)
+        project_rows.extend(projects)
+        orga_rows.extend(organizations[::-1])
+    raw_orga_df = orga_rows.to_frame()
+    project_df, orga_df = FundingAndTenderPortal("projects", "organizations")._process_raw_data(project_rows.to_frame(), raw_orga_df.copy())
+
+    expected = reference_enrichment(project_df, raw_orga_df)
+    for column in ["ecSignatureDate", "startDate", "endDate"]:
+        assert orga_df[column].equals(pd.Series(pd.to_datetime(expected[column], utc=True), name=column))
+    for column in ["programAbbreviation", "acronym", "country"]:
+        assert orga_df[column].astype(object).where(orga_df[column].notna(), None).tolist() == expected[column]
+    assert orga_df.loc[orga_df["projectID"] == "10007", "acronym"].unique().tolist() == ["P10007v0"]
+    assert orga_df["acronym"].dtype == project_df["acronym"].dtype
+    assert orga_df.loc[orga_df["projectID"] == "10009", "ecSignatureDate"].isna().all()
+
+
+def test_crawl_journal_is_kept_on_disk_by_default(tmp_path):
+    """Without a journal path the journal is stored next to the snapshot, an in-memory journal cannot be rebuilt from."""
+    api = FakePortalApi({42: [fake_record("10042")]})
+    portal = FundingAndTenderPortal(str(tmp_path / "projects"), str(tmp_path / "organizations"), requests_per_second=None,
+                                    raw_db_filename=str(tmp_path / "raw.db"))
+    portal._fetch_page = api.fetch_page
+    portal.update_source()
+    assert portal.crawl_journal_filename == str(tmp_path / "ft_crawl_journal.db")
+    project_df, _ = portal.update_source(suppress_crawl=True)
+    assert list(project_df["id"]) == ["10042"]
+
+    portal = FundingAndTenderPortal(str(tmp_path / "projects"), str(tmp_path / "organizations"), crawl_journal_filename=":memory:")
+    for kwargs in [dict(suppress_crawl=True), dict(retry_failed=True)]:
+        with pytest.raises(ValueError):
+            portal.update_source(**kwargs)
+
+
+def test_corpus_cache_matches_snapshot_reads(tmp_path):
+    """Loads served from the cache must equal loads from the Parquet snapshot, and follow new snapshots."""
+    project_filename, orga_filename = str(tmp_path / "projects"), str(tmp_path / "organizations")
+    portal = FundingAndTenderPortal(project_filename, orga_filename)
+    portal.save_data(*random_snapshot(300))
+    cache = CorpusCache(project_filename, orga_filename)
+    cached_portal = FundingAndTenderPortal(project_filename, orga_filename, corpus_cache=cache)
+
+    ids = list(portal.load_projects(columns=["id"])["id"][::7])
+    for kwargs in [dict(), dict(project_ids=ids), dict(project_columns=["id", "title"], orga_columns=["projectID", "country"], project_ids=ids)]:
+        for expected, cached in zip(portal.load_saved_data(**kwargs), cached_portal.load_saved_data(**kwargs)):
+            pd.testing.assert_frame_equal(cached, expected)
+    assert isinstance(cache.frames["organizations"]["country"].dtype, pd.CategoricalDtype)
+
+    # changing a loaded frame does not change the cache
+    loaded_df = cached_portal.load_projects()
+    loaded_df.loc[0, "title"] = "changed"
+    assert cached_portal.load_projects()["title"][0] != "changed"
+
+    time.sleep(0.01)
+    portal.save_data(*random_snapshot(50, seed=1))
+    assert len(cached_portal.load_projects()) == 50
+    pd.testing.assert_frame_equal(cached_portal.load_organizations(), portal.load_organizations())
+
+
+def test_snapshot_loads_use_compact_dtypes(tmp_path):
+    """Saved frames are loaded with categoricals and UTC timestamps, and keep their values when saved again."""
+    project_filename, orga_filename = str(tmp_path / "projects"), str(tmp_path / "organizations")
+    portal = FundingAndTenderPortal(project_filename, orga_filename)
+    portal.save_data(*random_snapshot(3000))
+    project_df, orga_df = portal.load_saved_data()
+    assert isinstance(project_df["programAbbreviation"].dtype, pd.CategoricalDtype)
+    assert str(project_df["ecSignatureDate"].dtype) == "datetime64[us, UTC]" and project_df["ecMaxContribution"].dtype == "float64"
+
+    plain_df = read_snapshot(orga_filename)
+    for column in ["programAbbreviation", "country"]:
+        assert isinstance(orga_df[column].dtype, pd.CategoricalDtype)
+        assert orga_df[column].memory_usage(deep=True) < plain_df[column].memory_usage(deep=True) / 4
+        assert orga_df[column].isna().sum() == plain_df[column].isna().sum()
+
+    portal.save_data(project_df, orga_df)
+    for saved_df, loaded_df in zip([project_df, orga_df], portal.load_saved_data()):
+        pd.testing.assert_frame_equal(loaded_df, saved_df)
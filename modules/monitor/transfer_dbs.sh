@@ -1,8 +1,12 @@
 source_dir="deliverables"
 
-# Set the destination directory (where to copy the .db files)
+# Set the destination directory (the data volume of the Metabase container)
 dest_dir="/var/lib/docker/volumes/cnect-monitor-data/_data/"
 
 
-# Find all .db files recursively and copy them to the destination directory
-find "/home/ubuntu/connect-monitor/deliverables" -type f -name "*.db" -exec cp {} "/var/lib/docker/volumes/cnect-monitor-data/_data/" \;
\ No newline at end of file
+# Publish all .db files to the destination directory. The workflows do this themselves if the
+# environment variable metabase_data_directory is set; this script is only needed to publish by hand.
+# Databases are copied with SQLite's backup API and swapped in with an atomic rename, and only if
+# they changed since they were last published (see SnapshotPublisher in data_publishing.py).
+cd "/home/ubuntu/connect-monitor"
+find "$source_dir" -type f -name "*.db" -exec pipenv run python -c "import sys; from data_publishing import SnapshotPublisher; SnapshotPublisher(sys.argv[2]).publish(sys.argv[1])" {} "$dest_dir" \;
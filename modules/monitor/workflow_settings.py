@@ -3,8 +3,20 @@ import os
 
 class sourcing_settings: 
     suppress_ft_crawl = False
-    raw_projects_filename = "data/raw_project_ft_data.pickle"
-    raw_organizations_filename = "data/raw_orga_ft_data.pickle"
+    raw_projects_filename = "data/raw_project_ft_data.parquet"
+    raw_organizations_filename = "data/raw_orga_ft_data.parquet"
+    crawl_max_in_flight = 16 # maximum number of concurrent requests to the F&T API
+    crawl_requests_per_second = 20 # request budget for the F&T API
+    incremental_sourcing = True # only crawl the recently signed projects with one delta query, other changes are picked up by the next full crawl
+    crawl_state_filename = "data/ft_crawl_state.json"
+    crawl_journal_filename = "data/ft_crawl_journal.db" # progress of the running crawl, used to resume it
+    full_crawl_interval_days = 28 # force a full crawl if the last one is older than this
+    delta_lookback_days = 90 # incremental crawls get the projects signed up to this many days before the last complete crawl
+    match_scores_filename = "data/match_scores.parquet" # keyword match scores of all topics, computed after sourcing
+    inverted_index_filename = "data/ft_inverted_index.db" # index of the project texts for fast keyword queries
+    embedding_directory = "embedding" # vectors of the project texts for the semantic scores
+    raw_db_filename = "deliverables/ft_portal_raw.db" # raw data for the dashboards
+    metabase_directory = os.getenv("metabase_data_directory") # data volume of the Metabase container the databases are published to (None: not published)
 
 
 class quantum_settings:
@@ -29,9 +41,20 @@ class quantum_settings:
     matchscore_histogram_filename = f'data/{topic}/matchscore_histogram.png'
 
     db_filename = f'deliverables/{topic}/{topic}.db'
+    deliverable_manifest_filename = f'data/{topic}/deliverable_manifest.json' # fingerprints of the deliverables, kept out of the zipped deliverables folder
+    metabase_directory = os.getenv("metabase_data_directory") # data volume of the Metabase container the database is published to (None: not published)
 
     
     llm_location = "remote"
+    llm_max_concurrency = 8 # maximum number of concurrent requests to the LLM endpoint
+    llm_requests_per_minute = 120 # request budget of the LLM endpoint (None: unlimited)
+    llm_tokens_per_minute = None # token budget of the LLM endpoint (None: unlimited)
+    llm_cache_filename = f'data/{topic}/llm_cache.db' # responses of previous runs, only new or edited projects are sent to the LLM
+    llm_pack_size = 1 # number of projects categorized in one LLM request (1: one request per project)
+    llm_batch_mode = False # categorize with a batch job, the workflow finishes in a later scheduler tick once it is done
+    llm_batch_runner = "openai" # "openai": batch API of the LLM gateway, "directory": hand off to another process via llm_batch_directory
+    llm_batch_state_filename = f'data/{topic}/llm_batch_state.json'
+    llm_batch_directory = f'data/{topic}/llm_batch'
 
 
     suppress_llm_categorization = False
@@ -41,6 +64,7 @@ class quantum_settings:
 
 
     match_score_threshold = 1
+    semantic_score_threshold = None # minimum cosine similarity of a project with the topic description (None: no semantic filter)
 
 
 
@@ -102,6 +126,8 @@ class quantum_settings:
     }
 
 
+    render_max_workers = None # processes rendering the charts of the evaluations (None: one per CPU, at most 4; 0: render one after another in the workflow process)
+
     evaluations = {
         "TotalFundingByFPOverTime": TotalFundingByFPOverTime,
         "TotalFundingByLLMCategoryOverTime": TotalFundingByLLMCategoryOverTime,
@@ -143,8 +169,19 @@ class hpc_settings:
     matchscore_histogram_filename = f'data/{topic}/matchscore_histogram.png'
 
     db_filename = f'deliverables/{topic}/{topic}.db'
+    deliverable_manifest_filename = f'data/{topic}/deliverable_manifest.json' # fingerprints of the deliverables, kept out of the zipped deliverables folder
+    metabase_directory = os.getenv("metabase_data_directory") # data volume of the Metabase container the database is published to (None: not published)
 
     llm_location = "remote"
+    llm_max_concurrency = 8 # maximum number of concurrent requests to the LLM endpoint
+    llm_requests_per_minute = 120 # request budget of the LLM endpoint (None: unlimited)
+    llm_tokens_per_minute = None # token budget of the LLM endpoint (None: unlimited)
+    llm_cache_filename = f'data/{topic}/llm_cache.db' # responses of previous runs, only new or edited projects are sent to the LLM
+    llm_pack_size = 1 # number of projects categorized in one LLM request (1: one request per project)
+    llm_batch_mode = False # categorize with a batch job, the workflow finishes in a later scheduler tick once it is done
+    llm_batch_runner = "openai" # "openai": batch API of the LLM gateway, "directory": hand off to another process via llm_batch_directory
+    llm_batch_state_filename = f'data/{topic}/llm_batch_state.json'
+    llm_batch_directory = f'data/{topic}/llm_batch'
 
     suppress_llm_categorization = False
     import_manual_data = False
@@ -153,6 +190,7 @@ class hpc_settings:
     send_newsletter = False
 
     match_score_threshold = 0.0001
+    semantic_score_threshold = None # minimum cosine similarity of a project with the topic description (None: no semantic filter)
 
 
 
@@ -218,6 +256,8 @@ class hpc_settings:
 
 
 
+    render_max_workers = None # processes rendering the charts of the evaluations (None: one per CPU, at most 4; 0: render one after another in the workflow process)
+
     evaluations = {
         "TotalFundingByFPOverTime": TotalFundingByFPOverTime,
         "TotalFundingByLLMCategoryOverTime": TotalFundingByLLMCategoryOverTime,
@@ -260,8 +300,19 @@ class ai_settings:
     matchscore_histogram_filename = f'data/{topic}/matchscore_histogram.png'
 
     db_filename = f'deliverables/{topic}/{topic}.db'
+    deliverable_manifest_filename = f'data/{topic}/deliverable_manifest.json' # fingerprints of the deliverables, kept out of the zipped deliverables folder
+    metabase_directory = os.getenv("metabase_data_directory") # data volume of the Metabase container the database is published to (None: not published)
 
     llm_location = "remote"
+    llm_max_concurrency = 8 # maximum number of concurrent requests to the LLM endpoint
+    llm_requests_per_minute = 120 # request budget of the LLM endpoint (None: unlimited)
+    llm_tokens_per_minute = None # token budget of the LLM endpoint (None: unlimited)
+    llm_cache_filename = f'data/{topic}/llm_cache.db' # responses of previous runs, only new or edited projects are sent to the LLM
+    llm_pack_size = 1 # number of projects categorized in one LLM request (1: one request per project)
+    llm_batch_mode = False # categorize with a batch job, the workflow finishes in a later scheduler tick once it is done
+    llm_batch_runner = "openai" # "openai": batch API of the LLM gateway, "directory": hand off to another process via llm_batch_directory
+    llm_batch_state_filename = f'data/{topic}/llm_batch_state.json'
+    llm_batch_directory = f'data/{topic}/llm_batch'
 
     suppress_llm_categorization = False
     import_manual_data = False
@@ -270,6 +321,7 @@ class ai_settings:
     send_newsletter = False
 
     match_score_threshold = 0.5
+    semantic_score_threshold = None # minimum cosine similarity of a project with the topic description (None: no semantic filter)
 
 
 
@@ -367,6 +419,8 @@ Please also append to the response (after another comma) a TRL level from 1 to 9
 
 
 
+    render_max_workers = None # processes rendering the charts of the evaluations (None: one per CPU, at most 4; 0: render one after another in the workflow process)
+
     evaluations = {
         "TotalFundingByFPOverTime": TotalFundingByFPOverTime,
         "TotalFundingByLLMCategoryOverTime": TotalFundingByLLMCategoryOverTime,
@@ -410,8 +464,19 @@ class cybersecurity_settings:
     matchscore_histogram_filename = f'data/{topic}/matchscore_histogram.png'
 
     db_filename = f'deliverables/{topic}/{topic}.db'
+    deliverable_manifest_filename = f'data/{topic}/deliverable_manifest.json' # fingerprints of the deliverables, kept out of the zipped deliverables folder
+    metabase_directory = os.getenv("metabase_data_directory") # data volume of the Metabase container the database is published to (None: not published)
 
     llm_location = "remote"
+    llm_max_concurrency = 8 # maximum number of concurrent requests to the LLM endpoint
+    llm_requests_per_minute = 120 # request budget of the LLM endpoint (None: unlimited)
+    llm_tokens_per_minute = None # token budget of the LLM endpoint (None: unlimited)
+    llm_cache_filename = f'data/{topic}/llm_cache.db' # responses of previous runs, only new or edited projects are sent to the LLM
+    llm_pack_size = 1 # number of projects categorized in one LLM request (1: one request per project)
+    llm_batch_mode = False # categorize with a batch job, the workflow finishes in a later scheduler tick once it is done
+    llm_batch_runner = "openai" # "openai": batch API of the LLM gateway, "directory": hand off to another process via llm_batch_directory
+    llm_batch_state_filename = f'data/{topic}/llm_batch_state.json'
+    llm_batch_directory = f'data/{topic}/llm_batch'
 
     suppress_llm_categorization = False
     import_manual_data = False
@@ -420,6 +485,7 @@ class cybersecurity_settings:
     send_newsletter = False
 
     match_score_threshold = 0.0001
+    semantic_score_threshold = None # minimum cosine similarity of a project with the topic description (None: no semantic filter)
 
 
 
@@ -479,6 +545,8 @@ class cybersecurity_settings:
 
 
 
+    render_max_workers = None # processes rendering the charts of the evaluations (None: one per CPU, at most 4; 0: render one after another in the workflow process)
+
     evaluations = {
         "TotalFundingByFPOverTime": TotalFundingByFPOverTime,
         "TotalFundingByLLMCategoryOverTime": TotalFundingByLLMCategoryOverTime,